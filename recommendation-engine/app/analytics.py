@@ -0,0 +1,242 @@
+import asyncio
+import glob
+import logging
+import os
+import tempfile
+from collections import deque
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import orjson
+
+from .database import DatabaseManager
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "true").lower() == "true"
+
+IMPRESSIONS = registry.counter(
+    "recommendation_impressions_total",
+    "Recommendation impressions by outcome (flushed = copied to the database, spooled = written to local NDJSON, dropped = lost)",
+    ("outcome",)
+)
+IMPRESSIONS_BUFFERED = registry.gauge(
+    "recommendation_impressions_buffered",
+    "Impressions waiting in the analytics ring buffer"
+)
+
+class ImpressionSink:
+    """
+    Fire-and-forget sink for recommendation impressions.
+
+    record() appends to a bounded ring buffer and returns; when the buffer is
+    full the oldest impression is dropped and counted. A background task
+    COPYs batches into recommendation_impressions. A batch the database does
+    not take is appended to rotating NDJSON files in ANALYTICS_SPOOL_DIR,
+    which are copied in, one file per flush, once the database is back.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        spool_dir: Optional[str] = None,
+        buffer_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None
+    ):
+        self.db = db_manager
+        self.spool_dir = spool_dir or os.getenv(
+            "ANALYTICS_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "bitspark-impressions")
+        )
+        self.batch_size = batch_size or int(os.getenv("ANALYTICS_BATCH_SIZE", "1000"))
+        self.flush_interval = flush_interval or int(os.getenv("ANALYTICS_FLUSH_INTERVAL_MS", "2000")) / 1000
+        self.spool_max_bytes = int(os.getenv("ANALYTICS_SPOOL_MAX_MB", "16")) * 1024 * 1024
+        self.spool_max_files = int(os.getenv("ANALYTICS_SPOOL_MAX_FILES", "20"))
+
+        self._buffer: deque = deque(maxlen=buffer_size or int(os.getenv("ANALYTICS_BUFFER_SIZE", "10000")))
+        self._wake = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._running = False
+        self._spool_seq = 0
+        self._spool_file: Optional[str] = None  # File currently being appended to
+        self._database_ok = True  # Last copy succeeded; spooled files are only replayed then
+
+        self.flushed = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def start(self):
+        """Start the background flush loop"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        existing = self._spool_files()
+        if existing:
+            self._spool_seq = max(self._spool_number(path) for path in existing) + 1
+            logger.info(f"{len(existing)} spooled impression files will be copied in once the database is reachable")
+        self._running = True
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def record(
+        self,
+        user_id: str,
+        recommendation_type: str,
+        recommendations: List[Any],
+        latency_ms: float,
+        algorithm_version: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """Queue one impression; never waits and never raises"""
+        if not ANALYTICS_ENABLED or not self._running:
+            return
+
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+            IMPRESSIONS.inc(("dropped",))
+        self._buffer.append({
+            'created_at': datetime.utcnow(),
+            'user_id': user_id,
+            'recommendation_type': recommendation_type,
+            'algorithm_version': algorithm_version,
+            'candidate_ids': [item.user_id for item in recommendations],
+            'scores': [item.compatibility_score for item in recommendations],
+            'latency_ms': latency_ms,
+            'metadata': metadata or {}
+        })
+        IMPRESSIONS_BUFFERED.set(len(self._buffer))
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """Copy everything buffered to the database (or the spool); returns the impression count"""
+        written = 0
+        copy_failed = False
+        while self._buffer:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            IMPRESSIONS_BUFFERED.set(len(self._buffer))
+            if not copy_failed:
+                try:
+                    await self.db.copy_impressions(batch)
+                    self._database_ok = True
+                    written += len(batch)
+                    self.flushed += len(batch)
+                    IMPRESSIONS.inc(("flushed",), len(batch))
+                    continue
+                except Exception as e:
+                    # Spool the rest of this flush too rather than retrying a failing database
+                    copy_failed = True
+                    self._database_ok = False
+                    self.failed_flushes += 1
+                    logger.warning(f"Impression copy failed, spooling to {self.spool_dir}: {e}")
+            await self._spool(batch)
+
+        if self._database_ok:
+            await self._replay_one()
+        return written
+
+    async def drain(self):
+        """Stop the flush loop and write out everything still buffered"""
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        if self._flush_task:
+            await self._flush_task
+        await self.flush()
+        logger.info("Impression sink drained")
+
+    def stats(self) -> Dict[str, Any]:
+        """Buffer depth and flush counters"""
+        return {
+            "enabled": ANALYTICS_ENABLED,
+            "buffered": len(self._buffer),
+            "capacity": self._buffer.maxlen,
+            "flushed": self.flushed,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+            "spool_files": len(self._spool_files())
+        }
+
+    async def _flush_loop(self):
+        while self._running:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self._running:
+                break
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Impression flush failed: {e}")
+
+    async def _spool(self, batch: List[Dict[str, Any]]):
+        try:
+            await asyncio.to_thread(self._write_spool, batch)
+            self.spooled += len(batch)
+            IMPRESSIONS.inc(("spooled",), len(batch))
+        except Exception as e:
+            self.dropped += len(batch)
+            IMPRESSIONS.inc(("dropped",), len(batch))
+            logger.error(f"Failed to spool {len(batch)} impressions, dropping them: {e}")
+
+    def _write_spool(self, batch: List[Dict[str, Any]]):
+        if self._spool_file is None or os.path.getsize(self._spool_file) >= self.spool_max_bytes:
+            self._spool_file = os.path.join(self.spool_dir, f"impressions-{self._spool_seq:012d}.ndjson")
+            self._spool_seq += 1
+        with open(self._spool_file, "ab") as f:
+            f.write(b"".join(orjson.dumps(event) + b"\n" for event in batch))
+
+        # Rotation: past the file limit, the oldest spooled impressions are given up
+        files = self._spool_files()
+        for path in files[:-self.spool_max_files]:
+            with open(path, "rb") as f:
+                lost = sum(1 for _ in f)
+            os.remove(path)
+            self.dropped += lost
+            IMPRESSIONS.inc(("dropped",), lost)
+            logger.warning(f"Impression spool over {self.spool_max_files} files, dropped {lost} from {path}")
+
+    async def _replay_one(self):
+        """Copy the oldest spooled file into the database in one COPY, so a failure copies none of it"""
+        files = self._spool_files()
+        if not files:
+            return
+        path = files[0]
+        if path == self._spool_file:
+            self._spool_file = None  # Seal it; new spooling goes to a fresh file
+
+        events = await asyncio.to_thread(self._read_spool, path)
+        try:
+            await self.db.copy_impressions(events)
+        except Exception as e:
+            self._database_ok = False
+            logger.warning(f"Replaying spooled impressions from {path} failed: {e}")
+            return
+        os.remove(path)
+        self.replayed += len(events)
+        IMPRESSIONS.inc(("flushed",), len(events))
+        logger.info(f"Copied {len(events)} spooled impressions from {path}")
+
+    @staticmethod
+    def _read_spool(path: str) -> List[Dict[str, Any]]:
+        events = []
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                event = orjson.loads(line)
+                event['created_at'] = datetime.fromisoformat(event['created_at'])
+                events.append(event)
+        return events
+
+    def _spool_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.spool_dir, "impressions-*.ndjson")))
+
+    @staticmethod
+    def _spool_number(path: str) -> int:
+        return int(os.path.basename(path)[len("impressions-"):-len(".ndjson")])
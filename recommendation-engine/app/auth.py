@@ -4,7 +4,6 @@ from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import hashlib
 import hmac
-import httpx
 import json
 from typing import Dict, Any, Optional
 import logging
@@ -148,6 +147,38 @@ async def verify_api_key(api_key: str) -> bool:
     
     return True
 
+def is_admin_key(api_key: Optional[str]) -> bool:
+    """Check an admin key without raising (False when no admin key is configured)"""
+    expected_key = os.getenv("ADMIN_API_KEY")
+    if not expected_key or not api_key:
+        return False
+    return hmac.compare_digest(api_key, expected_key)
+
+def is_metrics_token(authorization: Optional[str]) -> bool:
+    """Check an "Authorization: Bearer" header against METRICS_TOKEN (False when none is configured)"""
+    expected_token = os.getenv("METRICS_TOKEN")
+    if not expected_token or not authorization or not authorization.startswith("Bearer "):
+        return False
+    return hmac.compare_digest(authorization[len("Bearer "):], expected_token)
+
+async def verify_admin_key(api_key: Optional[str]) -> bool:
+    """
+    Verify the admin key sent with operational endpoints (profiling, stats)
+    """
+    if not os.getenv("ADMIN_API_KEY"):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Admin API key not configured"
+        )
+    
+    if not is_admin_key(api_key):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin key"
+        )
+    
+    return True
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Create JWT access token (for internal use)
@@ -1,16 +1,25 @@
 import asyncpg
+import asyncio
 import os
 from typing import List, Dict, Any, Optional
 import json
 import logging
 from datetime import datetime, timedelta
 
+from .filters import CandidateQuery, compile_candidate_query
+from .models import RecommendationType
+from .interning import user_ids
+from .single_flight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
     def __init__(self):
         self.pool = None
         self.database_url = os.getenv("DATABASE_URL")
+        self.min_pool_size = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+        self.max_pool_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+        self._profile_flight = SingleFlight("get_user_profile")
         
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable is required")
@@ -20,8 +29,8 @@ class DatabaseManager:
         try:
             self.pool = await asyncpg.create_pool(
                 self.database_url,
-                min_size=2,
-                max_size=10,
+                min_size=self.min_pool_size,
+                max_size=self.max_pool_size,
                 command_timeout=60,
                 statement_cache_size=0,  # Disable prepared statements for pgbouncer compatibility
                 server_settings={
@@ -62,22 +71,60 @@ class DatabaseManager:
         """Alias for disconnect for compatibility"""
         await self.disconnect()
     
+    async def warm_pool(self) -> int:
+        """Run a round trip on min_size connections at once so none is cold on first use"""
+        if not self.pool:
+            await self.connect()
+        
+        async def ping():
+            async with self.pool.acquire() as conn:
+                await conn.fetchval("SELECT 1")
+        
+        await asyncio.gather(*(ping() for _ in range(self.min_pool_size)))
+        return self.min_pool_size
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Connection pool size and idle connections, without touching the database"""
+        if not self.pool:
+            return {}
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size()
+        }
+
+    async def estimate_user_count(self) -> int:
+        """Planner's row estimate for users from pg_class (no table scan)"""
+        if not self.pool:
+            raise RuntimeError("Database not connected")
+
+        async with self.pool.acquire() as conn:
+            estimate = await conn.fetchval("SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass")
+            # -1 until the table has been vacuumed or analyzed
+            return max(estimate or 0, 0)
+
     async def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get complete user profile with interests and preferences"""
         if not self.pool:
             raise RuntimeError("Database not connected")
-            
+        
+        # Concurrent lookups of one profile share a single query; each caller gets its own dict
+        profile = await self._profile_flight.do(user_id, lambda: self._fetch_user_profile(user_id))
+        return dict(profile) if profile is not None else None
+    
+    async def _fetch_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
             try:
                 # Get user basic info with interests
                 user_query = """
                     SELECT u.*, 
                            COALESCE(
-                               array_agg(ui.interest) FILTER (WHERE ui.interest IS NOT NULL), 
+                               array_agg(ui.interest ORDER BY ui.interest) FILTER (WHERE ui.interest IS NOT NULL), 
                                ARRAY[]::text[]
                            ) as interests,
                            COALESCE(
-                               array_agg(ui.weight) FILTER (WHERE ui.weight IS NOT NULL), 
+                               array_agg(ui.weight ORDER BY ui.interest) FILTER (WHERE ui.weight IS NOT NULL), 
                                ARRAY[]::decimal[]
                            ) as interest_weights
                     FROM users u
@@ -127,75 +174,36 @@ class DatabaseManager:
         user_id: str, 
         recommendation_type: str,
         limit: int = 50,
-        exclude_ids: List[str] = None
+        exclude_ids: List[str] = None,
+        query: Optional[CandidateQuery] = None
     ) -> List[Dict[str, Any]]:
         """Get potential matches for a user with enhanced filtering"""
         if not self.pool:
             raise RuntimeError("Database not connected")
             
-        exclude_ids = exclude_ids or []
-        exclude_ids.append(user_id)  # Always exclude self
-        
         async with self.pool.acquire() as conn:
             try:
-                # Get user's campus for filtering
-                user_campus_query = "SELECT campus FROM users WHERE id = $1"
-                user_campus = await conn.fetchval(user_campus_query, user_id)
+                if query is None:
+                    # No compiled filters: the user's campus and the default window
+                    user_campus = await conn.fetchval("SELECT campus FROM users WHERE id = $1", user_id)
+                    query = compile_candidate_query(
+                        {'id': user_id, 'campus': user_campus},
+                        RecommendationType(recommendation_type),
+                        {'exclude_user_ids': exclude_ids or []}
+                    )
                 
-                if not user_campus:
+                if not query.campuses:
                     logger.warning(f"User {user_id} not found for campus lookup")
                     return []
                 
-                # Enhanced query with better filtering
-                query = """
-                    SELECT DISTINCT u.*, 
-                           COALESCE(
-                               array_agg(ui.interest) FILTER (WHERE ui.interest IS NOT NULL), 
-                               ARRAY[]::text[]
-                           ) as interests,
-                           COALESCE(
-                               array_agg(ui.weight) FILTER (WHERE ui.weight IS NOT NULL), 
-                               ARRAY[]::decimal[]
-                           ) as interest_weights
-                    FROM users u
-                    LEFT JOIN user_interests ui ON u.id = ui.user_id
-                    WHERE u.id != $1 
-                      AND u.is_active = true
-                      AND u.verified = true
-                      AND u.campus = $2
-                      AND u.profile_completed = true
-                      AND u.id NOT IN (
-                          SELECT CASE 
-                              WHEN user1_id = $1 THEN user2_id 
-                              ELSE user1_id 
-                          END
-                          FROM connections 
-                          WHERE (user1_id = $1 OR user2_id = $1)
-                            AND status IN ('accepted', 'pending', 'blocked')
-                      )
-                      AND ($3::text[] IS NULL OR u.id != ALL($3::text[]))
-                      AND u.last_seen > $4
-                    GROUP BY u.id
-                    ORDER BY u.last_seen DESC, u.verified DESC
-                    LIMIT $5
-                """
-                
-                # Active in last 30 days
-                active_since = datetime.utcnow() - timedelta(days=30)
-                
-                rows = await conn.fetch(
-                    query, 
-                    user_id,
-                    user_campus,
-                    exclude_ids if exclude_ids else None,
-                    active_since,
-                    limit * 2  # Get more candidates for better filtering
-                )
+                sql, params = query.to_sql(limit * 2)  # Get more candidates for better filtering
+                rows = await conn.fetch(sql, *params)
                 
                 # Process results
                 candidates = []
                 for row in rows:
                     candidate = dict(row)
+                    candidate['internal_id'] = user_ids.intern(candidate['id'])
                     
                     # Process interests
                     if candidate['interests'] and len(candidate['interests']) > 0 and candidate['interests'][0]:
@@ -219,7 +227,10 @@ class DatabaseManager:
                     
                     candidates.append(candidate)
                 
-                logger.info(f"Found {len(candidates)} potential matches for user {user_id} (type: {recommendation_type})")
+                logger.info(
+                    f"Found {len(candidates)} potential matches for user {user_id} "
+                    f"(type: {recommendation_type}, shaped for {query.index})"
+                )
                 return candidates
                 
             except Exception as e:
@@ -234,75 +245,276 @@ class DatabaseManager:
         context: Dict[str, Any] = None
     ):
         """Record user feedback for improving recommendations"""
+        await self.record_feedback_batch([{
+            'user_id': user_id,
+            'target_user_id': target_user_id,
+            'action': action,
+            'context': context,
+            'created_at': datetime.utcnow()
+        }])
+    
+    async def record_feedback_batch(
+        self, 
+        events: List[Dict[str, Any]],
+        mutual_known: bool = False
+    ) -> List[tuple]:
+        """
+        Upsert a batch of feedback events and create connections for mutual likes
+        
+        Runs as a single CTE statement, so the upsert, the mutual-like check and
+        the connection insert share one round trip and one transaction. With
+        mutual_known, every event carries a 'mutual' flag already decided by the
+        in-memory like graph and user_feedback is not searched for reverse likes.
+        Returns the (user1_id, user2_id) pairs of newly created connections.
+        """
         if not self.pool:
             raise RuntimeError("Database not connected")
-            
+        
+        if not events:
+            return []
+        
+        batch_sql = """
+                    WITH batch AS (
+                        SELECT DISTINCT ON (b.user_id, b.target_user_id)
+                               b.user_id::uuid AS user_id,
+                               b.target_user_id::uuid AS target_user_id,
+                               b.action,
+                               b.context::jsonb AS context,
+                               b.created_at,
+                               b.mutual
+                        FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::timestamptz[], $7::boolean[])
+                             AS b(user_id, target_user_id, action, context, created_at, mutual)
+                        ORDER BY b.user_id, b.target_user_id, b.created_at DESC
+                    ),
+                    upserted AS (
+                        INSERT INTO user_feedback (user_id, target_user_id, action, context, created_at)
+                        SELECT user_id, target_user_id, action, context, created_at FROM batch
+                        ON CONFLICT (user_id, target_user_id) 
+                        DO UPDATE SET 
+                            action = EXCLUDED.action,
+                            context = EXCLUDED.context,
+                            created_at = EXCLUDED.created_at
+                        RETURNING user_id, target_user_id, action
+                    ),"""
+        
+        if mutual_known:
+            mutual_sql = """
+                    mutual AS (
+                        SELECT DISTINCT
+                               LEAST(user_id, target_user_id) AS user1_id,
+                               GREATEST(user_id, target_user_id) AS user2_id
+                        FROM batch
+                        WHERE mutual AND user_id <> target_user_id
+                    )"""
+        else:
+            mutual_sql = """
+                    mutual AS (
+                        SELECT DISTINCT
+                               LEAST(u.user_id, u.target_user_id) AS user1_id,
+                               GREATEST(u.user_id, u.target_user_id) AS user2_id
+                        FROM upserted u
+                        WHERE u.action IN ('like', 'super_like')
+                          AND u.user_id <> u.target_user_id  -- A self-like matches its own row below
+                          AND (
+                              -- Reverse like arrived in this same batch
+                              EXISTS (
+                                  SELECT 1 FROM upserted r
+                                  WHERE r.user_id = u.target_user_id AND r.target_user_id = u.user_id
+                                    AND r.action IN ('like', 'super_like')
+                              )
+                              -- Reverse like already stored and not overwritten by this batch
+                              OR EXISTS (
+                                  SELECT 1 FROM user_feedback f
+                                  WHERE f.user_id = u.target_user_id AND f.target_user_id = u.user_id
+                                    AND f.action IN ('like', 'super_like')
+                                    AND NOT EXISTS (
+                                        SELECT 1 FROM upserted r
+                                        WHERE r.user_id = f.user_id AND r.target_user_id = f.target_user_id
+                                    )
+                              )
+                          )
+                    )"""
+        
         async with self.pool.acquire() as conn:
             try:
-                # Insert feedback record with upsert
-                await conn.execute("""
-                    INSERT INTO user_feedback (user_id, target_user_id, action, context, created_at)
-                    VALUES ($1, $2, $3, $4, $5)
-                    ON CONFLICT (user_id, target_user_id) 
-                    DO UPDATE SET 
-                        action = $3,
-                        context = $4,
-                        created_at = $5
-                """, user_id, target_user_id, action, json.dumps(context or {}), datetime.utcnow())
+                rows = await conn.fetch(batch_sql + mutual_sql + """
+                    INSERT INTO connections (user1_id, user2_id, connection_type, status, created_at)
+                    SELECT user1_id, user2_id, 'friend', 'accepted', $6 FROM mutual
+                    ON CONFLICT (user1_id, user2_id) DO NOTHING
+                    RETURNING user1_id::text, user2_id::text
+                """,
+                    [e['user_id'] for e in events],
+                    [e['target_user_id'] for e in events],
+                    [e['action'] for e in events],
+                    [json.dumps(e.get('context') or {}) for e in events],
+                    [e['created_at'] for e in events],
+                    datetime.utcnow(),
+                    [bool(e.get('mutual')) for e in events]
+                )
                 
-                # If it's a positive action, check for mutual match
-                if action in ['like', 'super_like']:
-                    mutual_match = await conn.fetchrow("""
-                        SELECT * FROM user_feedback 
-                        WHERE user_id = $1 AND target_user_id = $2 
-                          AND action IN ('like', 'super_like')
-                    """, target_user_id, user_id)
-                    
-                    if mutual_match:
-                        # Create connection
-                        await conn.execute("""
-                            INSERT INTO connections (user1_id, user2_id, connection_type, status, created_at)
-                            VALUES ($1, $2, 'friend', 'accepted', $3)
-                            ON CONFLICT (user1_id, user2_id) DO NOTHING
-                        """, user_id, target_user_id, datetime.utcnow())
-                        
-                        logger.info(f"Created mutual connection between {user_id} and {target_user_id}")
+                connections = [(row['user1_id'], row['user2_id']) for row in rows]
+                for user1_id, user2_id in connections:
+                    logger.info(f"Created mutual connection between {user1_id} and {user2_id}")
                 
-                logger.info(f"Recorded feedback: {action} from {user_id} to {target_user_id}")
+                logger.info(f"Recorded {len(events)} feedback events")
+                return connections
                 
             except Exception as e:
                 logger.error(f"Error recording feedback: {e}")
                 raise
     
+    async def get_like_edges(self) -> List[tuple]:
+        """Get every stored like as (user_id, target_user_id)"""
+        if not self.pool:
+            raise RuntimeError("Database not connected")
+            
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT user_id::text, target_user_id::text
+                FROM user_feedback
+                WHERE action IN ('like', 'super_like')
+            """)
+            return [(row['user_id'], row['target_user_id']) for row in rows]
+    
+    async def get_active_campuses(self) -> List[str]:
+        """Campuses that have at least one active user"""
+        if not self.pool:
+            raise RuntimeError("Database not connected")
+            
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("SELECT DISTINCT campus FROM users WHERE is_active = true")
+            return [row['campus'] for row in rows if row['campus']]
+    
+    async def get_campus_feature_rows(self, campus: str, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Get (id, interests, changed_at) for every user of a campus that can appear as a candidate
+        
+        With since, only users whose row or interests changed after it.
+        """
+        if not self.pool:
+            raise RuntimeError("Database not connected")
+            
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT u.id::text AS id,
+                       COALESCE(
+                           array_agg(ui.interest ORDER BY ui.interest) FILTER (WHERE ui.interest IS NOT NULL), 
+                           ARRAY[]::text[]
+                       ) as interests,
+                       GREATEST(u.updated_at, MAX(ui.updated_at)) as changed_at
+                FROM users u
+                LEFT JOIN user_interests ui ON u.id = ui.user_id
+                WHERE u.campus = $1
+                  AND u.is_active = true
+                  AND u.verified = true
+                  AND u.profile_completed = true
+                  AND u.last_seen > $2
+                  AND (
+                      $3::timestamptz IS NULL
+                      OR u.updated_at > $3
+                      OR EXISTS (
+                          SELECT 1 FROM user_interests changed
+                          WHERE changed.user_id = u.id AND changed.updated_at > $3
+                      )
+                  )
+                GROUP BY u.id
+            """, campus, datetime.utcnow() - timedelta(days=30), since)
+            
+            # Same interest clean-up as get_potential_matches
+            return [
+                {
+                    'id': row['id'],
+                    'interests': [i for i in row['interests'] if i] if row['interests'] and row['interests'][0] else [],
+                    'changed_at': row['changed_at']
+                }
+                for row in rows
+            ]
+    
+    async def get_campus_locations(self, campus: str) -> List[Dict[str, Any]]:
+        """Get (id, latitude, longitude) for every located user of a campus that can appear as a candidate"""
+        if not self.pool:
+            raise RuntimeError("Database not connected")
+            
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT u.id::text AS id, u.latitude, u.longitude
+                FROM users u
+                WHERE u.campus = $1
+                  AND u.is_active = true
+                  AND u.verified = true
+                  AND u.profile_completed = true
+                  AND u.last_seen > $2
+                  AND u.latitude IS NOT NULL
+                  AND u.longitude IS NOT NULL
+            """, campus, datetime.utcnow() - timedelta(days=30))
+            return [dict(row) for row in rows]
+    
     async def get_user_stats(self, user_id: str) -> Dict[str, Any]:
-        """Get user recommendation statistics"""
+        """Get user recommendation statistics (primary-key lookup on the user_stats counters)"""
+        if not self.pool:
+            raise RuntimeError("Database not connected")
+            
+        try:
+            stats = await self.get_user_stats_bulk([user_id])
+            return stats[user_id]
+        except Exception as e:
+            logger.error(f"Error getting user stats: {e}")
+            return {}
+    
+    async def get_user_stats_bulk(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get statistics for many users in one round trip
+        
+        Reads the user_stats counters kept current by triggers on user_feedback
+        and connections. Users without a row get zeroed stats.
+        """
         if not self.pool:
             raise RuntimeError("Database not connected")
             
         async with self.pool.acquire() as conn:
-            try:
-                stats = await conn.fetchrow("""
-                    SELECT 
-                        COUNT(CASE WHEN action IN ('like', 'super_like') THEN 1 END) as likes_given,
-                        COUNT(CASE WHEN action = 'pass' THEN 1 END) as passes_given,
-                        (SELECT COUNT(*) FROM connections WHERE user1_id = $1 OR user2_id = $1) as total_connections,
-                        (SELECT AVG(compatibility_score) FROM connections WHERE user1_id = $1 OR user2_id = $1) as avg_compatibility
-                    FROM user_feedback 
-                    WHERE user_id = $1
-                """, user_id)
-                
-                result = dict(stats) if stats else {}
-                
-                # Calculate match rate
-                likes_given = result.get('likes_given', 0)
-                total_connections = result.get('total_connections', 0)
-                result['match_rate'] = (total_connections / likes_given) if likes_given > 0 else 0.0
-                
-                return result
-                
-            except Exception as e:
-                logger.error(f"Error getting user stats: {e}")
-                return {}
+            rows = await conn.fetch("""
+                SELECT user_id::text AS user_id, likes_given, passes_given, total_connections,
+                       compatibility_sum, compatibility_count
+                FROM user_stats
+                WHERE user_id = ANY($1::uuid[])
+            """, user_ids)
+        
+        found = {row['user_id']: row for row in rows}
+        return {user_id: self._format_user_stats(found.get(user_id)) for user_id in user_ids}
+    
+    @staticmethod
+    def _format_user_stats(row) -> Dict[str, Any]:
+        likes_given = row['likes_given'] if row else 0
+        total_connections = row['total_connections'] if row else 0
+        compatibility_count = row['compatibility_count'] if row else 0
+        return {
+            'likes_given': likes_given,
+            'passes_given': row['passes_given'] if row else 0,
+            'total_connections': total_connections,
+            'avg_compatibility': row['compatibility_sum'] / compatibility_count if compatibility_count else None,
+            'match_rate': (total_connections / likes_given) if likes_given > 0 else 0.0
+        }
+    
+    async def copy_impressions(self, impressions: List[Dict[str, Any]]):
+        """Bulk-load recommendation impressions with COPY (one round trip per batch)"""
+        if not self.pool:
+            raise RuntimeError("Database not connected")
+        
+        async with self.pool.acquire() as conn:
+            await conn.copy_records_to_table(
+                'recommendation_impressions',
+                columns=[
+                    'created_at', 'user_id', 'recommendation_type', 'algorithm_version',
+                    'candidate_ids', 'scores', 'latency_ms', 'metadata'
+                ],
+                records=[
+                    (
+                        i['created_at'], i['user_id'], i['recommendation_type'], i['algorithm_version'],
+                        i['candidate_ids'], i['scores'], i['latency_ms'], json.dumps(i['metadata'])
+                    )
+                    for i in impressions
+                ]
+            )
     
     async def update_user_activity(self, user_id: str):
         """Update user's last seen timestamp"""
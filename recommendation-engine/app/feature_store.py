@@ -0,0 +1,378 @@
+import os
+import glob
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+
+import numpy as np
+
+from .interning import user_ids
+from .memory import deep_size
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the array layout, the engine's _featurize output or the
+# interest order of the feature queries changes;
+# snapshots written under another version are ignored and rebuilt
+SNAPSHOT_FORMAT = 3
+SNAPSHOTS_ENABLED = os.getenv("FEATURE_SNAPSHOTS_ENABLED", "true").lower() == "true"
+
+def interests_key(interests) -> int:
+    """Order-sensitive 64-bit fingerprint of an interests list"""
+    digest = hashlib.blake2b("\x1f".join(map(str, interests or ())).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+class CampusFeatures:
+    """
+    Interest features for one campus, stored as arrays.
+
+    Row r belongs to ids[r], a UUID as 16 raw bytes. Its interest vector
+    is the CSR slice indptr[r]:indptr[r + 1] of (indices, weights) over
+    the store's vocabulary. Its category weights are row r of categories,
+    with category_mask marking the categories the profile matched at all.
+    interest_hashes[r] fingerprints the interests the row was computed from.
+    internal_ids[r] is its interned id, and row_index, indexed by interned
+    id, gives the row back (-1 for users not on this campus). Both are
+    rebuilt on load, since interned ids only mean something inside this
+    process; snapshots store the UUIDs.
+
+    weights and categories hold codes into the store's value table, uint8
+    while it has at most 256 entries, so a row takes a byte per weight
+    rather than eight. The table is exact, unlike a scale factor: features
+    read back are the ones featurizing would produce, and a candidate
+    scores the same whether or not the store had it.
+    """
+
+    ARRAYS = ("ids", "interest_hashes", "indptr", "indices", "weights", "categories", "category_mask")
+
+    def __init__(self, campus: str, category_names: List[str]):
+        self.campus = campus
+        self.category_names = category_names
+        self.internal_ids = np.zeros(0, dtype=np.int32)
+        self.row_index = np.zeros(0, dtype=np.int32)
+        self.watermark: Optional[datetime] = None  # Latest change the rows reflect
+        self.ids = np.zeros(0, dtype="V16")
+        self.interest_hashes = np.zeros(0, dtype=np.int64)
+        self.indptr = np.zeros(1, dtype=np.int32)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.uint8)
+        self.categories = np.zeros((0, len(category_names)), dtype=np.uint8)
+        self.category_mask = np.zeros((0, len(category_names)), dtype=bool)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes in process memory, and in memory-mapped snapshot files (page cache shared between workers)"""
+        arrays = [getattr(self, array) for array in self.ARRAYS]
+        return {
+            "arrays": sum(array.nbytes for array in arrays if not isinstance(array, np.memmap)),
+            "mapped": sum(array.nbytes for array in arrays if isinstance(array, np.memmap)),
+            "index": self.internal_ids.nbytes + self.row_index.nbytes
+        }
+
+    def row(self, internal_id: int) -> Optional[int]:
+        if internal_id >= len(self.row_index):
+            return None  # Interned after this campus was built
+        row = int(self.row_index[internal_id])
+        return row if row >= 0 else None
+
+    def index(self, internal_ids: np.ndarray):
+        """Set internal_ids (one per row, in row order) and rebuild row_index from them"""
+        self.internal_ids = internal_ids
+        self.row_index = np.full(int(internal_ids.max()) + 1 if len(internal_ids) else 0, -1, dtype=np.int32)
+        self.row_index[internal_ids] = np.arange(len(internal_ids), dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+class CampusFeatureStore:
+    """
+    Precomputed per-candidate interest features, per campus.
+
+    Loaded at warm-up so the engine can skip featurizing candidates it has
+    already seen. Entries are only used while the candidate's interests are
+    unchanged; anything else falls back to featurizing on the spot.
+
+    The arrays are also written to FEATURE_SNAPSHOT_DIR as .npy files. A
+    restarting worker memory-maps the newest snapshot instead of querying
+    every profile, then catches up on rows changed since each campus's
+    watermark. Workers on one host map the same files and share the pages.
+    """
+
+    def __init__(
+        self,
+        featurize: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+        category_names: List[str],
+        snapshot_dir: Optional[str] = None
+    ):
+        self.featurize = featurize
+        self.category_names = list(category_names)
+        self._category_index = {name: i for i, name in enumerate(self.category_names)}
+        self.vocabulary: List[str] = []
+        self._vocabulary_index: Dict[str, int] = {}
+        # Distinct weights; code 0 is 0.0, the weight of an unmatched category
+        self.values: List[float] = [0.0]
+        self._value_index: Dict[float, int] = {0.0: 0}
+        self._campuses: Dict[str, CampusFeatures] = {}
+
+        self.snapshot_dir = snapshot_dir or os.getenv(
+            "FEATURE_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "bitspark-features")
+        )
+        self.snapshot_keep = int(os.getenv("FEATURE_SNAPSHOT_KEEP", "3"))
+        self.snapshot_path: Optional[str] = None
+
+        self.hits = 0
+        self.misses = 0
+
+    async def load(self, db_manager, campuses: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Fill the store for the given (default: all active) campuses
+
+        Campuses found in the newest snapshot are restored from it and caught
+        up from their watermark; the rest are featurized from the database.
+        """
+        if campuses is None:
+            campuses = await db_manager.get_active_campuses()
+
+        restored = self.restore_snapshot() if SNAPSHOTS_ENABLED else 0
+        caught_up = 0
+        rebuilt = []
+        for campus in campuses:
+            start = time.perf_counter()
+            features = self._campuses.get(campus)
+            if features is not None:
+                rows = await db_manager.get_campus_feature_rows(campus, since=features.watermark)
+                if rows:
+                    self._campuses[campus] = self._merge(features, self._build(campus, rows))
+                    caught_up += len(rows)
+                    rebuilt.append(campus)
+                source = f"snapshot + {len(rows)} changed"
+            else:
+                rows = await db_manager.get_campus_feature_rows(campus)
+                self._campuses[campus] = self._build(campus, rows)
+                rebuilt.append(campus)
+                source = "database"
+            logger.info(
+                f"Feature store: {len(self._campuses[campus])} {campus} profiles from {source} "
+                f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+            )
+
+        if rebuilt and SNAPSHOTS_ENABLED:
+            try:
+                self.save_snapshot()
+            except Exception as e:
+                logger.error(f"Failed to write feature snapshot: {e}")
+
+        return {
+            "profiles": sum(len(self._campuses[campus]) for campus in campuses),
+            "restored_campuses": restored,
+            "caught_up_rows": caught_up
+        }
+
+    def get(self, candidate: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Stored features for a candidate row, or None if missing or stale"""
+        features = self._campuses.get(candidate.get('campus'))
+        row = features.row(candidate['internal_id']) if features is not None else None
+        if row is None or int(features.interest_hashes[row]) != interests_key(candidate.get('interests')):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        start, end = features.indptr[row], features.indptr[row + 1]
+        vocabulary = self.vocabulary
+        values = self.values
+        interest_vector = {
+            vocabulary[index]: values[code]
+            for index, code in zip(features.indices[start:end].tolist(), features.weights[start:end].tolist())
+        }
+        categories = features.categories[row].tolist()
+        mask = features.category_mask[row].tolist()
+        interest_categories = {
+            name: values[categories[i]]
+            for i, name in enumerate(self.category_names)
+            if mask[i]
+        }
+        return {'interest_vector': interest_vector, 'interest_categories': interest_categories}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "campuses": {campus: len(features) for campus, features in self._campuses.items()},
+            "vocabulary": len(self.vocabulary),
+            "values": len(self.values),
+            "snapshot": self.snapshot_path,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def save_snapshot(self) -> str:
+        """Write every campus to a new snapshot directory, published with an atomic rename"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        name = f"features-v{SNAPSHOT_FORMAT}-{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 10**9:09d}"
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.snapshot_dir)
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "created_at": datetime.utcnow().isoformat(),
+            "category_names": self.category_names,
+            "vocabulary": self.vocabulary,
+            "values": self.values,
+            "campuses": {}
+        }
+        try:
+            for i, (campus, features) in enumerate(self._campuses.items()):
+                prefix = f"campus{i}"
+                for array in CampusFeatures.ARRAYS:
+                    np.save(os.path.join(staging, f"{prefix}.{array}.npy"), getattr(features, array))
+                manifest["campuses"][campus] = {
+                    "prefix": prefix,
+                    "profiles": len(features),
+                    "watermark": features.watermark.isoformat() if features.watermark else None
+                }
+            with open(os.path.join(staging, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+
+            path = os.path.join(self.snapshot_dir, name)
+            os.rename(staging, path)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self.snapshot_path = path
+        self._prune()
+        logger.info(f"Wrote feature snapshot {path}")
+        return path
+
+    def restore_snapshot(self) -> int:
+        """Memory-map the newest compatible snapshot; returns the number of campuses restored"""
+        snapshots = sorted(glob.glob(os.path.join(self.snapshot_dir, f"features-v{SNAPSHOT_FORMAT}-*")))
+        if not snapshots:
+            return 0
+
+        path = snapshots[-1]
+        try:
+            with open(os.path.join(path, "manifest.json")) as f:
+                manifest = json.load(f)
+            if manifest["format"] != SNAPSHOT_FORMAT or manifest["category_names"] != self.category_names:
+                logger.warning(f"Feature snapshot {path} was built for other categories; ignoring it")
+                return 0
+
+            campuses = {}
+            for campus, entry in manifest["campuses"].items():
+                features = CampusFeatures(campus, self.category_names)
+                for array in CampusFeatures.ARRAYS:
+                    setattr(features, array, np.load(os.path.join(path, f"{entry['prefix']}.{array}.npy"), mmap_mode="r"))
+                features.index(user_ids.intern_many(uuid.UUID(bytes=raw) for raw in features.ids.tolist()))
+                features.watermark = datetime.fromisoformat(entry["watermark"]) if entry["watermark"] else None
+                campuses[campus] = features
+        except Exception as e:
+            logger.warning(f"Could not restore feature snapshot {path}: {e}")
+            return 0
+
+        self.vocabulary = list(manifest["vocabulary"])
+        self._vocabulary_index = {name: i for i, name in enumerate(self.vocabulary)}
+        self.values = list(manifest["values"])
+        self._value_index = {value: i for i, value in enumerate(self.values)}
+        self._campuses.update(campuses)
+        self.snapshot_path = path
+        logger.info(f"Restored {len(campuses)} campuses from feature snapshot {path}")
+        return len(campuses)
+
+    def _build(self, campus: str, rows: List[Dict[str, Any]]) -> CampusFeatures:
+        features = CampusFeatures(campus, self.category_names)
+        ids = []
+        internal_ids = []
+        hashes = []
+        indptr = [0]
+        indices: List[int] = []
+        weights: List[float] = []
+        categories = []
+        masks = []
+
+        for row in rows:
+            if row.get('changed_at') and (features.watermark is None or row['changed_at'] > features.watermark):
+                features.watermark = row['changed_at']
+
+            computed = self.featurize({'interests': row['interests']})
+            if computed is None:
+                continue  # Malformed interests; scoring handles these itself
+
+            for name, weight in computed['interest_vector'].items():
+                indices.append(self._vocabulary_id(name))
+                weights.append(self._value_id(weight))
+            indptr.append(len(indices))
+
+            vector = [0] * len(self.category_names)
+            mask = [False] * len(self.category_names)
+            for name, weight in computed['interest_categories'].items():
+                vector[self._category_index[name]] = self._value_id(weight)
+                mask[self._category_index[name]] = True
+            categories.append(vector)
+            masks.append(mask)
+
+            internal_ids.append(user_ids.intern(row['id']))
+            ids.append(uuid.UUID(str(row['id'])).bytes)
+            hashes.append(interests_key(row['interests']))
+
+        # Codes fit in a byte until the value table outgrows 256 entries
+        code_type = np.min_scalar_type(len(self.values) - 1)
+        features.ids = np.array(ids, dtype="V16")
+        features.index(np.array(internal_ids, dtype=np.int32))
+        features.interest_hashes = np.array(hashes, dtype=np.int64)
+        features.indptr = np.array(indptr, dtype=np.int32)
+        features.indices = np.array(indices, dtype=np.int32)
+        features.weights = np.array(weights, dtype=code_type)
+        if categories:
+            features.categories = np.array(categories, dtype=code_type)
+            features.category_mask = np.array(masks, dtype=bool)
+        return features
+
+    def _merge(self, base: CampusFeatures, update: CampusFeatures) -> CampusFeatures:
+        """Replace base's rows for every id in update, keeping the rest"""
+        keep = ~np.isin(base.internal_ids, update.internal_ids)
+        lengths = np.diff(base.indptr)
+
+        merged = CampusFeatures(base.campus, self.category_names)
+        merged.ids = np.concatenate([base.ids[keep], update.ids])
+        merged.interest_hashes = np.concatenate([base.interest_hashes[keep], update.interest_hashes])
+        merged.indptr = np.concatenate([[0], np.cumsum(np.concatenate([lengths[keep], np.diff(update.indptr)]))]).astype(np.int32)
+        merged.indices = np.concatenate([base.indices[np.repeat(keep, lengths)], update.indices])
+        merged.weights = np.concatenate([base.weights[np.repeat(keep, lengths)], update.weights])
+        merged.categories = np.concatenate([base.categories[keep], update.categories])
+        merged.category_mask = np.concatenate([base.category_mask[keep], update.category_mask])
+        merged.index(np.concatenate([base.internal_ids[keep], update.internal_ids]))
+        merged.watermark = max(filter(None, (base.watermark, update.watermark)), default=None)
+        return merged
+
+    def _prune(self):
+        """Keep only the newest snapshot_keep snapshots; mapped files stay valid after unlink"""
+        snapshots = sorted(glob.glob(os.path.join(self.snapshot_dir, "features-v*")))
+        for path in snapshots[:-self.snapshot_keep]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def memory_usage(self) -> Dict[str, int]:
+        usage = {"arrays": 0, "mapped": 0, "index": 0}
+        for features in self._campuses.values():
+            for part, size in features.memory_usage().items():
+                usage[part] += size
+        usage["vocabulary"] = deep_size(self.vocabulary) + deep_size(self._vocabulary_index)
+        return usage
+
+    def _value_id(self, value: float) -> int:
+        index = self._value_index.get(value)
+        if index is None:
+            index = len(self.values)
+            self._value_index[value] = index
+            self.values.append(value)
+        return index
+
+    def _vocabulary_id(self, name: str) -> int:
+        index = self._vocabulary_index.get(name)
+        if index is None:
+            index = len(self.vocabulary)
+            self._vocabulary_index[name] = index
+            self.vocabulary.append(name)
+        return index
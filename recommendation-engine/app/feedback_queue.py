@@ -0,0 +1,300 @@
+import asyncio
+import glob
+import logging
+import os
+import tempfile
+import uuid
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import asyncpg
+import orjson
+
+from .database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Errors the database raises for the events themselves (bad input, a violated
+# constraint); retrying them cannot succeed. Anything else is treated as transient.
+REJECTED_EVENT_ERRORS = (asyncpg.exceptions.DataError, asyncpg.exceptions.IntegrityConstraintViolationError)
+
+class FeedbackQueue:
+    """
+    Write-behind queue for swipe feedback.
+
+    Events are appended to a local write-ahead log and fsynced before the API
+    acknowledges them. A background task flushes them to the database in
+    batches through DatabaseManager.record_feedback_batch. WAL segments are
+    only deleted once their events are in the database, so anything still
+    queued at a crash or failed shutdown is replayed on the next start.
+
+    A batch the database rejects (REJECTED_EVENT_ERRORS) is split until the
+    events responsible are isolated. Those are appended to a dead-letter
+    file next to the WAL, which is never replayed, and the rest are written.
+    Other failures keep the whole batch queued for the next flush.
+    """
+
+    WAL_NAME = "feedback.wal"
+    DEAD_LETTER_NAME = "feedback-dead-letter.ndjson"
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        wal_dir: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None
+    ):
+        self.db = db_manager
+        self.wal_dir = wal_dir or os.getenv(
+            "FEEDBACK_WAL_DIR", os.path.join(tempfile.gettempdir(), "bitspark-feedback")
+        )
+        self.batch_size = batch_size or int(os.getenv("FEEDBACK_BATCH_SIZE", "500"))
+        self.flush_interval = flush_interval or int(os.getenv("FEEDBACK_FLUSH_INTERVAL_MS", "250")) / 1000
+
+        self._pending: List[Dict[str, Any]] = []
+        self._segments: List[str] = []  # Sealed WAL segments not yet in the database
+        self._segment_seq = 0
+        self._wal = None
+        self._lock = asyncio.Lock()  # Guards the WAL file and _pending
+        self._flush_lock = asyncio.Lock()
+        self._sync_future: Optional[asyncio.Future] = None
+        self._wake = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._running = False
+
+        self.flushed_events = 0
+        self.failed_flushes = 0
+        self.dead_lettered_events = 0
+
+    @property
+    def wal_path(self) -> str:
+        return os.path.join(self.wal_dir, self.WAL_NAME)
+
+    @property
+    def dead_letter_path(self) -> str:
+        return os.path.join(self.wal_dir, self.DEAD_LETTER_NAME)
+
+    async def start(self):
+        """Replay any WAL left by a previous process and start the flush loop"""
+        os.makedirs(self.wal_dir, exist_ok=True)
+
+        self._segments = sorted(glob.glob(os.path.join(self.wal_dir, "feedback-*.seg")))
+        if self._segments:
+            self._segment_seq = max(self._segment_number(path) for path in self._segments) + 1
+        if os.path.exists(self.wal_path) and os.path.getsize(self.wal_path) > 0:
+            self._segments.append(self._seal_path())
+            os.replace(self.wal_path, self._segments[-1])
+
+        for path in self._segments:
+            self._pending.extend(self._read_segment(path))
+        if self._pending:
+            logger.info(f"Recovered {len(self._pending)} queued feedback events from WAL")
+
+        self._wal = open(self.wal_path, "ab")
+        self._running = True
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Feedback queue started (WAL: {self.wal_dir}, batch size: {self.batch_size})")
+
+    async def enqueue(
+        self,
+        user_id: str,
+        target_user_id: str,
+        action: str,
+        context: Optional[Dict[str, Any]] = None,
+        mutual: Optional[bool] = None
+    ) -> str:
+        """
+        Durably queue a feedback event and return its id
+
+        mutual is the like graph's verdict on whether this event completes a
+        mutual like; leave it as None to have the database check instead.
+        """
+        if not self._running:
+            raise RuntimeError("Feedback queue not started")
+
+        event = {
+            'id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'target_user_id': target_user_id,
+            'action': action,
+            'context': context or {},
+            'created_at': datetime.utcnow()
+        }
+        if mutual is not None:
+            event['mutual'] = mutual
+
+        async with self._lock:
+            self._wal.write(orjson.dumps(event) + b"\n")
+            self._pending.append(event)
+            if self._sync_future is None:
+                # Group commit: everyone who writes before the next fsync shares it
+                self._sync_future = asyncio.get_running_loop().create_future()
+                asyncio.create_task(self._sync())
+            sync_future = self._sync_future
+
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+        await sync_future
+        return event['id']
+
+    async def flush(self) -> int:
+        """Write everything queued so far to the database; returns the event count"""
+        async with self._flush_lock:
+            async with self._lock:
+                if not self._pending:
+                    return 0
+                await self._seal()
+                events, self._pending = self._pending, []
+                segments, self._segments = self._segments, []
+
+            written = 0
+            try:
+                for start in range(0, len(events), self.batch_size):
+                    batch = events[start:start + self.batch_size]
+                    await self._write(batch)
+                    written += len(batch)
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(f"Feedback flush failed, {len(events) - written} events kept queued: {e}")
+                async with self._lock:
+                    # Keep the segments: replaying the written part is an idempotent upsert
+                    self._pending[:0] = events[written:]
+                    self._segments[:0] = segments
+                raise
+
+            for path in segments:
+                os.remove(path)
+            self.flushed_events += written
+            return written
+
+    async def drain(self):
+        """Stop the flush loop and write out everything still queued"""
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        if self._flush_task:
+            await self._flush_task
+
+        try:
+            await self.flush()
+        except Exception:
+            logger.error(f"{len(self._pending)} feedback events left in WAL for the next start")
+
+        async with self._lock:
+            if self._sync_future is not None:
+                await self._sync_locked()
+            self._wal.close()
+        logger.info("Feedback queue drained")
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        """Write a batch, splitting it when the database rejects it to dead-letter the bad events"""
+        try:
+            await self.db.record_feedback_batch(
+                batch,
+                mutual_known=all('mutual' in event for event in batch)
+            )
+        except REJECTED_EVENT_ERRORS as e:
+            if len(batch) == 1:
+                await self._dead_letter(batch[0], e)
+                return
+            middle = len(batch) // 2
+            await self._write(batch[:middle])
+            await self._write(batch[middle:])
+
+    async def _dead_letter(self, event: Dict[str, Any], error: Exception):
+        """Set aside an event the database will never accept, so it stops blocking the queue"""
+        record = orjson.dumps({**event, 'error': str(error)}) + b"\n"
+
+        def append():
+            with open(self.dead_letter_path, "ab") as f:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+
+        await asyncio.to_thread(append)
+        self.dead_lettered_events += 1
+        logger.error(
+            f"Feedback event {event.get('id')} rejected by the database, moved to {self.dead_letter_path}: {error}"
+        )
+
+    def queued_events(self) -> List[Dict[str, Any]]:
+        """Events accepted but not yet written to the database"""
+        return list(self._pending)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and flush counters"""
+        return {
+            "pending": len(self._pending),
+            "wal_segments": len(self._segments),
+            "flushed_events": self.flushed_events,
+            "failed_flushes": self.failed_flushes,
+            "dead_lettered_events": self.dead_lettered_events
+        }
+
+    async def _flush_loop(self):
+        while self._running:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self._running:
+                break
+            try:
+                await self.flush()
+            except Exception:
+                # Already logged; retry on the next tick
+                await asyncio.sleep(self.flush_interval)
+
+    async def _sync(self):
+        async with self._lock:
+            if self._sync_future is not None:
+                await self._sync_locked()
+
+    async def _sync_locked(self):
+        """fsync the active WAL and release everyone waiting on it (caller holds _lock)"""
+        future, self._sync_future = self._sync_future, None
+        try:
+            self._wal.flush()
+            await asyncio.to_thread(os.fsync, self._wal.fileno())
+            future.set_result(None)
+        except Exception as e:
+            logger.error(f"Feedback WAL sync failed: {e}")
+            future.set_exception(e)
+
+    async def _seal(self):
+        """Rotate the active WAL into a segment (caller holds _lock)"""
+        if self._sync_future is not None:
+            await self._sync_locked()
+        if self._wal.tell() == 0:
+            return
+        self._wal.close()
+        self._segments.append(self._seal_path())
+        os.replace(self.wal_path, self._segments[-1])
+        self._wal = open(self.wal_path, "ab")
+
+    def _seal_path(self) -> str:
+        path = os.path.join(self.wal_dir, f"feedback-{self._segment_seq:012d}.seg")
+        self._segment_seq += 1
+        return path
+
+    @staticmethod
+    def _segment_number(path: str) -> int:
+        return int(os.path.basename(path)[len("feedback-"):-len(".seg")])
+
+    @staticmethod
+    def _read_segment(path: str) -> List[Dict[str, Any]]:
+        events = []
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    event = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # Torn write at the tail of a crashed WAL; it was never acknowledged
+                    logger.warning(f"Skipping unreadable feedback WAL record in {path}")
+                    continue
+                event['created_at'] = datetime.fromisoformat(event['created_at'])
+                events.append(event)
+        return events
@@ -0,0 +1,278 @@
+import copy
+import math
+import uuid
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from .models import RecommendationType
+from .geo import bounding_box
+from .interning import user_ids
+
+logger = logging.getLogger(__name__)
+
+# Matches the scorer's "score > 0.3" cut when no filters are sent
+DEFAULT_MIN_SCORE = 0.3
+ACTIVE_WINDOW_DAYS = 30
+ACTIVE_RECENTLY_DAYS = 7  # RecommendationFilters.active_recently
+
+# Smoking values the no_smoking dealbreaker penalizes (RecommendationEngine._check_dealbreakers)
+SMOKING_DEALBREAKER = ('regularly', 'socially')
+
+# UserPreferences.max_distance default
+DEFAULT_MAX_DISTANCE_KM = 50
+
+# Connection states that take a candidate out of the pool
+EXCLUDED_CONNECTION_STATUSES = ('accepted', 'pending', 'blocked')
+
+class CandidateQuery:
+    """
+    Retrieval predicates for one user's candidate fetch.
+
+    Compiled from RecommendationFilters and the user's own preferences, and
+    rendered either as SQL (DatabaseManager) or as a row predicate (the
+    in-memory stand-in and anything else filtering rows in Python). Only
+    predicates that cannot change the ranking are pushed down: candidates
+    the scorer would drop anyway (the age-range hard dealbreaker, or
+    no_smoking together with a food dealbreaker, whose penalties add up to
+    a score of 0) and the explicit filters. min_score is not a retrieval
+    predicate; the engine uses it as the scoring threshold.
+
+    near is (latitude, longitude, radius_km). Retrieval only applies its
+    bounding box (plus include_ids, interned ids from when the engine's geo
+    index narrowed the campus down to a few candidates); the exact distance
+    is checked on the rows.
+    """
+
+    __slots__ = (
+        "user_id", "campuses", "active_since", "exclude_ids", "age_range",
+        "gender", "food_dealbreaker", "min_score", "near", "include_ids"
+    )
+
+    def __init__(
+        self,
+        user_id: str,
+        campuses: List[str],
+        active_since: datetime,
+        exclude_ids: Optional[List[str]] = None,
+        age_range: Optional[Tuple[int, int]] = None,
+        gender: Optional[str] = None,
+        food_dealbreaker: Optional[str] = None,
+        min_score: float = DEFAULT_MIN_SCORE,
+        near: Optional[Tuple[float, float, float]] = None,
+        include_ids: Optional[Set[int]] = None
+    ):
+        self.user_id = user_id
+        self.campuses = campuses
+        self.active_since = active_since
+        self.exclude_ids = exclude_ids or []
+        self.age_range = age_range  # Inclusive; NULL/0 ages pass, as in the scorer
+        self.gender = gender
+        self.food_dealbreaker = food_dealbreaker  # Set only together with no_smoking
+        self.min_score = min_score
+        self.near = near
+        self.include_ids = include_ids  # None = no id restriction
+
+    def for_campus(self, campus: str) -> "CandidateQuery":
+        """The same query restricted to one campus shard"""
+        shard = copy.copy(self)
+        shard.campuses = [campus]
+        return shard
+
+    @property
+    def index(self) -> str:
+        """Partial index this query shape is written for; the planner still has the final say"""
+        if self.gender is not None and len(self.campuses) == 1:
+            return "idx_users_candidates_campus_gender"
+        if len(self.campuses) == 1:
+            return "idx_users_candidates_campus"
+        return "idx_users_candidates_recent"
+
+    def to_sql(self, limit: int) -> Tuple[str, List[Any]]:
+        """
+        Candidate query and its parameters
+
+        The inner query only touches users and walks the partial index in
+        last_seen order until it has `limit` rows; interests are aggregated
+        for those rows only.
+        """
+        params: List[Any] = [self.user_id]
+
+        def param(value: Any, cast: str = "") -> str:
+            params.append(value)
+            return f"${len(params)}{cast}"
+
+        predicates = [
+            "u.id <> $1::uuid",
+            "u.is_active = true",
+            "u.verified = true",
+            "u.profile_completed = true",
+        ]
+        if len(self.campuses) == 1:
+            predicates.append(f"u.campus = {param(self.campuses[0])}")
+        else:
+            predicates.append(f"u.campus = ANY({param(self.campuses, '::text[]')})")
+        if self.gender is not None:
+            predicates.append(f"u.gender = {param(self.gender)}")
+        predicates.append(f"u.last_seen > {param(self.active_since)}")
+        if self.exclude_ids:
+            predicates.append(f"u.id <> ALL({param(self.exclude_ids, '::uuid[]')})")
+        if self.include_ids is not None:
+            predicates.append(f"u.id = ANY({param(user_ids.uuids(self.include_ids), '::uuid[]')})")
+        if self.near is not None:
+            lat_min, lat_max, lon_min, lon_max = bounding_box(*self.near)
+            predicates.append(f"u.latitude BETWEEN {param(lat_min)} AND {param(lat_max)}")
+            predicates.append(f"u.longitude BETWEEN {param(lon_min)} AND {param(lon_max)}")
+        if self.age_range is not None:
+            low, high = param(self.age_range[0]), param(self.age_range[1])
+            predicates.append(f"(u.age IS NULL OR u.age = 0 OR u.age BETWEEN {low} AND {high})")
+        if self.food_dealbreaker is not None:
+            predicates.append(
+                f"NOT (COALESCE(u.smoking, '') IN ('regularly', 'socially')"
+                f" AND COALESCE(u.food_preference, '') NOT IN ('', {param(self.food_dealbreaker)}))"
+            )
+        statuses = param(list(EXCLUDED_CONNECTION_STATUSES), "::text[]")
+        predicates.append(
+            "NOT EXISTS (SELECT 1 FROM connections c WHERE c.user1_id = $1::uuid "
+            f"AND c.user2_id = u.id AND c.status = ANY({statuses}))"
+        )
+        predicates.append(
+            "NOT EXISTS (SELECT 1 FROM connections c WHERE c.user2_id = $1::uuid "
+            f"AND c.user1_id = u.id AND c.status = ANY({statuses}))"
+        )
+
+        where = "\n                      AND ".join(predicates)
+        query = f"""
+            WITH candidate_ids AS (
+                SELECT u.id
+                FROM users u
+                WHERE {where}
+                ORDER BY u.last_seen DESC, u.id
+                LIMIT {param(limit)}
+            )
+            SELECT u.*,
+                   COALESCE(
+                       array_agg(ui.interest ORDER BY ui.interest) FILTER (WHERE ui.interest IS NOT NULL),
+                       ARRAY[]::text[]
+                   ) as interests,
+                   COALESCE(
+                       array_agg(ui.weight ORDER BY ui.interest) FILTER (WHERE ui.weight IS NOT NULL),
+                       ARRAY[]::decimal[]
+                   ) as interest_weights
+            FROM candidate_ids c
+            JOIN users u ON u.id = c.id
+            LEFT JOIN user_interests ui ON u.id = ui.user_id
+            GROUP BY u.id
+            ORDER BY u.last_seen DESC, u.id
+        """
+        return query, params
+
+    def matches(self, candidate: Dict[str, Any]) -> bool:
+        """Row-level form of the WHERE clause (connections are checked by the caller)"""
+        if str(candidate['id']) == self.user_id or str(candidate['id']) in self.exclude_ids:
+            return False
+        if not (candidate.get('is_active') and candidate.get('verified') and candidate.get('profile_completed')):
+            return False
+        if candidate.get('campus') not in self.campuses:
+            return False
+        if self.gender is not None and candidate.get('gender') != self.gender:
+            return False
+        if self.include_ids is not None and candidate['internal_id'] not in self.include_ids:
+            return False
+        if self.near is not None:
+            lat_min, lat_max, lon_min, lon_max = bounding_box(*self.near)
+            lat, lon = candidate.get('latitude'), candidate.get('longitude')
+            if lat is None or lon is None or not (lat_min <= lat <= lat_max and lon_min <= lon <= lon_max):
+                return False
+        last_seen = candidate.get('last_seen')
+        if last_seen is None or last_seen <= self.active_since:
+            return False
+        age = candidate.get('age')
+        if self.age_range is not None and age and not self.age_range[0] <= age <= self.age_range[1]:
+            return False
+        if (
+            self.food_dealbreaker is not None
+            and candidate.get('smoking') in SMOKING_DEALBREAKER
+            and candidate.get('food_preference')
+            and candidate.get('food_preference') != self.food_dealbreaker
+        ):
+            return False
+        return True
+
+def _uuid_strings(values: List[Any]) -> List[str]:
+    """Keep the ids that can match a uuid column (anything else cannot be excluded anyway)"""
+    ids = []
+    for value in values:
+        try:
+            ids.append(str(uuid.UUID(str(value))))
+        except ValueError:
+            continue
+    return ids
+
+def _age_bounds(age_range: Any) -> Optional[Tuple[int, int]]:
+    """Integer bounds equivalent to the scorer's check on integer ages, or None if unusable"""
+    if not isinstance(age_range, (list, tuple)) or len(age_range) != 2:
+        return None
+    low, high = age_range
+    if not all(isinstance(bound, (int, float)) and not isinstance(bound, bool) for bound in (low, high)):
+        return None
+    return math.ceil(low), math.floor(high)
+
+def compile_candidate_query(
+    user_profile: Dict[str, Any],
+    recommendation_type: RecommendationType,
+    filters: Optional[Dict[str, Any]] = None
+) -> CandidateQuery:
+    """
+    Translate RecommendationFilters and the user's preferences into a CandidateQuery
+
+    Without filters the query is the long-standing default: the user's own
+    campus, active in the last 30 days. Verified candidates only, always.
+    """
+    filters = filters or {}
+
+    campuses = filters.get('campus_filter') or ([user_profile['campus']] if user_profile.get('campus') else [])
+    campuses = [getattr(campus, 'value', campus) for campus in campuses]
+
+    window = ACTIVE_RECENTLY_DAYS if filters.get('active_recently') else ACTIVE_WINDOW_DAYS
+    active_since = datetime.now(timezone.utc) - timedelta(days=window)
+
+    min_score = filters.get('min_compatibility_score')
+    query = CandidateQuery(
+        user_id=str(user_profile['id']),
+        campuses=campuses,
+        active_since=active_since,
+        exclude_ids=_uuid_strings(filters.get('exclude_user_ids') or []),
+        min_score=DEFAULT_MIN_SCORE if min_score is None else min_score
+    )
+
+    preferences = user_profile.get('preferences', {})
+
+    # Needs the user's own location; without it there is nothing to measure from
+    if filters.get('nearby_only') and user_profile.get('latitude') is not None and user_profile.get('longitude') is not None:
+        max_distance = preferences.get('max_distance') if isinstance(preferences, dict) else None
+        if not isinstance(max_distance, (int, float)) or isinstance(max_distance, bool) or max_distance <= 0:
+            max_distance = DEFAULT_MAX_DISTANCE_KM
+        query.near = (float(user_profile['latitude']), float(user_profile['longitude']), float(max_distance))
+
+    if not isinstance(preferences, dict):
+        # The scorer cannot read these either; leave everything to it
+        return query
+
+    # Same default as _check_dealbreakers; every candidate outside it scores 0
+    query.age_range = _age_bounds(preferences.get('age_range', [18, 30]))
+
+    dealbreakers = preferences.get('dealbreakers', {})
+    if (
+        isinstance(dealbreakers, dict)
+        and dealbreakers.get('no_smoking')
+        and isinstance(dealbreakers.get('food_preference'), str)
+        and dealbreakers['food_preference']
+    ):
+        # 0.8 + 0.6 is clamped to a full penalty
+        query.food_dealbreaker = dealbreakers['food_preference']
+
+    if recommendation_type == RecommendationType.DATING and preferences.get('gender_preference'):
+        query.gender = getattr(preferences['gender_preference'], 'value', preferences['gender_preference'])
+
+    return query
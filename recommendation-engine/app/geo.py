@@ -0,0 +1,188 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .interning import user_ids
+from .memory import deep_size
+
+logger = logging.getLogger(__name__)
+
+GEO_INDEX_ENABLED = os.getenv("GEO_INDEX_ENABLED", "true").lower() == "true"
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180  # Along a meridian
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance from (lat, lon) to every point, in km (NaN where a coordinate is missing)"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(lat_min, lat_max, lon_min, lon_max) enclosing every point within radius_km"""
+    lat_span = radius_km / KM_PER_DEGREE
+    widest = min(89.0, abs(lat) + lat_span)  # Where a degree of longitude is shortest
+    lon_span = min(180.0, lat_span / math.cos(math.radians(widest)))
+    return lat - lat_span, lat + lat_span, lon - lon_span, lon + lon_span
+
+def coordinates(rows: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(latitudes, longitudes) of profile rows as float arrays, NaN where missing"""
+    lats = np.array([row.get('latitude') for row in rows], dtype=np.float64)
+    lons = np.array([row.get('longitude') for row in rows], dtype=np.float64)
+    return lats, lons
+
+class GeoGrid:
+    """
+    Uniform grid over one campus's candidate coordinates.
+
+    Points are sorted by cell, so each occupied cell is a contiguous slice of
+    the (ids, lats, lons) arrays. A radius query visits only the cells that
+    overlap the query's bounding box and runs one vectorized haversine over
+    the points in them, so its cost follows the number of nearby candidates
+    rather than the campus size. Cells are cell_km high; their width in km
+    shrinks with cos(latitude), which only makes the box cover a few more
+    cells than strictly needed.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]], cell_km: float):
+        self.cell = cell_km / KM_PER_DEGREE  # Degrees per cell, both axes
+        lats, lons = coordinates(rows)
+        located = ~(np.isnan(lats) | np.isnan(lons))
+        ids = user_ids.intern_many(row['id'] for row in rows)[located]
+        lats, lons = lats[located], lons[located]
+
+        cell_rows = np.floor(lats / self.cell).astype(np.int64)
+        cell_cols = np.floor(lons / self.cell).astype(np.int64)
+        order = np.lexsort((cell_cols, cell_rows))
+        self.ids = ids[order]
+        self.lats = lats[order]
+        self.lons = lons[order]
+        cell_rows, cell_cols = cell_rows[order], cell_cols[order]
+
+        # (row, col) -> (start, end) into the sorted arrays
+        self._cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        if len(self.ids):
+            boundaries = np.flatnonzero((np.diff(cell_rows) != 0) | (np.diff(cell_cols) != 0)) + 1
+            starts = np.concatenate([[0], boundaries])
+            ends = np.concatenate([boundaries, [len(self.ids)]])
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                self._cells[(int(cell_rows[start]), int(cell_cols[start]))] = (start, end)
+
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def cells(self) -> int:
+        return len(self._cells)
+
+    def memory_usage(self) -> int:
+        return self.ids.nbytes + self.lats.nbytes + self.lons.nbytes + deep_size(self._cells)
+
+    def within(self, lat: float, lon: float, radius_km: float) -> Dict[int, float]:
+        """Interned candidate id -> distance in km for every point within radius_km of (lat, lon)"""
+        lat_min, lat_max, lon_min, lon_max = bounding_box(lat, lon, radius_km)
+        row_range = range(math.floor(lat_min / self.cell), math.floor(lat_max / self.cell) + 1)
+        col_range = range(math.floor(lon_min / self.cell), math.floor(lon_max / self.cell) + 1)
+        if len(row_range) * len(col_range) <= len(self._cells):
+            slices = [
+                self._cells[(row, col)]
+                for row in row_range for col in col_range
+                if (row, col) in self._cells
+            ]
+        else:
+            # A radius wider than the campus: walk the occupied cells instead
+            slices = [
+                bounds for (row, col), bounds in self._cells.items()
+                if row in row_range and col in col_range
+            ]
+        if not slices:
+            return {}
+
+        index = np.concatenate([np.arange(start, end) for start, end in slices])
+        distances = haversine_km(lat, lon, self.lats[index], self.lons[index])
+        inside = distances <= radius_km
+        return dict(zip(self.ids[index][inside].tolist(), distances[inside].tolist()))
+
+class CampusGeoIndex:
+    """
+    In-memory spatial index of candidate locations, one GeoGrid per campus.
+
+    Loaded at warm-up from the users' latitude/longitude columns. A grid
+    older than GEO_INDEX_REFRESH_MS is rebuilt in the background on its next
+    lookup while the old one keeps answering. Candidates that moved since
+    are caught by the exact distance check on the fetched rows; ones that
+    joined since only show up after the refresh.
+    """
+
+    def __init__(self, db_manager, cell_km: Optional[float] = None, refresh: Optional[float] = None):
+        self.db = db_manager
+        self.enabled = GEO_INDEX_ENABLED
+        self.cell_km = cell_km or float(os.getenv("GEO_GRID_CELL_KM", "2"))
+        self.refresh = refresh or int(os.getenv("GEO_INDEX_REFRESH_MS", "300000")) / 1000
+        self._grids: Dict[str, GeoGrid] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+        self.lookups = 0
+        self.unindexed = 0
+
+    async def load(self, campuses: Optional[List[str]] = None) -> Dict[str, int]:
+        """Build the grids for the given (default: all active) campuses"""
+        if not self.enabled:
+            return {}
+        if campuses is None:
+            campuses = await self.db.get_active_campuses()
+        for campus in campuses:
+            await self._build(campus)
+        return {campus: len(self._grids[campus]) for campus in campuses if campus in self._grids}
+
+    def nearby(self, campus: str, lat: float, lon: float, radius_km: float) -> Optional[Dict[int, float]]:
+        """Interned candidate id -> distance within radius_km, or None when the campus is not indexed"""
+        grid = self._grids.get(campus) if self.enabled else None
+        if grid is None:
+            self.unindexed += 1
+            return None
+
+        self.lookups += 1
+        if time.monotonic() - grid.built_at > self.refresh and campus not in self._refreshing:
+            task = asyncio.ensure_future(self._build(campus))
+            self._refreshing[campus] = task
+            task.add_done_callback(lambda done, campus=campus: self._refreshing.pop(campus, None))
+        return grid.within(lat, lon, radius_km)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "cell_km": self.cell_km,
+            "campuses": {
+                campus: {"points": len(grid), "cells": grid.cells, "age_seconds": round(time.monotonic() - grid.built_at, 1)}
+                for campus, grid in self._grids.items()
+            },
+            "lookups": self.lookups,
+            "unindexed_lookups": self.unindexed
+        }
+
+    def memory_usage(self) -> Dict[str, int]:
+        return {"grids": sum(grid.memory_usage() for grid in self._grids.values())}
+
+    async def _build(self, campus: str):
+        start = time.perf_counter()
+        try:
+            rows = await self.db.get_campus_locations(campus)
+        except Exception as e:
+            logger.warning(f"Geo index: could not load {campus} locations: {e}")
+            if campus in self._grids:
+                self._grids[campus].built_at = time.monotonic()  # Keep serving it; retry after another interval
+            return
+        self._grids[campus] = GeoGrid(rows, self.cell_km)
+        logger.info(
+            f"Geo index: {len(self._grids[campus])} {campus} locations "
+            f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
@@ -0,0 +1,98 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from .database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+class HealthMonitor:
+    """
+    Background database probe behind the health endpoints.
+
+    Every interval it runs the pool's SELECT 1, times it, and reads the pool
+    size and the planner's estimate of the users table from pg_class. The
+    health endpoints serve the last result, so a probe from Render or Docker
+    never touches the database. A result older than max_age is reported as
+    stale and treated as unhealthy.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, interval: Optional[float] = None):
+        self.db = db_manager
+        self.interval = interval or int(os.getenv("HEALTH_PROBE_INTERVAL_MS", "5000")) / 1000
+        self.max_age = self.interval * 3
+
+        self.healthy: Optional[bool] = None  # None until the first probe finishes
+        self.latency_ms: Optional[float] = None
+        self.user_count: Optional[int] = None
+        self.pool: Dict[str, int] = {}
+        self.checked_at: Optional[datetime] = None
+        self.consecutive_failures = 0
+        self.error: Optional[str] = None
+
+        self._checked_monotonic: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Probe every interval in the background"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def probe(self):
+        """Run one probe and cache its result"""
+        start = time.perf_counter()
+        try:
+            healthy = await self.db.health_check()
+            self.latency_ms = (time.perf_counter() - start) * 1000
+            if healthy:
+                self.user_count = await self.db.estimate_user_count()
+            self.error = None if healthy else "Database connection failed"
+        except Exception as e:
+            healthy = False
+            self.latency_ms = None
+            self.error = str(e)
+
+        self.healthy = healthy
+        self.consecutive_failures = 0 if healthy else self.consecutive_failures + 1
+        self.pool = self.db.pool_stats()
+        self.checked_at = datetime.utcnow()
+        self._checked_monotonic = time.monotonic()
+
+    @property
+    def stale(self) -> bool:
+        return self._checked_monotonic is None or time.monotonic() - self._checked_monotonic > self.max_age
+
+    @property
+    def database_ok(self) -> bool:
+        return bool(self.healthy) and not self.stale
+
+    def status(self) -> Dict[str, Any]:
+        """Cached result of the last probe"""
+        return {
+            "healthy": self.database_ok,
+            "stale": self.stale,
+            "latency_ms": round(self.latency_ms, 2) if self.latency_ms is not None else None,
+            "user_count": self.user_count,
+            "pool": self.pool,
+            "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+            "consecutive_failures": self.consecutive_failures,
+            "error": self.error
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.probe()
+            if self.consecutive_failures == 1:
+                logger.error(f"Database health probe failed: {self.error}")
@@ -0,0 +1,71 @@
+import sys
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+
+# Ids are stored in int32 arrays
+MAX_USERS = 2 ** 31 - 1
+
+class UserIdTable:
+    """
+    Process-wide mapping of user UUIDs to dense int32 ids.
+
+    Ids are handed out in first-seen order and never reused, so they can
+    index arrays and be kept in sets and dict keys in place of 36-character
+    strings. Rows are interned where they come out of the database
+    (the candidate's 'internal_id'); everything inside the engine keys on
+    that, and the UUID is only looked up again for SQL parameters and
+    responses. The ids mean nothing outside this process: never persist
+    them or send them to a client.
+
+    Only ids the database has returned, or that belong to authenticated
+    users, should be interned. Ids taken from request bodies go through
+    find(), which never grows the table. The one exception is a liked
+    feedback target, which is interned only after it parses as a UUID,
+    under the per-user feedback rate limit.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._uuids: List[str] = []
+
+    def intern(self, user_id: Any) -> int:
+        """Dense id for a UUID (str or uuid.UUID), assigning the next one on first sight"""
+        key = str(user_id)
+        internal_id = self._ids.get(key)
+        if internal_id is None:
+            internal_id = len(self._uuids)
+            if internal_id >= MAX_USERS:
+                raise OverflowError("User id table is full")
+            self._ids[key] = internal_id
+            self._uuids.append(key)
+        return internal_id
+
+    def intern_many(self, user_ids: Iterable[Any]) -> np.ndarray:
+        """intern() over a sequence, as an int32 array"""
+        return np.fromiter((self.intern(user_id) for user_id in user_ids), dtype=np.int32)
+
+    def find(self, user_id: Any) -> Optional[int]:
+        """Dense id for a UUID that has already been interned, else None"""
+        return self._ids.get(str(user_id))
+
+    def uuid(self, internal_id: int) -> str:
+        return self._uuids[internal_id]
+
+    def uuids(self, internal_ids: Iterable[int]) -> List[str]:
+        uuids = self._uuids
+        return [uuids[internal_id] for internal_id in internal_ids]
+
+    def __len__(self) -> int:
+        return len(self._uuids)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"users": len(self._uuids)}
+
+    def memory_usage(self) -> Dict[str, int]:
+        """The two tables plus one UUID string and one int per user"""
+        per_user = sys.getsizeof(self._uuids[0]) + sys.getsizeof(MAX_USERS) if self._uuids else 0
+        return {"table": sys.getsizeof(self._ids) + sys.getsizeof(self._uuids) + per_user * len(self._uuids)}
+
+# Shared by every component of the process, so their ids agree
+user_ids = UserIdTable()
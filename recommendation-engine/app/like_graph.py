@@ -0,0 +1,109 @@
+import sys
+import uuid
+import logging
+from typing import Dict, Any, Set
+
+from .database import DatabaseManager
+from .interning import user_ids
+
+logger = logging.getLogger(__name__)
+
+POSITIVE_ACTIONS = ('like', 'super_like')
+
+class LikeGraph:
+    """
+    In-memory directed like graph.
+
+    Nodes are interned user ids and every node keeps an adjacency set of
+    the users it likes and of the users who like it, so the mutual-like
+    check on the feedback path is a set membership test instead of a query
+    against user_feedback.
+    """
+
+    def __init__(self):
+        self._likes: Dict[int, Set[int]] = {}
+        self._liked_by: Dict[int, Set[int]] = {}
+        self.loaded = False
+
+    async def load(self, db_manager: DatabaseManager):
+        """Build the graph from the likes stored in user_feedback"""
+        edges = await db_manager.get_like_edges()
+        for user_id, target_user_id in edges:
+            self._add(user_ids.intern(user_id), user_ids.intern(target_user_id))
+        self.loaded = True
+        logger.info(f"Like graph loaded: {self._users()} users, {len(edges)} likes")
+
+    def record(self, user_id: str, target_user_id: str, action: str) -> bool:
+        """
+        Apply a feedback action and return True if it completes a mutual like
+
+        Any action other than like/super_like replaces an earlier like, the same
+        way the user_feedback upsert does. Liking yourself is never mutual.
+        target_user_id comes from the request body: it is only interned once
+        it parses as a UUID (ValueError otherwise), and only for a like.
+        """
+        node = user_ids.intern(user_id)
+        target = user_ids.find(target_user_id)
+
+        if action not in POSITIVE_ACTIONS:
+            if target is not None:
+                self._likes.get(node, set()).discard(target)
+                self._liked_by.get(target, set()).discard(node)
+            return False
+
+        if target is None:
+            # Never seen in this process; the reverse like may still arrive later, so keep the edge
+            target = user_ids.intern(str(uuid.UUID(target_user_id)))
+
+        self._add(node, target)
+        return node != target and node in self._likes.get(target, ())
+
+    def restore(self, user_id: str, target_user_id: str, liked: bool):
+        """Put user_id's like of target back to what it was before record() (the event was not queued)"""
+        node = user_ids.find(user_id)
+        target = user_ids.find(target_user_id)
+        if node is None or target is None:
+            return
+        if liked:
+            self._add(node, target)
+        else:
+            self._likes.get(node, set()).discard(target)
+            self._liked_by.get(target, set()).discard(node)
+
+    def has_like(self, user_id: str, target_user_id: str) -> bool:
+        node = user_ids.find(user_id)
+        target = user_ids.find(target_user_id)
+        if node is None or target is None:
+            return False
+        return target in self._likes.get(node, ())
+
+    def is_mutual(self, user_id: str, target_user_id: str) -> bool:
+        return self.has_like(user_id, target_user_id) and self.has_like(target_user_id, user_id)
+
+    def liked_by(self, user_id: str) -> Set[int]:
+        """Interned ids of the users who have liked user_id (for "liked you" signals in ranking)"""
+        node = user_ids.find(user_id)
+        if node is None:
+            return set()
+        return set(self._liked_by.get(node, ()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "users": self._users(),
+            "likes": sum(len(targets) for targets in self._likes.values())
+        }
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Dicts and adjacency sets; the node ids in them belong to the id table"""
+        adjacency = sys.getsizeof(self._likes) + sys.getsizeof(self._liked_by)
+        adjacency += sum(sys.getsizeof(targets) for targets in self._likes.values())
+        adjacency += sum(sys.getsizeof(sources) for sources in self._liked_by.values())
+        return {"adjacency": adjacency}
+
+    def _users(self) -> int:
+        return len(self._likes.keys() | self._liked_by.keys())
+
+    def _add(self, node: int, target: int):
+        self._likes.setdefault(node, set()).add(target)
+        self._liked_by.setdefault(target, set()).add(node)
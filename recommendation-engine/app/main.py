@@ -2,7 +2,7 @@ from fastapi import FastAPI, HTTPException, Depends, Security, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -10,13 +10,25 @@ from slowapi.errors import RateLimitExceeded
 import os
 from dotenv import load_dotenv
 import logging
+import time
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
-from .models import RecommendationRequest, RecommendationResponse, UserFeedback
+from .models import RecommendationRequest, RecommendationResponse, UserFeedback, ProfilingConfig, BulkStatsRequest
 from .recommendation_engine import RecommendationEngine
 from .database import DatabaseManager
-from .auth import verify_supabase_jwt, get_current_user_from_jwt
+from .feedback_queue import FeedbackQueue
+from .analytics import ImpressionSink
+from .like_graph import LikeGraph
+from .auth import verify_supabase_jwt, get_current_user_from_jwt, verify_admin_key, is_metrics_token
+from .serialization import FAST_SERIALIZATION, encode_response, recommendation_payload
+from .metrics import METRICS_ENABLED, PROMETHEUS_CONTENT_TYPE, observe_stage, render_latest
+from .profiling import RequestProfiler
+from .warmup import WarmupManager
+from .health import HealthMonitor
+from .rate_limit import UserRateLimiter
+from .interning import user_ids
+from .memory import MemoryBudget
 
 # Load environment variables
 load_dotenv()
@@ -45,7 +57,7 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         
         return response
 
-# Rate limiter with memory storage for free tier
+# Per-address limiter for the public endpoints; authenticated endpoints are limited per user
 limiter = Limiter(key_func=get_remote_address, storage_uri="memory://")
 
 # Initialize FastAPI app
@@ -87,14 +99,29 @@ app.add_middleware(
 try:
     db_manager = DatabaseManager()
     recommendation_engine = RecommendationEngine(db_manager)
+    feedback_queue = FeedbackQueue(db_manager)
+    impression_sink = ImpressionSink(db_manager)
+    like_graph = LikeGraph()
+    request_profiler = RequestProfiler()
+    warmup = WarmupManager(db_manager, recommendation_engine)
+    health_monitor = HealthMonitor(db_manager)
+    rate_limiter = UserRateLimiter()
+    memory_budget = MemoryBudget()
+    memory_budget.register("feature_store", recommendation_engine.feature_store.memory_usage)
+    memory_budget.register("geo_index", recommendation_engine.geo_index.memory_usage)
+    memory_budget.register("result_cache", recommendation_engine.result_cache.memory_usage)
+    memory_budget.register("learner", recommendation_engine.learner.memory_usage)
+    memory_budget.register("like_graph", like_graph.memory_usage)
+    memory_budget.register("user_ids", user_ids.memory_usage)
+    memory_budget.register("rate_limits", rate_limiter.memory_usage)
     logger.info("✅ Services initialized successfully")
 except Exception as e:
     logger.error(f"❌ Failed to initialize services: {str(e)}")
     raise
 
 # Authentication dependency
-async def get_current_user(request: Request) -> Dict[str, Any]:
-    """Enhanced authentication with detailed user data"""
+async def authenticate(request: Request) -> Dict[str, Any]:
+    """Verify the bearer token; returns the JWT claims without touching the database"""
     try:
         # Extract token from Authorization header
         auth_header = request.headers.get("Authorization")
@@ -115,15 +142,6 @@ async def get_current_user(request: Request) -> Dict[str, Any]:
                 detail="Invalid or expired token"
             )
         
-        # Get additional user profile data from database
-        try:
-            profile_data = await db_manager.get_user_profile(user_data["user_id"])
-            if profile_data:
-                user_data["profile"] = profile_data
-        except Exception as e:
-            logger.warning(f"Could not fetch profile for user {user_data.get('user_id')}: {str(e)}")
-            user_data["profile"] = {}
-        
         return user_data
         
     except HTTPException:
@@ -135,6 +153,47 @@ async def get_current_user(request: Request) -> Dict[str, Any]:
             detail="Authentication failed"
         )
 
+async def attach_profile(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the user's profile from the database (empty if it cannot be fetched)"""
+    try:
+        profile_data = await db_manager.get_user_profile(user_data["user_id"])
+        if profile_data:
+            user_data["profile"] = profile_data
+    except Exception as e:
+        logger.warning(f"Could not fetch profile for user {user_data.get('user_id')}: {str(e)}")
+        user_data["profile"] = {}
+    
+    return user_data
+
+async def get_current_user(request: Request) -> Dict[str, Any]:
+    """Enhanced authentication with detailed user data"""
+    return await attach_profile(await authenticate(request))
+
+def rate_limited_user(endpoint_class: str, with_profile: bool = True):
+    """
+    get_current_user plus the per-user token bucket for endpoint_class
+    
+    The bucket is checked after the JWT is verified and before the profile
+    query, so a throttled request costs no database round trip. Without
+    with_profile only the JWT claims are returned, for endpoints that load
+    the profile themselves.
+    """
+    async def dependency(request: Request) -> Dict[str, Any]:
+        user_data = await authenticate(request)
+        await rate_limiter.enforce(user_data["user_id"], endpoint_class)
+        return await attach_profile(user_data) if with_profile else user_data
+    return dependency
+
+async def require_admin(request: Request) -> bool:
+    """Admin key check for operational endpoints"""
+    return await verify_admin_key(request.headers.get("X-Admin-Key"))
+
+async def require_metrics_access(request: Request) -> bool:
+    """The METRICS_TOKEN bearer token Prometheus scrapes with, or the admin key"""
+    if is_metrics_token(request.headers.get("Authorization")):
+        return True
+    return await require_admin(request)
+
 # ===================================
 # PUBLIC ENDPOINTS
 # ===================================
@@ -163,8 +222,8 @@ async def root():
 async def health_check(request: Request):
     """Public health check endpoint"""
     try:
-        # Test database connection
-        db_healthy = await db_manager.health_check()
+        # Last background probe; never touches the database
+        db_healthy = health_monitor.database_ok
         
         return {
             "status": "healthy",
@@ -173,10 +232,9 @@ async def health_check(request: Request):
             "environment": os.getenv("ENVIRONMENT", "development"),
             "timestamp": datetime.utcnow().isoformat(),
             "rate_limiting": {
-                "enabled": True,
-                "health_endpoint": "60/minute",
-                "recommendations": "30/minute", 
-                "feedback": "120/minute"
+                "enabled": rate_limiter.enabled,
+                "health_endpoint": "60/minute per address",
+                "per_user": rate_limiter.stats()["limits"]
             },
             "components": {
                 "database": "healthy" if db_healthy else "unhealthy",
@@ -195,39 +253,58 @@ async def health_check(request: Request):
             }
         )
 
+@app.get("/metrics")
+async def metrics(_: bool = Depends(require_metrics_access)):
+    """Prometheus metrics for the recommendation pipeline"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    memory_budget.report()  # Refreshes the memory gauges
+    return Response(content=render_latest(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving"""
+    return {"status": "alive", "timestamp": datetime.utcnow().isoformat()}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the warm-up has finished"""
+    if not warmup.ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming_up", **warmup.status()}
+        )
+    return {"status": "ready", **warmup.status()}
+
 @app.get("/health/database")
 @limiter.limit("30/minute")
 async def database_health_check(request: Request):
-    """Dedicated database health check endpoint"""
+    """Dedicated database health check endpoint (cached background probe)"""
     try:
-        # Detailed database health check
-        db_healthy = await db_manager.health_check()
+        database = health_monitor.status()
         
-        if not db_healthy:
+        if not database["healthy"]:
             return JSONResponse(
                 status_code=503,
                 content={
                     "database_status": "disconnected",
                     "status": "unhealthy",
                     "timestamp": datetime.utcnow().isoformat(),
-                    "error": "Database connection failed"
+                    "error": "Health probe is stale" if database["stale"] else database["error"],
+                    "last_probe": database
                 }
             )
-
-        # Get user count for sample data validation
-        try:
-            async with db_manager.pool.acquire() as connection:
-                user_count = await connection.fetchval("SELECT COUNT(*) FROM users;")
-        except:
-            user_count = 0
         
         return {
             "database_status": "connected",
             "status": "healthy", 
             "connection_info": "PostgreSQL via Supabase (pooled)",
-            "user_count": user_count,
-            "response_time": "< 50ms",
+            "user_count": database["user_count"],  # pg_class.reltuples estimate
+            "response_time": f"{database['latency_ms']:.1f}ms",
+            "response_time_ms": database["latency_ms"],
             "pool_status": "healthy",
+            "pool": database["pool"],
+            "checked_at": database["checked_at"],
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -247,11 +324,10 @@ async def database_health_check(request: Request):
 # ===================================
 
 @app.post("/api/v1/recommendations", response_model=RecommendationResponse)
-@limiter.limit("30/minute")
 async def get_recommendations(
     request: Request,
     recommendation_request: RecommendationRequest,
-    current_user: Dict[str, Any] = Depends(get_current_user)
+    current_user: Dict[str, Any] = Depends(rate_limited_user("recommendations", with_profile=False))
 ):
     """
     Get personalized recommendations with JWT authentication
@@ -264,6 +340,7 @@ async def get_recommendations(
     - Feedback-driven improvements
     """
     try:
+        request_start = time.perf_counter()
         user_id = current_user["user_id"]
         
         # Validate user can only get recommendations for themselves
@@ -273,32 +350,59 @@ async def get_recommendations(
                 detail="Cannot get recommendations for other users"
             )
         
-        # Get recommendations from engine
-        recommendations = await recommendation_engine.get_recommendations(
-            user_id=user_id,
-            limit=recommendation_request.limit,
-            algorithm_version="v2.0"
+        # Get recommendations from engine (profiled when the request is picked)
+        recommendations = await request_profiler.wrap(
+            request,
+            f"recommendations-{user_id}",
+            recommendation_engine.get_recommendations(
+                user_id=user_id,
+                recommendation_type=recommendation_request.recommendation_type,
+                limit=recommendation_request.limit,
+                filters=(
+                    recommendation_request.filters.model_dump(mode="json")
+                    if recommendation_request.filters else None
+                ),
+                # From the JWT, so the candidate fetch does not wait for the profile query
+                campus=current_user.get("campus")
+            )
         )
         
-        # Log recommendation request for analytics
-        await db_manager.log_recommendation_request(
+        # Impression for ranking analytics; buffered and copied in the background
+        impression_sink.record(
             user_id=user_id,
+            recommendation_type=recommendation_request.recommendation_type.value,
+            recommendations=recommendations,
+            latency_ms=(time.perf_counter() - request_start) * 1000,
             algorithm_version="v2.0",
-            recommendations_count=len(recommendations),
-            request_metadata={
+            metadata={
                 "user_agent": request.headers.get("user-agent"),
-                "campus": current_user.get("profile", {}).get("campus"),
-                "timestamp": datetime.utcnow().isoformat()
+                "campus": current_user.get("campus")
             }
         )
         
-        return RecommendationResponse(
-            user_id=user_id,
-            recommendations=recommendations,
-            algorithm_version="v2.0",
-            generated_at=datetime.utcnow().isoformat(),
-            total_count=len(recommendations)
+        # With FAST_SERIALIZATION off, FastAPI still validates and encodes after this returns
+        serialize_start = time.perf_counter()
+        if not FAST_SERIALIZATION:
+            response = RecommendationResponse(
+                user_id=user_id,
+                recommendations=recommendations,
+                algorithm_version="v2.0",
+                total_candidates=len(recommendations)
+            )
+        else:
+            # Returning a Response bypasses response_model re-validation
+            response = encode_response(request, recommendation_payload(
+                user_id=user_id,
+                recommendations=recommendations,
+                algorithm_version="v2.0",
+                total_candidates=len(recommendations)
+            ))
+        observe_stage(
+            "serialization",
+            recommendation_request.recommendation_type.value,
+            time.perf_counter() - serialize_start
         )
+        return response
         
     except HTTPException:
         raise
@@ -307,11 +411,10 @@ async def get_recommendations(
         raise HTTPException(status_code=500, detail="Failed to generate recommendations")
 
 @app.post("/api/v1/feedback")
-@limiter.limit("60/minute")
 async def submit_feedback(
     request: Request,
     feedback: UserFeedback,
-    current_user: Dict[str, Any] = Depends(get_current_user)
+    current_user: Dict[str, Any] = Depends(rate_limited_user("feedback"))
 ):
     """
     Submit user feedback for ML improvement
@@ -332,28 +435,49 @@ async def submit_feedback(
                 detail="Cannot submit feedback for other users"
             )
         
-        # Record feedback in database
-        feedback_id = await db_manager.record_feedback(
-            user_id=user_id,
-            recommended_user_id=feedback.recommended_user_id,
-            action=feedback.action,
-            context={
-                "algorithm_version": "v2.0",
-                "timestamp": datetime.utcnow().isoformat(),
-                "user_agent": request.headers.get("user-agent"),
-                "response_time_ms": getattr(feedback, 'response_time_ms', None)
-            }
-        )
+        if feedback.target_user_id == user_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot submit feedback on yourself"
+            )
+        
+        # Mutual-like detection against the in-memory graph, before any await
+        mutual = None
+        liked_before = None
+        if like_graph.loaded:
+            liked_before = like_graph.has_like(user_id, feedback.target_user_id)
+            mutual = like_graph.record(user_id, feedback.target_user_id, feedback.action)
+        
+        # Durably queue the feedback; the database write happens in the background
+        try:
+            feedback_id = await feedback_queue.enqueue(
+                user_id=user_id,
+                target_user_id=feedback.target_user_id,
+                action=feedback.action,
+                context={
+                    "algorithm_version": "v2.0",
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "user_agent": request.headers.get("user-agent"),
+                    "response_time_ms": getattr(feedback, 'response_time_ms', None)
+                },
+                mutual=mutual
+            )
+        except Exception:
+            # Not in the WAL, so never reaching the database: the graph must not keep it either
+            if liked_before is not None:
+                like_graph.restore(user_id, feedback.target_user_id, liked_before)
+            raise
         
         # Update recommendation engine with feedback
         await recommendation_engine.process_feedback(feedback)
         
-        return {
+        result = {
             "success": True,
             "feedback_id": feedback_id,
             "message": "Feedback recorded successfully",
             "timestamp": datetime.utcnow().isoformat()
         }
+        return encode_response(request, result) if FAST_SERIALIZATION else result
         
     except HTTPException:
         raise
@@ -362,11 +486,10 @@ async def submit_feedback(
         raise HTTPException(status_code=500, detail="Failed to record feedback")
 
 @app.get("/api/v1/stats/{user_id}")
-@limiter.limit("30/minute")
 async def get_user_stats(
     request: Request,
     user_id: str,
-    current_user: Dict[str, Any] = Depends(get_current_user)
+    current_user: Dict[str, Any] = Depends(rate_limited_user("stats"))
 ):
     """
     Get user recommendation statistics and insights
@@ -385,8 +508,8 @@ async def get_user_stats(
                 detail="Cannot access other users' statistics"
             )
         
-        # Get comprehensive user statistics
-        stats = await db_manager.get_user_statistics(user_id)
+        # Counter row maintained by triggers on user_feedback and connections
+        stats = await db_manager.get_user_stats(user_id)
         
         return {
             "user_id": user_id,
@@ -401,10 +524,9 @@ async def get_user_stats(
         raise HTTPException(status_code=500, detail="Failed to retrieve statistics")
 
 @app.get("/api/v1/auth/verify")
-@limiter.limit("60/minute")
 async def verify_auth(
     request: Request,
-    current_user: Dict[str, Any] = Depends(get_current_user)
+    current_user: Dict[str, Any] = Depends(rate_limited_user("auth"))
 ):
     """
     Verify authentication status and return user info
@@ -440,6 +562,68 @@ async def verify_auth(
         logger.error(f"Error verifying auth: {str(e)}")
         raise HTTPException(status_code=500, detail="Authentication verification failed")
 
+# ===================================
+# ADMIN ENDPOINTS
+# ===================================
+
+@app.get("/admin/profiling")
+async def get_profiling_config(request: Request, _: bool = Depends(require_admin)):
+    """Current request profiler settings"""
+    return request_profiler.stats()
+
+@app.post("/admin/profiling")
+async def update_profiling_config(
+    request: Request,
+    config: ProfilingConfig,
+    _: bool = Depends(require_admin)
+):
+    """Change the profiling sample rate or default mode without a restart"""
+    request_profiler.configure(sample_rate=config.sample_rate, mode=config.mode)
+    logger.info(f"Profiling reconfigured: {request_profiler.stats()}")
+    return request_profiler.stats()
+
+@app.get("/admin/analytics")
+async def get_analytics_status(request: Request, _: bool = Depends(require_admin)):
+    """Impression sink buffer depth, flush and drop counters"""
+    return impression_sink.stats()
+
+@app.get("/admin/rate-limits")
+async def get_rate_limit_status(request: Request, _: bool = Depends(require_admin)):
+    """Per-user rate limits, backend and live bucket count"""
+    return rate_limiter.stats()
+
+@app.get("/admin/cache")
+async def get_cache_status(request: Request, _: bool = Depends(require_admin)):
+    """Ranked-feed cache size and hit rate"""
+    return recommendation_engine.result_cache.stats()
+
+@app.get("/admin/geo")
+async def get_geo_index_status(request: Request, _: bool = Depends(require_admin)):
+    """Per-campus geo grid sizes and lookup counts"""
+    return recommendation_engine.geo_index.stats()
+
+@app.get("/admin/memory")
+async def get_memory_status(request: Request, _: bool = Depends(require_admin)):
+    """Estimated memory per cache and index layer against MEMORY_BUDGET_MB"""
+    return memory_budget.report()
+
+@app.post("/admin/stats")
+async def get_bulk_user_stats(
+    request: Request,
+    stats_request: BulkStatsRequest,
+    _: bool = Depends(require_admin)
+):
+    """Statistics for many users in one call (admin dashboard)"""
+    try:
+        stats = await db_manager.get_user_stats_bulk(stats_request.user_ids)
+        return {
+            "stats": stats,
+            "generated_at": datetime.utcnow().isoformat()
+        }
+    except Exception as e:
+        logger.error(f"Error getting bulk user stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve statistics")
+
 # ===================================
 # ERROR HANDLERS
 # ===================================
@@ -455,7 +639,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             "status_code": exc.status_code,
             "timestamp": datetime.utcnow().isoformat(),
             "path": str(request.url.path)
-        }
+        },
+        headers=getattr(exc, "headers", None)  # e.g. Retry-After on 429
     )
 
 @app.exception_handler(Exception)
@@ -483,15 +668,39 @@ async def startup_event():
         logger.info("🚀 Starting BITHOGAYI Recommendation Engine v2.0")
         
         # Test database connection
-        if await db_manager.health_check():
+        await health_monitor.probe()
+        if health_monitor.healthy:
             logger.info("✅ Database connection established")
         else:
             logger.error("❌ Database connection failed")
+        health_monitor.start()
             
+        # Load the like graph from the likes already in the database
+        try:
+            await like_graph.load(db_manager)
+            logger.info("✅ Like graph loaded")
+        except Exception as e:
+            logger.error(f"❌ Like graph load failed, mutual likes will be checked in the database: {e}")
+        
+        # Replay any queued feedback and start the write-behind flusher
+        await feedback_queue.start()
+        if like_graph.loaded:
+            # Recovered events are not in the database yet, so apply them to the graph too
+            for event in feedback_queue.queued_events():
+                like_graph.record(event['user_id'], event['target_user_id'], event['action'])
+        logger.info("✅ Feedback queue started")
+        
+        impression_sink.start()
+        logger.info("✅ Impression sink started")
+        
         # Initialize recommendation engine
         await recommendation_engine.initialize()
         logger.info("✅ Recommendation engine initialized")
         
+        # Pool, feature store and scoring warm-up; /health/ready flips when it finishes
+        warmup.start()
+        logger.info("🔥 Warm-up started")
+        
         logger.info("🎉 Service startup completed successfully")
         
     except Exception as e:
@@ -504,6 +713,15 @@ async def shutdown_event():
     try:
         logger.info("🛑 Shutting down BITHOGAYI Recommendation Engine")
         
+        await health_monitor.stop()
+        
+        # Flush queued feedback while the database is still reachable
+        await feedback_queue.drain()
+        logger.info("✅ Feedback queue drained")
+        
+        await impression_sink.drain()
+        logger.info("✅ Impression sink drained")
+        
         # Close database connections
         await db_manager.close()
         logger.info("✅ Database connections closed")
@@ -0,0 +1,123 @@
+import os
+import sys
+import logging
+from itertools import islice
+from typing import Dict, Any, Optional, Callable, Iterable
+
+import numpy as np
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BYTES = registry.gauge(
+    "engine_memory_bytes",
+    "Estimated bytes held by each cache and index layer (mapped = memory-mapped snapshot files)",
+    ("component", "part")
+)
+MEMORY_BUDGET_BYTES = registry.gauge(
+    "engine_memory_budget_bytes",
+    "MEMORY_BUDGET_MB in bytes"
+)
+
+def deep_size(obj: Any) -> int:
+    """
+    Approximate bytes held by obj and everything it references
+
+    Every object is counted once, however many times it is referenced.
+    numpy arrays count their buffer unless it is a view or a memory-mapped
+    file.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, np.ndarray):
+            total += item.nbytes if item.base is None and not isinstance(item, np.memmap) else sys.getsizeof(item)
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__slots__"):
+            slots = (item.__slots__,) if isinstance(item.__slots__, str) else item.__slots__
+            stack.extend(getattr(item, name) for name in slots if hasattr(item, name))
+        elif hasattr(item, "__dict__") and not isinstance(item, type):
+            stack.append(item.__dict__)
+    return total
+
+def sampled_size(items: Iterable[Any], count: int, sample: int = 64) -> int:
+    """deep_size of the first `sample` of count items, scaled up to all of them"""
+    taken = list(islice(items, sample))
+    if not taken:
+        return 0
+    return deep_size(taken) * count // len(taken)
+
+def process_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (Linux only, else None)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class MemoryBudget:
+    """
+    Memory budget for the engine's in-process caches and indexes.
+
+    Each layer registers a callable that estimates what it holds, by part,
+    in bytes. report() adds them up against MEMORY_BUDGET_MB, updates the
+    gauges and logs a warning whenever usage crosses the budget. Parts named
+    "mapped" are snapshot files mapped from disk: they are reported, but not
+    charged to the budget, since the page cache shares them between workers
+    and can drop them under pressure. Nothing is evicted on the budget's
+    account; it is what to size instances and cache limits against.
+    """
+
+    def __init__(self, budget_mb: Optional[float] = None):
+        self.budget = int((budget_mb or float(os.getenv("MEMORY_BUDGET_MB", "256"))) * 1024 * 1024)
+        self._components: Dict[str, Callable[[], Dict[str, int]]] = {}
+        self._over = False
+        MEMORY_BUDGET_BYTES.set(self.budget)
+
+    def register(self, name: str, usage: Callable[[], Dict[str, int]]):
+        self._components[name] = usage
+
+    def report(self) -> Dict[str, Any]:
+        components = {}
+        used = 0
+        for name, usage in self._components.items():
+            try:
+                parts = usage()
+            except Exception as e:
+                logger.warning(f"Memory budget: could not measure {name}: {e}")
+                continue
+            charged = sum(size for part, size in parts.items() if part != "mapped")
+            components[name] = {"bytes": charged, "parts": parts}
+            used += charged
+            for part, size in parts.items():
+                MEMORY_BYTES.set(size, (name, part))
+
+        over = used > self.budget
+        if over and not self._over:
+            logger.warning(
+                f"Memory budget exceeded: {used / 2**20:.1f} MiB used of {self.budget / 2**20:.0f} MiB "
+                f"(largest: {max(components, key=lambda name: components[name]['bytes'])})"
+            )
+        self._over = over
+
+        return {
+            "budget_bytes": self.budget,
+            "used_bytes": used,
+            "utilization": round(used / self.budget, 4) if self.budget else None,
+            "over_budget": over,
+            "process_rss_bytes": process_rss(),
+            "components": components
+        }
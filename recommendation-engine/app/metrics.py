@@ -0,0 +1,254 @@
+import os
+import time
+import logging
+from bisect import bisect_left
+from typing import List, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Hot-path instrumentation can be switched off entirely; the timers become no-ops
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Seconds; recommendation stages range from microseconds (diversity) to a DB round trip
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Monotonic counter with a fixed set of label names"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+class Gauge:
+    """Value that can go up and down, with a fixed set of label names"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, labels: Tuple[str, ...] = ()):
+        self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = STAGE_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last slot is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total:.9g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Minimal Prometheus registry rendered in the text exposition format"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = STAGE_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "recommendation_stage_seconds",
+    "Time spent in each stage of get_recommendations",
+    ("stage", "recommendation_type")
+)
+REQUEST_SECONDS = registry.histogram(
+    "recommendation_engine_seconds",
+    "Total engine time per get_recommendations call",
+    ("recommendation_type",)
+)
+CANDIDATES = registry.counter(
+    "recommendation_candidates_total",
+    "Candidates per pipeline step (fetched, scored, pruned = score bound below the cut, thresholded = passed the minimum score, returned)",
+    ("step", "recommendation_type")
+)
+SHARDS = registry.counter(
+    "recommendation_campus_shards_total",
+    "Campus shards queried by multi-campus requests (ok, timeout = missed the deadline and dropped, error)",
+    ("outcome",)
+)
+PREFETCH = registry.counter(
+    "recommendation_candidate_prefetch_total",
+    "Candidate fetches started before the requester's profile loaded (hit = page cut from it, short = fetched again, unused)",
+    ("outcome",)
+)
+ERRORS = registry.counter(
+    "recommendation_errors_total",
+    "get_recommendations calls that raised",
+    ("recommendation_type",)
+)
+
+class RequestTimer:
+    """
+    Per-request stage timer.
+
+    mark(stage) charges the time since the previous mark to that stage, so
+    each stage boundary costs one perf_counter call. Everything is written
+    to the shared histograms in finish(). Work that runs concurrently (campus
+    shards) marks its own child() timer, and merge() adds its stages and
+    counts back in.
+    """
+
+    __slots__ = ("recommendation_type", "_start", "_last", "_stages", "_counts")
+
+    def __init__(self, recommendation_type: str):
+        self.recommendation_type = recommendation_type
+        self._start = self._last = time.perf_counter()
+        self._stages: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self._stages[stage] = self._stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def count(self, step: str, amount: int):
+        self._counts[step] = self._counts.get(step, 0) + amount
+
+    def child(self) -> "RequestTimer":
+        """Timer for one concurrent branch of this request, starting now"""
+        return RequestTimer(self.recommendation_type)
+
+    def merge(self, child: "RequestTimer"):
+        """Add a child's stage seconds and counts (concurrent branches can add up to more than the wall time)"""
+        for stage, seconds in child._stages.items():
+            self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+        for step, amount in child._counts.items():
+            self.count(step, amount)
+
+    def finish(self):
+        rec_type = self.recommendation_type
+        for stage, seconds in self._stages.items():
+            STAGE_SECONDS.observe((stage, rec_type), seconds)
+        for step, amount in self._counts.items():
+            CANDIDATES.inc((step, rec_type), amount)
+        REQUEST_SECONDS.observe((rec_type,), self._last - self._start)
+
+    def fail(self):
+        ERRORS.inc((self.recommendation_type,))
+
+class _NullTimer:
+    """Stand-in used when metrics are disabled"""
+
+    __slots__ = ()
+
+    def mark(self, stage: str):
+        pass
+
+    def count(self, step: str, amount: int):
+        pass
+
+    def child(self) -> "_NullTimer":
+        return self
+
+    def merge(self, child: "_NullTimer"):
+        pass
+
+    def finish(self):
+        pass
+
+    def fail(self):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+def start_request(recommendation_type: str):
+    """Timer for one get_recommendations call (a shared no-op when disabled)"""
+    if not METRICS_ENABLED:
+        return _NULL_TIMER
+    return RequestTimer(recommendation_type)
+
+def observe_stage(stage: str, recommendation_type: str, seconds: float):
+    """Record a stage timed outside the engine (e.g. response serialization)"""
+    if METRICS_ENABLED:
+        STAGE_SECONDS.observe((stage, recommendation_type), seconds)
+
+def render_latest() -> str:
+    """Current metrics in the Prometheus text exposition format"""
+    return registry.render()
@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
 from enum import Enum
+import uuid
 
 class RecommendationType(str, Enum):
     FRIENDS = "friends"
@@ -98,6 +99,7 @@ class RecommendationFilters(BaseModel):
     campus_filter: Optional[List[CampusType]] = None
     verified_only: bool = False
     active_recently: bool = True  # Active in last 7 days
+    nearby_only: bool = False  # Within preferences.max_distance km of the user's location
 
 class RecommendationRequest(BaseModel):
     user_id: str
@@ -131,6 +133,11 @@ class UserFeedback(BaseModel):
     action: Literal["like", "pass", "super_like", "block", "report"]
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     context: Optional[Dict[str, Any]] = None
+    
+    @validator('target_user_id')
+    def validate_target_user_id(cls, v):
+        # Queued events are cast to uuid in one statement per batch; reject here, not there
+        return str(uuid.UUID(v))  # Raises ValueError for anything but a UUID
 
 class UserStats(BaseModel):
     user_id: str
@@ -139,4 +146,16 @@ class UserStats(BaseModel):
     match_rate: float = 0.0
     average_compatibility_score: float = 0.0
     top_interests: List[str] = Field(default_factory=list)
-    personality_summary: Dict[str, float] = Field(default_factory=dict)
\ No newline at end of file
+    personality_summary: Dict[str, float] = Field(default_factory=dict)
+
+class BulkStatsRequest(BaseModel):
+    user_ids: List[str] = Field(min_length=1, max_length=1000)
+    
+    @validator('user_ids', each_item=True)
+    def validate_user_id(cls, v):
+        # Canonical form (lowercase, dashed), as user_stats keys come back from Postgres
+        return str(uuid.UUID(v))  # Raises ValueError for anything but a UUID
+
+class ProfilingConfig(BaseModel):
+    sample_rate: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    mode: Optional[Literal["cprofile", "sampling"]] = None
@@ -0,0 +1,168 @@
+import os
+import sys
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .memory import deep_size, sampled_size
+
+logger = logging.getLogger(__name__)
+
+# Sub-scores the engine computes for every candidate, in vector order
+FEATURES = ('interests', 'personality', 'lifestyle', 'academic', 'activity')
+
+# Target compatibility for each action, and how strongly it counts
+ACTION_LABELS = {'like': 1.0, 'super_like': 1.0, 'pass': 0.0}
+ACTION_SAMPLE_WEIGHTS = {'like': 1.0, 'super_like': 2.0, 'pass': 1.0}
+
+class OnlineWeightLearner:
+    """
+    Learns per-user and per-campus adjustments to the compatibility weights.
+
+    Each served recommendation remembers its sub-score vector, as a row of
+    a float32 matrix shared by all of them. When the user
+    likes or passes on it, one SGD step on the squared error between the
+    weighted score and the action's label nudges that user's and that
+    campus's weight deltas. Deltas live in float32 matrices (one row per
+    user or campus), so an update is O(len(FEATURES)) and the per-request
+    cost of applying them is a single row lookup.
+    """
+
+    def __init__(
+        self,
+        learning_rate: Optional[float] = None,
+        campus_learning_rate: Optional[float] = None,
+        max_delta: Optional[float] = None,
+        max_served: Optional[int] = None
+    ):
+        self.learning_rate = learning_rate or float(os.getenv("LEARNING_RATE", "0.05"))
+        self.campus_learning_rate = campus_learning_rate or float(os.getenv("CAMPUS_LEARNING_RATE", "0.005"))
+        self.max_delta = max_delta or float(os.getenv("MAX_WEIGHT_DELTA", "0.25"))
+        self.max_served = max_served or int(os.getenv("LEARNER_MAX_SERVED", "100000"))
+
+        self._user_rows: Dict[int, int] = {}  # Keyed by interned user id
+        self._user_deltas = np.zeros((1024, len(FEATURES)), dtype=np.float32)
+        self._campus_rows: Dict[str, int] = {}
+        self._campus_deltas = np.zeros((8, len(FEATURES)), dtype=np.float32)
+
+        # (user_id, candidate_id), both interned -> row of _served_vectors (sub-scores, then base weights)
+        self._served: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+        self._served_vectors = np.zeros((min(1024, self.max_served), 2 * len(FEATURES)), dtype=np.float32)
+        self._served_campuses: List[Optional[str]] = [None] * len(self._served_vectors)
+        self._free_rows: List[int] = []
+
+        self.updates = 0
+
+    def personalize(self, user_id: int, campus: Optional[str], base_weights: Dict[str, float]) -> Dict[str, float]:
+        """Return base_weights adjusted by the user's and campus's learned deltas"""
+        user_row = self._user_rows.get(user_id)
+        campus_row = self._campus_rows.get(campus)
+        if user_row is None and campus_row is None:
+            return base_weights
+
+        delta = np.zeros(len(FEATURES), dtype=np.float32)
+        if user_row is not None:
+            delta += self._user_deltas[user_row]
+        if campus_row is not None:
+            delta += self._campus_deltas[campus_row]
+
+        weights = dict(base_weights)
+        for i, feature in enumerate(FEATURES):
+            if feature in weights:
+                weights[feature] = max(0.0, weights[feature] + float(delta[i]))
+        return weights
+
+    def remember(
+        self,
+        user_id: int,
+        candidate_id: int,
+        campus: Optional[str],
+        scores: Dict[str, float],
+        base_weights: Dict[str, float]
+    ):
+        """Keep the sub-scores of a served recommendation until the user acts on it"""
+        key = (user_id, candidate_id)
+        row = self._served.pop(key, None)
+        if row is None:
+            if len(self._served) >= self.max_served:
+                _, oldest = self._served.popitem(last=False)
+                self._free_rows.append(oldest)
+            row = self._served_row()
+        self._served[key] = row
+        self._served_vectors[row] = [scores.get(f, 0.0) for f in FEATURES] + [base_weights.get(f, 0.0) for f in FEATURES]
+        self._served_campuses[row] = campus
+
+    def update(self, user_id: int, candidate_id: Optional[int], action: str) -> bool:
+        """Apply one SGD step for a feedback action; returns False if there was nothing to learn"""
+        label = ACTION_LABELS.get(action)
+        row = self._served.pop((user_id, candidate_id), None)
+        if row is None:
+            return False
+        self._free_rows.append(row)
+        if label is None:
+            return False
+
+        features = self._served_vectors[row, :len(FEATURES)].copy()
+        base = self._served_vectors[row, len(FEATURES):].copy()
+        campus = self._served_campuses[row]
+        self._served_campuses[row] = None
+        mask = (base > 0).astype(np.float32)  # Only adjust weights the recommendation type uses
+        user_row = self._row(self._user_rows, "_user_deltas", user_id)
+        campus_row = self._row(self._campus_rows, "_campus_deltas", campus)
+
+        weights = np.maximum(0.0, base + self._user_deltas[user_row] + self._campus_deltas[campus_row]) * mask
+        error = label - min(1.0, float(weights @ features))
+        step = ACTION_SAMPLE_WEIGHTS[action] * error * features * mask
+
+        np.clip(self._user_deltas[user_row] + self.learning_rate * step,
+                -self.max_delta, self.max_delta, out=self._user_deltas[user_row])
+        np.clip(self._campus_deltas[campus_row] + self.campus_learning_rate * step,
+                -self.max_delta, self.max_delta, out=self._campus_deltas[campus_row])
+
+        self.updates += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._user_rows),
+            "campuses": len(self._campus_rows),
+            "served_tracked": len(self._served),
+            "updates": self.updates
+        }
+
+    def memory_usage(self) -> Dict[str, int]:
+        return {
+            "deltas": self._user_deltas.nbytes + self._campus_deltas.nbytes + deep_size(self._user_rows),
+            "served": (
+                self._served_vectors.nbytes
+                + sys.getsizeof(self._served_campuses)
+                + sampled_size(iter(self._served.items()), len(self._served))
+            )
+        }
+
+    def _served_row(self) -> int:
+        """A free row of _served_vectors, growing it by doubling up to max_served rows"""
+        if self._free_rows:
+            return self._free_rows.pop()
+        row = len(self._served)
+        if row >= len(self._served_vectors):
+            grown = np.zeros((min(2 * len(self._served_vectors), self.max_served), self._served_vectors.shape[1]), dtype=np.float32)
+            grown[:len(self._served_vectors)] = self._served_vectors
+            self._served_campuses.extend([None] * (len(grown) - len(self._served_vectors)))
+            self._served_vectors = grown
+        return row
+
+    def _row(self, rows: Dict[Any, int], matrix_name: str, key: Any) -> int:
+        """Row index for key, growing the delta matrix by doubling when full"""
+        row = rows.get(key)
+        if row is None:
+            row = len(rows)
+            rows[key] = row
+            matrix = getattr(self, matrix_name)
+            if row >= matrix.shape[0]:
+                grown = np.zeros((matrix.shape[0] * 2, matrix.shape[1]), dtype=matrix.dtype)
+                grown[:matrix.shape[0]] = matrix
+                setattr(self, matrix_name, grown)
+        return row
@@ -0,0 +1,178 @@
+import os
+import re
+import sys
+import glob
+import time
+import random
+import logging
+import tempfile
+import threading
+from collections import Counter
+from typing import Dict, Any, Optional, Awaitable
+
+from fastapi import Request
+
+from .auth import is_admin_key
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+class StackSampler:
+    """
+    Statistical profiler for one thread.
+
+    A daemon thread reads the target thread's current frame every interval
+    and counts whole stacks, which are written out in the collapsed
+    ("folded") format flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def write_folded(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+class RequestProfiler:
+    """
+    Profiles individual requests on demand.
+
+    A request is profiled when it carries X-Profile: cprofile|sampling together
+    with a valid X-Admin-Key, or when it is picked by the sample rate. Only one
+    request is profiled at a time; everything else goes straight through, so
+    requests that are not picked pay one header lookup.
+    """
+
+    def __init__(
+        self,
+        output_dir: Optional[str] = None,
+        sample_rate: Optional[float] = None,
+        sampling_interval: Optional[float] = None,
+        max_files: Optional[int] = None
+    ):
+        self.output_dir = output_dir or os.getenv(
+            "PROFILING_DIR", os.path.join(tempfile.gettempdir(), "bitspark-profiles")
+        )
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.default_mode = os.getenv("PROFILE_MODE", "sampling")
+        self.sampling_interval = sampling_interval or int(os.getenv("PROFILE_SAMPLING_INTERVAL_MS", "2")) / 1000
+        self.max_files = max_files or int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+        self._active = False
+        self.profiles_written = 0
+
+    def select(self, request: Request) -> Optional[str]:
+        """Profiling mode for this request, or None to run it unprofiled"""
+        mode = request.headers.get("x-profile")
+        if mode:
+            if mode not in PROFILE_MODES or not is_admin_key(request.headers.get("x-admin-key")):
+                return None
+        elif self.sample_rate and random.random() < self.sample_rate:
+            mode = self.default_mode
+        else:
+            return None
+
+        if self._active:
+            return None
+        return mode
+
+    def wrap(self, request: Request, label: str, call: Awaitable) -> Awaitable:
+        """Return call unchanged, or a coroutine that profiles it if the request is picked"""
+        mode = self.select(request)
+        if mode is None:
+            return call
+        return self._profile(mode, label, call)
+
+    def configure(self, sample_rate: Optional[float] = None, mode: Optional[str] = None):
+        """Change the sample rate or default mode at runtime"""
+        if sample_rate is not None:
+            self.sample_rate = max(0.0, min(1.0, sample_rate))
+        if mode is not None:
+            if mode not in PROFILE_MODES:
+                raise ValueError(f"Unknown profile mode: {mode}")
+            self.default_mode = mode
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "output_dir": self.output_dir,
+            "sample_rate": self.sample_rate,
+            "default_mode": self.default_mode,
+            "active": self._active,
+            "profiles_written": self.profiles_written
+        }
+
+    async def _profile(self, mode: str, label: str, call: Awaitable):
+        # The profilers see the whole event loop thread, so concurrent requests show up too
+        self._active = True
+        start = time.perf_counter()
+        if mode == "cprofile":
+            import cProfile  # Only sampled requests pay for the import
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), self.sampling_interval)
+            profiler.start()
+
+        try:
+            return await call
+        finally:
+            if mode == "cprofile":
+                profiler.disable()
+            else:
+                profiler.stop()
+            self._active = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            try:
+                path = self._write(mode, label, profiler)
+                logger.info(f"Profiled {label} ({mode}, {elapsed_ms:.1f} ms): {path}")
+            except Exception as e:
+                logger.error(f"Failed to write profile for {label}: {e}")
+
+    def _write(self, mode: str, label: str, profiler: Any) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe_label = re.sub(r"[^A-Za-z0-9_.-]", "_", label)
+        base = os.path.join(self.output_dir, f"{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 10**9:09d}-{safe_label}")
+        if mode == "cprofile":
+            path = base + ".prof"
+            profiler.dump_stats(path)
+        else:
+            path = base + ".folded"
+            profiler.write_folded(path)
+
+        self.profiles_written += 1
+        self._prune()
+        return path
+
+    def _prune(self):
+        """Keep only the newest max_files profiles"""
+        files = sorted(
+            glob.glob(os.path.join(self.output_dir, "*.prof")) + glob.glob(os.path.join(self.output_dir, "*.folded"))
+        )
+        for path in files[:-self.max_files]:
+            os.remove(path)
@@ -0,0 +1,240 @@
+import os
+import re
+import sys
+import math
+import time
+import logging
+import importlib.util
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from .metrics import registry
+from .memory import sampled_size
+
+# The Redis backend is optional; redis.asyncio is only imported when it is configured
+REDIS_AVAILABLE = importlib.util.find_spec("redis") is not None
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+# Endpoint class -> (sustained rate, burst). Overridden with RATE_LIMIT_<CLASS> and RATE_LIMIT_<CLASS>_BURST
+DEFAULT_LIMITS = {
+    'recommendations': ("30/minute", 15),
+    'feedback': ("120/minute", 60),
+    'stats': ("30/minute", 10),
+    'auth': ("60/minute", 20),
+}
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+RATE_LIMIT_DECISIONS = registry.counter(
+    "rate_limit_decisions_total",
+    "Per-user token bucket decisions by endpoint class",
+    ("endpoint_class", "outcome")
+)
+RATE_LIMIT_BACKEND_ERRORS = registry.counter(
+    "rate_limit_backend_errors_total",
+    "Shared-backend failures that fell back to the worker-local buckets"
+)
+
+def parse_rate(rate: str) -> float:
+    """'30/minute' -> tokens per second"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*/\s*(second|minute|hour|day)s?\s*", rate)
+    if not match:
+        raise ValueError(f"Invalid rate limit {rate!r}, expected e.g. '30/minute'")
+    return float(match.group(1)) / PERIODS[match.group(2)]
+
+class BucketPolicy:
+    """Refill rate and burst capacity for one endpoint class"""
+
+    __slots__ = ("name", "rate", "capacity", "description")
+
+    def __init__(self, name: str, rate: str, capacity: int):
+        self.name = name
+        self.rate = parse_rate(rate)
+        self.capacity = capacity
+        self.description = f"{rate}, burst {capacity}"
+
+    @property
+    def idle_ttl(self) -> float:
+        """Seconds after which an untouched bucket is full again and can be forgotten"""
+        return self.capacity / self.rate
+
+    @classmethod
+    def from_env(cls, name: str, rate: str, capacity: int) -> "BucketPolicy":
+        env = f"RATE_LIMIT_{name.upper()}"
+        return cls(name, os.getenv(env, rate), int(os.getenv(f"{env}_BURST", str(capacity))))
+
+class LocalBucketStore:
+    """
+    Worker-local token buckets.
+
+    Each bucket is a (tokens, updated_at, expires_at) triple, so memory is
+    constant per active user. Buckets are kept in last-touched order and
+    dropped once they would have refilled completely, which is the same as
+    never having been created; max_keys caps the table during a burst of
+    distinct users.
+    """
+
+    name = "local"
+
+    def __init__(self, max_keys: Optional[int] = None):
+        self.max_keys = max_keys or int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+
+    async def take(self, key: str, policy: BucketPolicy, now: float) -> float:
+        """Refill, try to take one token; returns the tokens left (negative = rejected)"""
+        return self.take_now(key, policy, now)
+
+    def take_now(self, key: str, policy: BucketPolicy, now: float) -> float:
+        self._expire(now)
+
+        state = self._buckets.pop(key, None)
+        if state is None:
+            tokens = float(policy.capacity)
+        else:
+            tokens, updated_at, _ = state
+            tokens = min(policy.capacity, tokens + (now - updated_at) * policy.rate)
+
+        left = tokens - 1
+        if left >= 0:
+            tokens = left
+        self._buckets[key] = (tokens, now, now + (policy.capacity - tokens) / policy.rate)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return left
+
+    def _expire(self, now: float):
+        while self._buckets:
+            key, (_, _, expires_at) = next(iter(self._buckets.items()))
+            if expires_at > now:
+                break
+            del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def memory_usage(self) -> Dict[str, int]:
+        return {"buckets": sys.getsizeof(self._buckets) + sampled_size(iter(self._buckets.items()), len(self._buckets))}
+
+# Atomic refill-and-take; the key expires once the bucket would be full again
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local left = tokens - 1
+if left >= 0 then
+  tokens = left
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return tostring(left)
+"""
+
+class RedisBucketStore:
+    """
+    Token buckets shared by every worker through Redis.
+
+    One hash per (endpoint class, user) updated by a Lua script, so refill
+    and take are atomic across workers. Timestamps come from the worker's
+    wall clock. If Redis is unreachable the check falls back to the
+    worker-local buckets instead of failing the request.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, fallback: LocalBucketStore, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis_asyncio
+
+        self.client = redis_asyncio.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.2)
+        self.fallback = fallback
+        self.prefix = prefix
+        self._script = self.client.register_script(TAKE_SCRIPT)
+        self.errors = 0
+
+    async def take(self, key: str, policy: BucketPolicy, now: float) -> float:
+        try:
+            left = await self._script(keys=[self.prefix + key], args=[policy.capacity, policy.rate, time.time()])
+            return float(left)
+        except Exception as e:
+            self.errors += 1
+            RATE_LIMIT_BACKEND_ERRORS.inc()
+            if self.errors == 1 or self.errors % 1000 == 0:
+                logger.warning(f"Rate limit backend unavailable, using local buckets ({self.errors} errors): {e}")
+            return self.fallback.take_now(key, policy, now)
+
+    def __len__(self) -> int:
+        return len(self.fallback)
+
+class UserRateLimiter:
+    """
+    Per-user token-bucket limits, keyed on the verified JWT subject.
+
+    Every endpoint class has a sustained rate and a burst capacity, so a user
+    can fire a quick run of requests (opening the app, swiping fast) and is
+    then held to the sustained rate. Users sharing a campus NAT address no
+    longer share a quota. State lives in a LocalBucketStore, or in Redis when
+    RATE_LIMIT_BACKEND=redis so all workers see the same buckets.
+    """
+
+    def __init__(self):
+        self.enabled = RATE_LIMIT_ENABLED
+        self.policies = {
+            name: BucketPolicy.from_env(name, rate, burst)
+            for name, (rate, burst) in DEFAULT_LIMITS.items()
+        }
+
+        local = LocalBucketStore()
+        self.store = local
+        backend = os.getenv("RATE_LIMIT_BACKEND", "local").lower()
+        if backend == "redis":
+            redis_url = os.getenv("REDIS_URL")
+            if not redis_url:
+                logger.warning("RATE_LIMIT_BACKEND=redis but REDIS_URL is not set, using local buckets")
+            elif not REDIS_AVAILABLE:
+                logger.warning("RATE_LIMIT_BACKEND=redis but the redis package is not installed, using local buckets")
+            else:
+                self.store = RedisBucketStore(redis_url, local)
+
+    async def enforce(self, user_id: str, endpoint_class: str):
+        """Take one token from the user's bucket or raise 429 with Retry-After"""
+        if not self.enabled:
+            return
+
+        policy = self.policies[endpoint_class]
+        left = await self.store.take(f"{endpoint_class}:{user_id}", policy, time.monotonic())
+        if left >= 0:
+            RATE_LIMIT_DECISIONS.inc((endpoint_class, "allowed"))
+            return
+
+        RATE_LIMIT_DECISIONS.inc((endpoint_class, "rejected"))
+        retry_after = max(1, math.ceil(-left / policy.rate))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded: {policy.description}",
+            headers={
+                "Retry-After": str(retry_after),
+                "X-RateLimit-Limit": policy.description,
+                "X-RateLimit-Remaining": "0"
+            }
+        )
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Worker-local buckets (also the fallback when the Redis backend is in use)"""
+        local = self.store.fallback if isinstance(self.store, RedisBucketStore) else self.store
+        return local.memory_usage()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "backend": self.store.name,
+            "buckets": len(self.store),
+            "limits": {name: policy.description for name, policy in self.policies.items()}
+        }
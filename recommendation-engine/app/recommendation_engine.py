@@ -1,22 +1,35 @@
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import StandardScaler
 from typing import List, Dict, Any, Optional, Tuple
+import os
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import asyncio
+import heapq
 import json
 import math
 
-from .models import RecommendationItem, UserProfile, RecommendationType
+from .models import RecommendationItem, UserProfile, RecommendationType, UserFeedback
 from .database import DatabaseManager
+from .online_learning import OnlineWeightLearner
+from .feature_store import CampusFeatureStore
+from .geo import CampusGeoIndex, coordinates, haversine_km
+from .interning import user_ids
+from .metrics import start_request, SHARDS, PREFETCH
+from .result_cache import RecommendationCache, CachedRanking, filters_key, profile_fingerprint
+from .single_flight import SingleFlight
+from .filters import CandidateQuery, compile_candidate_query
 
 logger = logging.getLogger(__name__)
 
+SCORE_PRUNING_ENABLED = os.getenv("SCORE_PRUNING_ENABLED", "true").lower() == "true"
+CANDIDATE_PREFETCH_ENABLED = os.getenv("CANDIDATE_PREFETCH_ENABLED", "true").lower() == "true"
+
+# Slack on top of a score bound, so float rounding in the bound never prunes a candidate that could make the cut
+PRUNE_EPSILON = 1e-9
+
 class RecommendationEngine:
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
-        self.scaler = StandardScaler()
         
         # Personality traits (Big 5)
         self.personality_traits = [
@@ -88,6 +101,32 @@ class RecommendationEngine:
                 'activity': 0.10
             }
         }
+        
+        # Per-user and per-campus adjustments to the weights above, learned from feedback
+        self.learner = OnlineWeightLearner()
+        
+        # Candidate interest features, preloaded per campus during warm-up
+        self.feature_store = CampusFeatureStore(self._featurize, list(self.interest_categories))
+        
+        # Full ranked feeds per (user, type, filters), trimmed by feedback
+        self.result_cache = RecommendationCache()
+        self._flight = SingleFlight("get_recommendations")
+        
+        # Multi-campus requests drop any campus shard that has not answered by then
+        self.shard_deadline = int(os.getenv("CAMPUS_SHARD_DEADLINE_MS", "1500")) / 1000
+        
+        # Candidate locations per campus, for nearby_only; loaded during warm-up
+        self.geo_index = CampusGeoIndex(db_manager)
+        # Larger nearby sets are left to the SQL bounding box instead of an id list
+        self.geo_pushdown_max_ids = int(os.getenv("GEO_PUSHDOWN_MAX_IDS", "2000"))
+        
+        # Candidates whose score bound cannot reach the top limit * SCORE_PRUNE_PAGES are not fully scored
+        self.prune_enabled = SCORE_PRUNING_ENABLED
+        self.prune_pages = int(os.getenv("SCORE_PRUNE_PAGES", "3"))
+        
+        # Candidate fetches started from the caller's campus while the profile is still loading
+        self.prefetch_enabled = CANDIDATE_PREFETCH_ENABLED
+        self.prefetch_factor = int(os.getenv("CANDIDATE_PREFETCH_FACTOR", "2"))
     
     async def initialize(self):
         """Initialize the recommendation engine"""
@@ -98,157 +137,665 @@ class RecommendationEngine:
         user_id: str,
         recommendation_type: RecommendationType,
         limit: int = 10,
-        filters: Optional[Dict] = None
+        filters: Optional[Dict] = None,
+        campus: Optional[str] = None
     ) -> List[RecommendationItem]:
         """
         Generate personalized recommendations for a user
+        
+        Identical calls that overlap (client retries, double taps) share one
+        pipeline run and its result. campus is the user's campus as far as
+        the caller knows it (the JWT's): it lets the candidate fetch start
+        while the profile is still loading, and never changes the result.
         """
+        key = (user_id, recommendation_type.value, limit, filters_key(filters))
+        recommendations = await self._flight.do(
+            key, lambda: self._generate_recommendations(user_id, recommendation_type, limit, filters, campus)
+        )
+        return list(recommendations)
+    
+    async def _generate_recommendations(
+        self,
+        user_id: str,
+        recommendation_type: RecommendationType,
+        limit: int,
+        filters: Optional[Dict],
+        campus: Optional[str] = None
+    ) -> List[RecommendationItem]:
+        timer = start_request(recommendation_type.value)
+        prefetch = {}
         try:
+            internal_id = user_ids.intern(user_id)
+            # Read before any candidate is fetched: feedback from here on keeps this ranking out of the cache
+            generation = self.result_cache.generation(internal_id)
+            
+            # Runs concurrently with the profile query, on its own pooled connection
+            prefetch = self._prefetch_candidates(user_id, internal_id, recommendation_type, limit, filters, campus)
+            
             # Get user profile
             user_profile = await self.db.get_user_profile(user_id)
+            timer.mark('profile_fetch')
             if not user_profile:
                 raise ValueError(f"User {user_id} not found")
             
-            # Get potential matches
-            exclude_ids = filters.get('exclude_user_ids', []) if filters else []
-            candidates = await self.db.get_potential_matches(
-                user_id, 
-                recommendation_type.value,
-                limit * 3,  # Get more candidates for better selection
-                exclude_ids
-            )
+            # Repeat opens are served from the cached ranking, minus what the user acted on
+            cache_key = self.result_cache.key(internal_id, recommendation_type.value, filters)
+            fingerprint = profile_fingerprint(user_profile) if self.result_cache.enabled else b""
+            ranked = self.result_cache.get(cache_key, limit, fingerprint)
+            timer.mark('cache_lookup')
             
-            if not candidates:
+            base_weights = self.weights.get(recommendation_type.value, self.weights['friends'])
+            if ranked is None:
+                ranked, complete = await self._rank_candidates(
+                    user_id, user_profile, recommendation_type, limit, filters, base_weights, timer, prefetch
+                )
+                # A ranking missing a slow shard is served once but not cached
+                if complete:
+                    self.result_cache.put(cache_key, CachedRanking(ranked, limit, fingerprint), generation)
+            else:
+                timer.count('cached', len(ranked))
+            
+            if not ranked:
+                timer.finish()
                 return []
             
-            # Calculate compatibility scores
+            # Phase 2: take the top K, then build explanations for just those. A
+            # candidate whose explanation fails is skipped and the next one moves up
             recommendations = []
-            for candidate in candidates:
-                try:
-                    compatibility_data = await self._calculate_compatibility(
-                        user_profile, 
-                        candidate, 
-                        recommendation_type
-                    )
+            position = 0
+            while len(recommendations) < limit and position < len(ranked):
+                top_scored = ranked[position:position + limit - len(recommendations)]
+                position += len(top_scored)
+                distances = self._distances_km(user_profile, [candidate for _, candidate, _, _ in top_scored])
+                for (score, candidate, scores, personality_match), distance_km in zip(top_scored, distances):
+                    try:
+                        recommendation = self._materialize_recommendation(
+                            user_profile,
+                            candidate,
+                            recommendation_type,
+                            score,
+                            scores,
+                            personality_match,
+                            distance_km
+                        )
+                    except Exception as e:
+                        logger.warning(f"Error building recommendation for user {candidate['id']}: {e}")
+                        continue
+                    recommendations.append(recommendation)
                     
-                    if compatibility_data['score'] > 0.3:  # Minimum threshold
-                        recommendations.append(RecommendationItem(
-                            user_id=candidate['id'],
-                            compatibility_score=compatibility_data['score'],
-                            match_reasons=compatibility_data['reasons'],
-                            common_interests=compatibility_data['common_interests'],
-                            personality_match=compatibility_data['personality_match'],
-                            explanation=compatibility_data['explanation'],
-                            confidence=compatibility_data['confidence']
-                        ))
-                except Exception as e:
-                    logger.warning(f"Error calculating compatibility for user {candidate['id']}: {e}")
-                    continue
+                    # Remember what was served so feedback on it can update the weights
+                    self.learner.remember(
+                        internal_id, candidate['internal_id'], user_profile.get('campus'), scores, base_weights
+                    )
+            timer.mark('materialization')
             
             # Sort by compatibility score and apply diversity
             recommendations = self._apply_diversity_filter(recommendations, user_profile)
             
             # Return top recommendations
-            return recommendations[:limit]
+            recommendations = recommendations[:limit]
+            timer.mark('diversity')
+            timer.count('returned', len(recommendations))
+            timer.finish()
+            return recommendations
             
         except Exception as e:
+            timer.fail()
             logger.error(f"Error generating recommendations: {e}")
             raise
+        finally:
+            # Cache hits, a different profile campus and failures leave prefetches behind
+            for task in prefetch.values():
+                PREFETCH.inc(("unused",))
+                if task.done() and not task.cancelled():
+                    task.exception()  # Retrieved, so a failure is not logged as unhandled
+                task.cancel()
     
-    async def _calculate_compatibility(
+    def _prefetch_candidates(
+        self,
+        user_id: str,
+        internal_id: int,
+        recommendation_type: RecommendationType,
+        limit: int,
+        filters: Optional[Dict],
+        campus: Optional[str]
+    ) -> Dict[str, "asyncio.Future"]:
+        """
+        Start the candidate fetch for each campus without waiting for the profile
+        
+        The campuses come from campus_filter or, failing that, the caller's
+        campus. The query leaves out every predicate that needs the profile
+        (age range, dealbreakers, gender, location), so it returns a superset
+        of the real page, and asks for prefetch_factor times as many rows so
+        that _prefetched() can usually cut the real page out of it. Nothing is
+        started when a cached ranking is likely to answer.
+        """
+        if not self.prefetch_enabled:
+            return {}
+        
+        if self.result_cache.has(
+            self.result_cache.key(internal_id, recommendation_type.value, filters)
+        ):
+            return {}
+        
+        # No preferences: compile_candidate_query then adds no profile predicates
+        query = compile_candidate_query(
+            {'id': user_id, 'campus': campus, 'preferences': None}, recommendation_type, filters
+        )
+        return {
+            shard: asyncio.ensure_future(self.db.get_potential_matches(
+                user_id,
+                recommendation_type.value,
+                limit * 3 * self.prefetch_factor,
+                query.exclude_ids,
+                query=query.for_campus(shard)
+            ))
+            for shard in query.campuses
+        }
+    
+    async def _prefetched(
+        self,
+        task: "asyncio.Future",
+        query: CandidateQuery,
+        limit: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        get_potential_matches(limit, query=query), cut out of a prefetch, or None if it cannot be
+        
+        get_potential_matches returns the 2 * limit most recently seen rows.
+        The prefetch returns the most recently seen rows of a looser query,
+        in the same order, and query.matches() drops those the real query
+        would not return. What is left starts with the real page. It holds
+        all of that page if 2 * limit rows are left, or if the prefetch came
+        back short and so saw every row there is.
+        """
+        rows = await task
+        page = limit * 2
+        candidates = [row for row in rows if query.matches(row)]
+        if len(candidates) >= page or len(rows) < page * self.prefetch_factor:
+            PREFETCH.inc(("hit",))
+            return candidates[:page]
+        PREFETCH.inc(("short",))
+        return None
+    
+    async def _rank_candidates(
+        self,
+        user_id: str,
+        user_profile: Dict[str, Any],
+        recommendation_type: RecommendationType,
+        limit: int,
+        filters: Optional[Dict],
+        base_weights: Dict[str, float],
+        timer,
+        prefetch: Optional[Dict[str, "asyncio.Future"]] = None
+    ) -> Tuple[List[Tuple[float, Dict[str, Any], Dict[str, float], Dict[str, float]]], bool]:
+        """
+        Fetch and score the candidate pool
+        
+        Returns every candidate above the minimum score as (score, candidate,
+        sub-scores, personality match), best first, and whether every campus
+        shard answered. A shard whose campus is in prefetch takes its
+        candidates from that fetch when it can (the entry is removed).
+        """
+        prefetch = {} if prefetch is None else prefetch
+        # Filters and the user's hard dealbreakers become retrieval predicates
+        query = compile_candidate_query(user_profile, recommendation_type, filters)
+        
+        # Weights are personalized once per request, not per candidate
+        weights = self.learner.personalize(user_ids.intern(user_id), user_profile.get('campus'), base_weights)
+        
+        # Per-profile features: the user's are computed once, not once per candidate
+        user_features = self._featurize(user_profile)
+        
+        # With pruning, only the first `depth` ranked entries are exact; a cached
+        # ranking serves later pages too, so it is kept exact for prune_pages pages
+        depth = None
+        if self.prune_enabled:
+            depth = limit * (self.prune_pages if self.result_cache.enabled else 1)
+        
+        if len(query.campuses) <= 1:
+            ranked = await self._rank_shard(
+                user_id, user_profile, recommendation_type, limit, query, weights, user_features, depth, timer,
+                prefetch.pop(query.campuses[0], None) if query.campuses else None
+            )
+            return ranked, True
+        
+        # Multi-campus: one shard per campus, fetched and scored concurrently,
+        # each marking its own timer so their stages do not bleed into each other
+        shard_timers = {campus: timer.child() for campus in query.campuses}
+        shards = {
+            campus: asyncio.ensure_future(self._rank_shard(
+                user_id, user_profile, recommendation_type, limit,
+                query.for_campus(campus), weights, user_features, depth, shard_timers[campus],
+                prefetch.pop(campus, None)
+            ))
+            for campus in query.campuses
+        }
+        done, pending = await asyncio.wait(shards.values(), timeout=self.shard_deadline)
+        for task in pending:
+            task.cancel()
+        timer.mark('shard_wait')
+        for shard_timer in shard_timers.values():
+            timer.merge(shard_timer)
+        
+        partial = []
+        for campus, task in shards.items():
+            if task in pending:
+                SHARDS.inc(("timeout",))
+                logger.warning(f"Campus shard {campus} missed the {self.shard_deadline * 1000:.0f} ms deadline, dropped")
+            elif task.exception() is not None:
+                SHARDS.inc(("error",))
+                logger.warning(f"Campus shard {campus} failed, dropped: {task.exception()}")
+            else:
+                SHARDS.inc(("ok",))
+                partial.append(task.result())
+        
+        # Each shard is sorted best first, so a k-way merge keeps the global order
+        ranked = list(heapq.merge(*partial, key=lambda entry: entry[0], reverse=True))
+        if depth is not None:
+            # The global top `depth` is within the shards' top `depth`s; past it there may be gaps
+            del ranked[depth:]
+        timer.mark('shard_merge')
+        return ranked, not pending and len(partial) == len(shards)
+    
+    async def _rank_shard(
+        self,
+        user_id: str,
+        user_profile: Dict[str, Any],
+        recommendation_type: RecommendationType,
+        limit: int,
+        query: CandidateQuery,
+        weights: Dict[str, float],
+        user_features: Optional[Dict[str, Any]],
+        depth: Optional[int],
+        timer,
+        prefetched: Optional["asyncio.Future"] = None
+    ) -> List[Tuple[float, Dict[str, Any], Dict[str, float], Dict[str, float]]]:
+        """
+        Fetch and score one campus's candidates, best first
+        
+        With a depth, the best `depth` scores so far are kept in a min-heap and
+        a candidate is only fully scored if its upper bound (_score_bound) can
+        still beat the threshold and the heap's worst entry. The returned list
+        is then the exhaustive ranking cut at `depth`. prefetched is this
+        shard's fetch from _prefetch_candidates, if one was started.
+        """
+        if query.near is not None and len(query.campuses) == 1:
+            # The grid answers "who is within the radius" without touching the database
+            nearby = self.geo_index.nearby(query.campuses[0], *query.near)
+            timer.mark('geo_lookup')
+            if nearby is not None:
+                if not nearby:
+                    if prefetched is not None:
+                        PREFETCH.inc(("unused",))
+                        prefetched.cancel()
+                    return []
+                if len(nearby) <= self.geo_pushdown_max_ids:
+                    query.include_ids = set(nearby)
+        
+        candidates = None
+        if prefetched is not None:
+            candidates = await self._prefetched(prefetched, query, limit * 3)
+        if candidates is None:
+            candidates = await self.db.get_potential_matches(
+                user_id, 
+                recommendation_type.value,
+                limit * 3,  # Get more candidates for better selection
+                query.exclude_ids,
+                query=query
+            )
+        timer.mark('candidate_fetch')
+        timer.count('fetched', len(candidates))
+        
+        if query.near is not None and candidates:
+            # Exact distance on the fetched rows; the index and the SQL only bound it
+            lat, lon, radius_km = query.near
+            distances = haversine_km(lat, lon, *coordinates(candidates))
+            candidates = [candidate for candidate, inside in zip(candidates, (distances <= radius_km).tolist()) if inside]
+            timer.mark('geo_filter')
+        
+        if not candidates:
+            return []
+        
+        bound_context = self._bound_context(user_profile, recommendation_type, user_features) if depth else None
+        
+        # Phase 1a: features, and with pruning a cheap upper bound, for every candidate
+        pending = []  # (bound, fetch position, candidate, features, precomputed factors)
+        for position, candidate in enumerate(candidates):
+            candidate_features = self.feature_store.get(candidate)
+            if candidate_features is None:
+                candidate_features = self._featurize(candidate)
+            timer.mark('featurization')
+            
+            if bound_context is None:
+                pending.append((math.inf, position, candidate, candidate_features, None))
+                continue
+            bound, precomputed = self._score_bound(
+                user_profile, candidate, weights, bound_context, candidate_features
+            )
+            pending.append((bound, position, candidate, candidate_features, precomputed))
+            timer.mark('bounding')
+        
+        if bound_context is not None:
+            # Highest bounds first, so the heap's worst score rises as fast as possible
+            pending.sort(key=lambda item: item[0], reverse=True)
+        
+        # Phase 1b: full numeric scores, until no remaining bound can make the cut
+        best: List[float] = []  # Min-heap of the best `depth` scores so far
+        scored = []
+        pruned = 0
+        for index, (bound, position, candidate, candidate_features, precomputed) in enumerate(pending):
+            if bound_context is not None:
+                bar = best[0] if len(best) >= depth else query.min_score
+                if bound + PRUNE_EPSILON < bar:
+                    # Bounds only fall from here and the bar only rises
+                    pruned = len(pending) - index
+                    break
+            
+            try:
+                score, scores, personality_match = self._score_candidate(
+                    user_profile, 
+                    candidate, 
+                    recommendation_type,
+                    weights,
+                    user_features,
+                    candidate_features,
+                    precomputed
+                )
+            except Exception as e:
+                logger.warning(f"Error calculating compatibility for user {candidate['id']}: {e}")
+                continue
+            finally:
+                timer.mark('scoring')
+            
+            if score > query.min_score:  # Minimum threshold (0.3 unless the request sets one)
+                scored.append((position, (score, candidate, scores, personality_match)))
+                if bound_context is not None:
+                    if len(best) < depth:
+                        heapq.heappush(best, score)
+                    elif score > best[0]:
+                        heapq.heapreplace(best, score)
+        timer.count('scored', len(candidates) - pruned)
+        timer.count('pruned', pruned)
+        timer.count('thresholded', len(scored))
+        
+        # Best first; equal scores keep their fetch order
+        scored.sort(key=lambda item: (-item[1][0], item[0]))
+        # Past `depth`, pruned candidates may be missing
+        ranked = [entry for _, entry in scored[:depth]]
+        timer.mark('ranking')
+        return ranked
+    
+    def _score_candidate(
         self, 
         user: Dict[str, Any], 
         candidate: Dict[str, Any],
-        rec_type: RecommendationType
-    ) -> Dict[str, Any]:
+        rec_type: RecommendationType,
+        weights: Dict[str, float],
+        user_features: Optional[Dict[str, Any]] = None,
+        candidate_features: Optional[Dict[str, Any]] = None,
+        precomputed: Optional[Tuple] = None
+    ) -> Tuple[float, Dict[str, float], Dict[str, float]]:
         """
-        Calculate comprehensive compatibility score between two users
+        Calculate the numeric compatibility score between two users.
+        
+        Returns the final score, the per-factor scores and the per-trait
+        personality match. Explanations are built separately, and only for
+        the candidates that make the cut. precomputed holds the factors
+        _score_bound has already computed exactly for this pair.
         """
         scores = {}
-        reasons = []
-        common_interests = []
         
         # 1. Interest Similarity
-        interest_score, common_ints = self._calculate_interest_similarity(user, candidate)
-        scores['interests'] = interest_score
-        common_interests = common_ints
-        
-        if interest_score > 0.7:
-            reasons.append(f"Share {len(common_interests)} common interests")
-        
-        # 2. Personality Compatibility
-        personality_score, personality_match = self._calculate_personality_compatibility(
-            user, candidate, rec_type
+        scores['interests'] = self._calculate_interest_similarity(
+            user, candidate, user_features, candidate_features
         )
-        scores['personality'] = personality_score
         
-        # 3. Lifestyle Compatibility
-        lifestyle_score = self._calculate_lifestyle_compatibility(user, candidate)
-        scores['lifestyle'] = lifestyle_score
-        
-        # 4. Academic Compatibility
-        academic_score = self._calculate_academic_compatibility(user, candidate)
-        scores['academic'] = academic_score
+        if precomputed is not None:
+            # 2-4. Computed by _score_bound
+            personality_score, personality_match, lifestyle, academic, dealbreaker_penalty = precomputed
+            scores['personality'] = personality_score
+            scores['lifestyle'] = lifestyle
+            scores['academic'] = academic
+        else:
+            # 2. Personality Compatibility
+            personality_score, personality_match = self._calculate_personality_compatibility(
+                user, candidate, rec_type
+            )
+            scores['personality'] = personality_score
+            
+            # 3. Lifestyle Compatibility
+            scores['lifestyle'] = self._calculate_lifestyle_compatibility(user, candidate)
+            
+            # 4. Academic Compatibility
+            scores['academic'] = self._calculate_academic_compatibility(user, candidate)
         
         # 5. Activity Level Compatibility
-        activity_score = self._calculate_activity_compatibility(user, candidate)
-        scores['activity'] = activity_score
+        scores['activity'] = self._calculate_activity_compatibility(user, candidate)
         
         # 6. Apply similarity preference (+1 or -1)
-        similarity_preference = self._get_similarity_preference(user, rec_type)
-        if similarity_preference == -1:
+        if self._get_similarity_preference(user, rec_type) == -1:
             # User wants opposites - invert some scores
             scores['personality'] = 1.0 - scores['personality']
             scores['lifestyle'] = 1.0 - scores['lifestyle']
-            reasons.append("Complementary personalities detected")
         
         # 7. Check dealbreakers
-        dealbreaker_penalty = self._check_dealbreakers(user, candidate)
+        if precomputed is None:
+            dealbreaker_penalty = self._check_dealbreakers(user, candidate)
         
         # Calculate weighted final score
-        weights = self.weights.get(rec_type.value, self.weights['friends'])
         final_score = sum(scores[key] * weights.get(key, 0) for key in scores)
         final_score *= (1.0 - dealbreaker_penalty)  # Apply dealbreaker penalty
         
-        # Generate explanation
-        explanation = self._generate_explanation(scores, reasons, rec_type)
+        return max(0.0, min(1.0, final_score)), scores, personality_match
+    
+    def _bound_context(
+        self,
+        user: Dict[str, Any],
+        rec_type: RecommendationType,
+        user_features: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Per-request inputs of _score_bound, or None when the user's profile rules bounding out"""
+        interests = user.get('interests', [])
+        if interests and user_features is None:
+            return None  # Malformed interests; every candidate takes the exhaustive path
         
-        # Calculate confidence based on data completeness
-        confidence = self._calculate_confidence(user, candidate, scores)
+        vector = user_features['interest_vector'] if user_features else {}
+        try:
+            if any(weight < 0 for weight in vector.values()) or not self._weights_nonnegative(interests):
+                return None  # The interest bound assumes non-negative weights
+        except TypeError:
+            return None
         
         return {
-            'score': max(0.0, min(1.0, final_score)),
-            'reasons': reasons,
-            'common_interests': common_interests,
-            'personality_match': personality_match,
-            'explanation': explanation,
-            'confidence': confidence,
-            'detailed_scores': scores
+            'rec_type': rec_type,
+            'inverted': self._get_similarity_preference(user, rec_type) == -1,
+            'has_interests': bool(interests),
+            'vector': vector,
+            'norm': math.sqrt(sum(weight * weight for weight in vector.values())),
+            'categories': set(user_features['interest_categories']) if user_features else set()
         }
     
+    def _score_bound(
+        self,
+        user: Dict[str, Any],
+        candidate: Dict[str, Any],
+        weights: Dict[str, float],
+        context: Dict[str, Any],
+        candidate_features: Optional[Dict[str, Any]]
+    ) -> Tuple[float, Optional[Tuple]]:
+        """
+        Upper bound on _score_candidate's final score, at about half its cost
+        
+        Personality, lifestyle, academic and the dealbreaker penalty are
+        computed exactly and returned with the bound, for _score_candidate
+        to reuse. The interest score, the most expensive factor, is bounded
+        by its exact cosine term and whether any interest category is
+        shared, with the other terms at their maximum; activity is bounded
+        by 1. The bound is infinite whenever it cannot be guaranteed, so the
+        candidate is scored in full.
+        """
+        try:
+            interest_bound = 0.0
+            if context['has_interests'] and candidate.get('interests'):
+                if candidate_features is None or not self._weights_nonnegative(candidate['interests']):
+                    return math.inf, None
+                
+                user_vector = context['vector']
+                dot = 0.0
+                norm = 0.0
+                shared = False
+                for name, weight in candidate_features['interest_vector'].items():
+                    if weight < 0:
+                        return math.inf, None
+                    norm += weight * weight
+                    if name in user_vector:
+                        dot += weight * user_vector[name]
+                        shared = True
+                cosine = dot / (context['norm'] * math.sqrt(norm)) if context['norm'] and norm else 0.0
+                category = 0.0 if context['categories'].isdisjoint(candidate_features['interest_categories']) else 1.0
+                # Without a shared interest the score is scaled by 0.5 (see _calculate_interest_similarity)
+                interest_bound = (0.5 * cosine + 0.3 * category + 0.2) * (1.0 if shared else 0.5)
+            
+            personality, personality_match = self._calculate_personality_compatibility(
+                user, candidate, context['rec_type']
+            )
+            lifestyle = self._calculate_lifestyle_compatibility(user, candidate)
+            academic = self._calculate_academic_compatibility(user, candidate)
+            penalty = self._check_dealbreakers(user, candidate)
+        except Exception:
+            return math.inf, None  # The full score handles (and logs) whatever went wrong
+        
+        precomputed = (personality, personality_match, lifestyle, academic, penalty)
+        if context['inverted']:
+            personality, lifestyle = 1.0 - personality, 1.0 - lifestyle
+        bound = (
+            interest_bound * weights.get('interests', 0)
+            + personality * weights.get('personality', 0)
+            + lifestyle * weights.get('lifestyle', 0)
+            + academic * weights.get('academic', 0)
+            + weights.get('activity', 0)
+        )
+        return bound * (1.0 - penalty), precomputed
+    
+    @staticmethod
+    def _weights_nonnegative(interests: List) -> bool:
+        return all(not isinstance(interest, dict) or interest.get('weight', 1.0) >= 0 for interest in interests)
+    
+    def _materialize_recommendation(
+        self,
+        user: Dict[str, Any],
+        candidate: Dict[str, Any],
+        rec_type: RecommendationType,
+        score: float,
+        scores: Dict[str, float],
+        personality_match: Dict[str, float],
+        distance_km: Optional[float] = None
+    ) -> RecommendationItem:
+        """Build the reasons, explanation and confidence for a selected candidate"""
+        reasons = []
+        common_interests = [
+            name for name, _ in self._iter_common_interests(
+                user.get('interests', []), candidate.get('interests', [])
+            )
+        ]
+        
+        if scores['interests'] > 0.7:
+            reasons.append(f"Share {len(common_interests)} common interests")
+        
+        if self._get_similarity_preference(user, rec_type) == -1:
+            reasons.append("Complementary personalities detected")
+        
+        # Every value here is computed and clamped by the engine, so skip validation
+        return RecommendationItem.model_construct(
+            user_id=str(candidate['id']),
+            compatibility_score=score,
+            match_reasons=reasons,
+            common_interests=common_interests,
+            personality_match=personality_match,
+            distance_km=distance_km,
+            explanation=self._generate_explanation(scores, reasons, rec_type),
+            confidence=self._calculate_confidence(user, candidate, scores)
+        )
+    
+    def _distances_km(self, user: Dict[str, Any], candidates: List[Dict[str, Any]]) -> List[Optional[float]]:
+        """Distance from the user to each candidate, rounded to 0.1 km (None where either location is unknown)"""
+        lat, lon = user.get('latitude'), user.get('longitude')
+        if lat is None or lon is None or not candidates:
+            return [None] * len(candidates)
+        
+        distances = haversine_km(float(lat), float(lon), *coordinates(candidates))
+        return [None if math.isnan(distance) else round(distance, 1) for distance in distances.tolist()]
+    
+    def _featurize(self, profile: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Precompute the per-profile parts of the interest score
+        
+        Returns None for malformed interests, in which case scoring recomputes
+        them and the candidate is skipped with the usual warning.
+        """
+        interests = profile.get('interests', [])
+        if not interests:
+            return {'interest_vector': {}, 'interest_categories': {}}
+        
+        try:
+            return {
+                'interest_vector': self._create_weighted_interest_vector(interests),
+                'interest_categories': self._get_weighted_interest_categories(interests)
+            }
+        except Exception:
+            return None
+    
     def _calculate_interest_similarity(
         self, 
         user: Dict[str, Any], 
-        candidate: Dict[str, Any]
-    ) -> Tuple[float, List[str]]:
+        candidate: Dict[str, Any],
+        user_features: Optional[Dict[str, Any]] = None,
+        candidate_features: Optional[Dict[str, Any]] = None
+    ) -> float:
         """Calculate weighted interest-based similarity with collaborative filtering"""
         user_interests = user.get('interests', [])
         candidate_interests = candidate.get('interests', [])
         
         if not user_interests or not candidate_interests:
-            return 0.0, []
+            return 0.0
         
-        # Convert to weighted vectors
-        user_vector = self._create_weighted_interest_vector(user_interests)
-        candidate_vector = self._create_weighted_interest_vector(candidate_interests)
+        if user_features is None:
+            user_features = {
+                'interest_vector': self._create_weighted_interest_vector(user_interests),
+                'interest_categories': self._get_weighted_interest_categories(user_interests)
+            }
+        if candidate_features is None:
+            candidate_features = {
+                'interest_vector': self._create_weighted_interest_vector(candidate_interests),
+                'interest_categories': self._get_weighted_interest_categories(candidate_interests)
+            }
         
         # Calculate weighted cosine similarity
-        cosine_sim = self._weighted_cosine_similarity(user_vector, candidate_vector)
+        cosine_sim = self._weighted_cosine_similarity(
+            user_features['interest_vector'], candidate_features['interest_vector']
+        )
         
-        # Find common interests with weights
-        common_interests = []
+        # Weight common interests by both users' weights
+        common_count = 0
         total_weight = 0.0
+        for _, pair_weight in self._iter_common_interests(user_interests, candidate_interests):
+            common_count += 1
+            total_weight += pair_weight
+        
+        # Collaborative filtering boost
+        cf_boost = self._calculate_collaborative_boost(user, candidate)
+        
+        # Category-based similarity with weights
+        category_score = self._calculate_category_similarity(
+            user_features['interest_categories'], candidate_features['interest_categories']
+        )
         
+        # Combined score with collaborative filtering
+        return (0.5 * cosine_sim + 0.3 * category_score + 0.2 * cf_boost) * min(1.0, total_weight / common_count if common_count else 0.5)
+    
+    def _iter_common_interests(self, user_interests: List, candidate_interests: List):
+        """Yield (interest name, pair weight) for each user interest the candidate shares"""
         for interest_data in user_interests:
             interest_name = interest_data.get('name') if isinstance(interest_data, dict) else interest_data
             user_weight = interest_data.get('weight', 1.0) if isinstance(interest_data, dict) else 1.0
@@ -259,24 +806,8 @@ class RecommendationEngine:
                 candidate_weight = candidate_interest.get('weight', 1.0) if isinstance(candidate_interest, dict) else 1.0
                 
                 if interest_name.lower() == candidate_name.lower():
-                    common_interests.append(interest_name)
-                    # Weight common interests by both users' weights
-                    total_weight += (user_weight + candidate_weight) / 2.0
+                    yield interest_name, (user_weight + candidate_weight) / 2.0
                     break
-        
-        # Collaborative filtering boost
-        cf_boost = self._calculate_collaborative_boost(user, candidate)
-        
-        # Category-based similarity with weights
-        user_categories = self._get_weighted_interest_categories(user_interests)
-        candidate_categories = self._get_weighted_interest_categories(candidate_interests)
-        
-        category_score = self._calculate_category_similarity(user_categories, candidate_categories)
-        
-        # Combined score with collaborative filtering
-        final_score = (0.5 * cosine_sim + 0.3 * category_score + 0.2 * cf_boost) * min(1.0, total_weight / len(common_interests) if common_interests else 0.5)
-        
-        return final_score, common_interests
     
     def _calculate_personality_compatibility(
         self, 
@@ -520,6 +1051,12 @@ class RecommendationEngine:
         if isinstance(candidate_last_seen, str):
             candidate_last_seen = datetime.fromisoformat(candidate_last_seen.replace('Z', '+00:00'))
         
+        # asyncpg returns timestamptz as aware datetimes; compare everything as naive UTC
+        if user_last_seen.tzinfo is not None:
+            user_last_seen = user_last_seen.astimezone(timezone.utc).replace(tzinfo=None)
+        if candidate_last_seen.tzinfo is not None:
+            candidate_last_seen = candidate_last_seen.astimezone(timezone.utc).replace(tzinfo=None)
+        
         now = datetime.utcnow()
         user_days_ago = (now - user_last_seen).days
         candidate_days_ago = (now - candidate_last_seen).days
@@ -682,7 +1219,7 @@ class RecommendationEngine:
         confidence_factors.append((user_completeness + candidate_completeness) / 2)
         
         # Score consistency
-        score_variance = np.var(list(scores.values()))
+        score_variance = float(np.var(list(scores.values())))
         consistency_score = max(0, 1.0 - score_variance)
         confidence_factors.append(consistency_score)
         
@@ -754,6 +1291,15 @@ class RecommendationEngine:
     ):
         """Record user feedback for improving recommendations"""
         await self.db.record_feedback(user_id, target_user_id, action)
+        self.result_cache.exclude(user_ids.intern(user_id), user_ids.find(target_user_id))
+    
+    async def process_feedback(self, feedback: UserFeedback):
+        """Update the user's and campus's learned weights from a feedback event"""
+        # A target that was never interned was never served, so there is nothing to learn or drop
+        internal_id = user_ids.intern(feedback.user_id)
+        target = user_ids.find(feedback.target_user_id)
+        self.learner.update(internal_id, target, feedback.action)
+        self.result_cache.exclude(internal_id, target)
     
     async def get_user_stats(self, user_id: str) -> Dict[str, Any]:
         """Get user recommendation statistics"""
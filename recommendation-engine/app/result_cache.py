@@ -0,0 +1,197 @@
+import os
+import sys
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+import orjson
+
+from .metrics import registry
+from .memory import deep_size, sampled_size
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_ENABLED = os.getenv("RECOMMENDATION_CACHE_ENABLED", "true").lower() == "true"
+
+CACHE_LOOKUPS = registry.counter(
+    "recommendation_cache_lookups_total",
+    "Ranked-feed cache lookups by outcome (hit, miss, expired, profile_changed, too_short = not enough unseen candidates left)",
+    ("outcome",)
+)
+
+# Profile fields that change on every request and do not make a ranking stale
+VOLATILE_PROFILE_FIELDS = ('last_seen',)
+
+def filters_key(filters: Optional[Dict[str, Any]]) -> str:
+    """Stable hash of a filters dict ('' for no filters)"""
+    if not filters:
+        return ""
+    encoded = orjson.dumps(filters, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+def profile_fingerprint(profile: Dict[str, Any]) -> bytes:
+    """Digest of the profile fields the ranking depends on"""
+    stable = {key: value for key, value in profile.items() if key not in VOLATILE_PROFILE_FIELDS}
+    encoded = orjson.dumps(stable, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+class CachedRanking:
+    """Thresholded ranking for one (user, type, filters), best first (cut at the engine's pruning depth)"""
+
+    __slots__ = ("ranked", "limit", "fingerprint", "created", "acted")
+
+    def __init__(self, ranked: List[Tuple], limit: int, fingerprint: bytes):
+        # (score, candidate, sub-scores, personality match), sorted by score descending
+        self.ranked = ranked
+        self.limit = limit  # The request limit the candidate pool was sized for
+        self.fingerprint = fingerprint
+        self.created = time.monotonic()
+        self.acted: Set[int] = set()  # Interned ids of the candidates the user has liked or passed since
+
+    @property
+    def exhausted(self) -> bool:
+        """The pool ran short, so a rescore would not find more candidates either"""
+        return len(self.ranked) < self.limit
+
+    def unseen(self) -> List[Tuple]:
+        if not self.acted:
+            return self.ranked
+        return [entry for entry in self.ranked if entry[1]['internal_id'] not in self.acted]
+
+class RecommendationCache:
+    """
+    Per-user ranked-feed cache.
+
+    Keyed by (interned user id, recommendation_type, filters hash), each
+    entry keeps the scored list well past the top `limit` (all of it, or
+    SCORE_PRUNE_PAGES pages with score pruning on), so a repeat open or a
+    pull-to-refresh is a dict lookup plus dropping the candidates the user
+    has acted on since. Feedback removes its target from the user's entries
+    instead of invalidating them; an entry is discarded when the user's own
+    profile changes, when it is older than the TTL, or when too few unseen
+    candidates are left to fill a page.
+
+    Weight updates from the online learner only reach a cached ranking when
+    it is rebuilt, so the TTL also bounds how long they take to show up.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl or int(os.getenv("RECOMMENDATION_CACHE_TTL_MS", "300000")) / 1000
+        self.max_entries = max_entries or int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "10000"))
+        self.enabled = RESULT_CACHE_ENABLED
+
+        self._entries: "OrderedDict[Tuple[int, str, str], CachedRanking]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[Tuple[int, str, str]]] = {}
+        # Bumped by feedback and invalidation; a ranking computed across a bump is not stored
+        self._generations: Dict[int, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(user_id: int, recommendation_type: str, filters: Optional[Dict[str, Any]]) -> Tuple[int, str, str]:
+        return (user_id, recommendation_type, filters_key(filters))
+
+    def generation(self, user_id: int) -> int:
+        return self._generations.get(user_id, 0)
+
+    def get(self, key: Tuple[int, str, str], limit: int, fingerprint: bytes) -> Optional[List[Tuple]]:
+        """Unseen ranked candidates for key, or None when the ranking has to be rebuilt"""
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._miss("miss")
+        if time.monotonic() - entry.created > self.ttl:
+            self._discard(key)
+            return self._miss("expired")
+        if entry.fingerprint != fingerprint:
+            self.invalidate(key[0])
+            return self._miss("profile_changed")
+
+        unseen = entry.unseen()
+        if limit > entry.limit or (len(unseen) < limit and not entry.exhausted):
+            return self._miss("too_short")
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        CACHE_LOOKUPS.inc(("hit",))
+        return unseen
+
+    def has(self, key: Tuple[int, str, str]) -> bool:
+        """Whether get() may answer for key, without counting a lookup (its checks still apply)"""
+        entry = self._entries.get(key) if self.enabled else None
+        return entry is not None and time.monotonic() - entry.created <= self.ttl
+
+    def put(self, key: Tuple[int, str, str], entry: CachedRanking, generation: int):
+        """Store a ranking unless the user acted or was invalidated while it was computed"""
+        if not self.enabled or self.generation(key[0]) != generation:
+            return
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(key[0], set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def exclude(self, user_id: int, target_user_id: Optional[int]):
+        """
+        Drop a candidate the user has acted on from every cached ranking of theirs
+
+        A target that was never interned cannot be in any ranking, but a
+        ranking being computed right now may still pick it up, so the
+        generation is bumped either way.
+        """
+        self._bump(user_id)
+        if target_user_id is None:
+            return
+        for key in self._keys_by_user.get(user_id, ()):
+            self._entries[key].acted.add(target_user_id)
+
+    def invalidate(self, user_id: int):
+        """Forget every cached ranking for a user"""
+        self._bump(user_id)
+        for key in list(self._keys_by_user.get(user_id, ())):
+            self._discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions
+        }
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Rankings are sized from a sample of the most recently used ones"""
+        return {
+            "rankings": sampled_size(reversed(self._entries.values()), len(self._entries)),
+            "index": sys.getsizeof(self._entries) + deep_size(self._keys_by_user) + deep_size(self._generations)
+        }
+
+    def _miss(self, outcome: str) -> None:
+        self.misses += 1
+        CACHE_LOOKUPS.inc((outcome,))
+        return None
+
+    def _bump(self, user_id: int):
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def _discard(self, key: Tuple[int, str, str]):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
@@ -0,0 +1,80 @@
+import os
+import logging
+import importlib.util
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import orjson
+from fastapi import Request
+from starlette.responses import Response
+
+from .models import RecommendationItem
+
+# msgpack output is optional, and the module is only imported once a client asks for it
+MSGPACK_AVAILABLE = importlib.util.find_spec("msgpack") is not None
+
+logger = logging.getLogger(__name__)
+
+# Skip pydantic re-validation and the stdlib JSON encoder on the hot endpoints
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "true").lower() == "true"
+
+MSGPACK_MEDIA_TYPES = ("application/x-msgpack", "application/msgpack")
+
+class ORJSONResponse(Response):
+    """JSON response encoded with orjson (datetimes and enums handled natively)"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+class MsgPackResponse(Response):
+    """MessagePack response for clients that ask for it via the Accept header"""
+    media_type = "application/x-msgpack"
+
+    def render(self, content: Any) -> bytes:
+        import msgpack
+        return msgpack.packb(content, default=_msgpack_default, use_bin_type=True)
+
+def _msgpack_default(value: Any) -> Any:
+    """Encode the types msgpack does not know about"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "value"):  # Enum members
+        return value.value
+    raise TypeError(f"Cannot serialize {type(value).__name__} to msgpack")
+
+def wants_msgpack(request: Request) -> bool:
+    """Check whether the client asked for msgpack and we can produce it"""
+    if not MSGPACK_AVAILABLE:
+        return False
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+def encode_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """Encode a plain payload as msgpack or orjson depending on the Accept header"""
+    if wants_msgpack(request):
+        return MsgPackResponse(content=content, status_code=status_code)
+    return ORJSONResponse(content=content, status_code=status_code)
+
+def recommendation_payload(
+    user_id: str,
+    recommendations: List[RecommendationItem],
+    algorithm_version: str,
+    total_candidates: int = 0,
+    fallback_used: bool = False,
+    generated_at: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Build the RecommendationResponse shape as a plain dict.
+
+    Items are built by the engine with model_construct, so their field
+    values are already final and can be handed to the encoder as-is.
+    """
+    return {
+        "user_id": user_id,
+        "recommendations": [item.__dict__ for item in recommendations],
+        "algorithm_version": algorithm_version,
+        "generated_at": generated_at or datetime.utcnow(),
+        "total_candidates": total_candidates,
+        "fallback_used": fallback_used
+    }
@@ -0,0 +1,68 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Any, Awaitable, Callable, Hashable
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+SINGLE_FLIGHT_CALLS = registry.counter(
+    "single_flight_calls_total",
+    "Calls through a single-flight group (leader = ran the work, follower = shared a call already in flight)",
+    ("operation", "role")
+)
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key (the leader) starts the work as a task; every
+    caller that arrives while it is in flight (a follower) awaits the same
+    task and gets the same result or exception. The key is forgotten as soon
+    as the task finishes, so nothing is cached beyond the call itself.
+
+    Callers await the task through asyncio.shield, so a client disconnect
+    cancels only that caller's wait, never the work the others are sharing.
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key, or join the call for key already in flight"""
+        if not SINGLE_FLIGHT_ENABLED:
+            return await fn()
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+            self.leaders += 1
+            SINGLE_FLIGHT_CALLS.inc((self.operation, "leader"))
+        else:
+            self.followers += 1
+            SINGLE_FLIGHT_CALLS.inc((self.operation, "follower"))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.followers
+        return {
+            "in_flight": len(self._in_flight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalesced_rate": round(self.followers / calls, 4) if calls else None
+        }
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception retrieved in case every caller was cancelled
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"{self.operation} call for {key} failed: {task.exception()}")
@@ -0,0 +1,136 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+
+from .database import DatabaseManager
+from .models import RecommendationType
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+
+SYNTHETIC_INTERESTS = [
+    'coding', 'music', 'football', 'photography', 'research', 'gaming',
+    'dance', 'startup', 'cooking', 'travel', 'ai', 'gym', 'movies', 'design'
+]
+
+class WarmupManager:
+    """
+    Brings a worker to steady state before it reports ready.
+
+    Steps run in order and each is timed: open the database pool to
+    min_size, load the per-campus feature store and geo index, then run a
+    synthetic scoring pass so the scoring and NumPy code paths are hot. A
+    failed step is logged and skipped; the worker still becomes ready, just
+    colder.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, engine):
+        self.db = db_manager
+        self.engine = engine
+        self.scoring_iterations = int(os.getenv("WARMUP_SCORING_ITERATIONS", "300"))
+        campuses = os.getenv("WARMUP_CAMPUSES")
+        self.campuses: Optional[List[str]] = [c.strip() for c in campuses.split(",")] if campuses else None
+
+        self.ready = False
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[datetime] = None
+        self.completed_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Run the warm-up in the background so liveness answers meanwhile"""
+        self._task = asyncio.create_task(self.run())
+
+    async def wait_ready(self):
+        if self._task:
+            await self._task
+
+    async def run(self):
+        """Run every warm-up step, then flip readiness"""
+        self.started_at = datetime.utcnow()
+        if WARMUP_ENABLED:
+            await self._step("database_pool", self.db.warm_pool)
+            await self._step("feature_store", lambda: self.engine.feature_store.load(self.db, self.campuses))
+            await self._step("geo_index", lambda: self.engine.geo_index.load(self.campuses))
+            await self._step("scoring", self._synthetic_scoring_pass)
+
+        self.completed_at = datetime.utcnow()
+        self.ready = True
+        total_ms = (self.completed_at - self.started_at).total_seconds() * 1000
+        logger.info(f"Warm-up finished in {total_ms:.0f} ms, worker is ready")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warmup_enabled": WARMUP_ENABLED,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "steps": self.steps
+        }
+
+    async def _step(self, name: str, fn):
+        self.steps[name] = {"status": "running"}
+        start = time.perf_counter()
+        try:
+            result = await fn()
+            self.steps[name] = {
+                "status": "done",
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "result": result
+            }
+        except Exception as e:
+            logger.error(f"Warm-up step {name} failed: {e}")
+            self.steps[name] = {
+                "status": "failed",
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "error": str(e)
+            }
+
+    async def _synthetic_scoring_pass(self) -> int:
+        """Score synthetic profiles through the same methods a request uses"""
+        rng = random.Random(7)
+        user = self._synthetic_profile(rng, "warmup-user")
+        user_features = self.engine._featurize(user)
+        scored = 0
+
+        for i in range(self.scoring_iterations):
+            candidate = self._synthetic_profile(rng, f"warmup-{i}")
+            rec_type = (RecommendationType.FRIENDS, RecommendationType.DATING, RecommendationType.DAILY_MATCH)[i % 3]
+            weights = self.engine.weights[rec_type.value]
+            score, scores, personality_match = self.engine._score_candidate(
+                user, candidate, rec_type, weights, user_features, self.engine._featurize(candidate)
+            )
+            self.engine._materialize_recommendation(user, candidate, rec_type, score, scores, personality_match)
+            scored += 1
+        return scored
+
+    @staticmethod
+    def _synthetic_profile(rng: random.Random, user_id: str) -> Dict[str, Any]:
+        has_traits = rng.random() < 0.5
+        return {
+            'id': user_id,
+            'display_name': user_id,
+            'age': rng.randint(18, 24),
+            'bio': 'x' * rng.choice([0, 60]),
+            'interests': rng.sample(SYNTHETIC_INTERESTS, rng.randint(1, 6)),
+            'personality_traits': {
+                trait: rng.random()
+                for trait in ('openness', 'conscientiousness', 'extraversion', 'agreeableness', 'neuroticism')
+            } if has_traits else {},
+            'preferences': {'age_range': [18, 26], 'connect_similarity': 1, 'dating_similarity': rng.choice([1, -1])},
+            'food_preference': rng.choice(['vegetarian', 'non_vegetarian', 'vegan', None]),
+            'smoking': rng.choice(['never', 'socially', None]),
+            'drinking': rng.choice(['never', 'socially', 'occasionally', None]),
+            'campus': 'Pilani',
+            'year': rng.randint(1, 4),
+            'branch': rng.choice(['CS', 'EEE', 'Mech']),
+            'response_rate': rng.random(),
+            'activity_score': rng.random(),
+            'connection_count': rng.randint(0, 5),
+            'last_seen': datetime.utcnow() - timedelta(days=rng.randint(0, 20))
+        }
@@ -0,0 +1,255 @@
+"""
+In-memory stand-in for app.database.DatabaseManager
+
+Implements the DatabaseManager methods the engine and API call, with the same
+filtering and ordering as the SQL, so benchmarks and load tests can drive the
+real engine without Postgres. An optional per-call latency emulates the
+network round trip to Supabase.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
+
+from app.filters import CandidateQuery, compile_candidate_query
+from app.interning import user_ids
+from app.models import RecommendationType
+
+def _candidate_order(users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sort users newest-seen first, ties by id, like the candidate query"""
+    by_id = sorted(users, key=lambda u: str(u['id']))
+    return sorted(by_id, key=lambda u: u['last_seen'], reverse=True)
+
+class InMemoryDatabaseManager:
+    def __init__(
+        self,
+        users: List[Dict[str, Any]],
+        connections: Optional[List[Dict[str, Any]]] = None,
+        latency_ms: float = 0.0
+    ):
+        self.latency = latency_ms / 1000
+        self.pool = None
+        self.users: Dict[str, Dict[str, Any]] = {str(user['id']): user for user in users}
+        # Candidate rows carry their interned id, as DatabaseManager's do
+        for user in users:
+            user['internal_id'] = user_ids.intern(user['id'])
+        self.feedback: Dict[tuple, Dict[str, Any]] = {}
+        self.connections: Dict[tuple, Dict[str, Any]] = {}
+        self._connected: Dict[str, set] = {}
+        self.calls: Dict[str, int] = {}
+        self.impressions: List[Dict[str, Any]] = []
+
+        for connection in connections or []:
+            self._add_connection(connection)
+
+        # Per-campus candidate order, as ORDER BY u.last_seen DESC, u.id would return it
+        self._by_campus: Dict[str, List[Dict[str, Any]]] = {}
+        for user in _candidate_order(users):
+            self._by_campus.setdefault(user['campus'], []).append(user)
+
+    async def _round_trip(self, name: str):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def connect(self):
+        self.pool = self
+
+    async def disconnect(self):
+        self.pool = None
+
+    async def close(self):
+        await self.disconnect()
+
+    async def health_check(self) -> bool:
+        if not self.pool:
+            await self.connect()
+        await self._round_trip("health_check")
+        return True
+
+    async def warm_pool(self) -> int:
+        if not self.pool:
+            await self.connect()
+        await self._round_trip("warm_pool")
+        return 1
+
+    def pool_stats(self) -> Dict[str, int]:
+        return {"size": 1, "idle": 1, "min_size": 1, "max_size": 1} if self.pool else {}
+
+    async def estimate_user_count(self) -> int:
+        await self._round_trip("estimate_user_count")
+        return len(self.users)
+
+    async def get_active_campuses(self) -> List[str]:
+        await self._round_trip("get_active_campuses")
+        return sorted(
+            campus for campus, users in self._by_campus.items()
+            if any(user['is_active'] for user in users)
+        )
+
+    async def get_campus_feature_rows(self, campus: str, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        await self._round_trip("get_campus_feature_rows")
+        active_since = datetime.now(timezone.utc) - timedelta(days=30)
+        return [
+            {'id': str(user['id']), 'interests': list(user['interests']), 'changed_at': user['updated_at']}
+            for user in self._by_campus.get(campus, [])
+            if user['last_seen'] > active_since
+            and user['is_active'] and user['verified'] and user['profile_completed']
+            and (since is None or user['updated_at'] > since)
+        ]
+
+    async def get_campus_locations(self, campus: str) -> List[Dict[str, Any]]:
+        await self._round_trip("get_campus_locations")
+        active_since = datetime.now(timezone.utc) - timedelta(days=30)
+        return [
+            {'id': str(user['id']), 'latitude': user.get('latitude'), 'longitude': user.get('longitude')}
+            for user in self._by_campus.get(campus, [])
+            if user['last_seen'] > active_since
+            and user['is_active'] and user['verified'] and user['profile_completed']
+            and user.get('latitude') is not None and user.get('longitude') is not None
+        ]
+
+    async def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        await self._round_trip("get_user_profile")
+        user = self.users.get(str(user_id))
+        if not user or not user['is_active']:
+            return None
+        profile = dict(user)
+        del profile['internal_id']  # Only candidate rows carry it
+        return profile
+
+    async def get_potential_matches(
+        self,
+        user_id: str,
+        recommendation_type: str,
+        limit: int = 50,
+        exclude_ids: List[str] = None,
+        query: Optional[CandidateQuery] = None
+    ) -> List[Dict[str, Any]]:
+        await self._round_trip("get_potential_matches")
+        if query is None:
+            user = self.users.get(str(user_id))
+            query = compile_candidate_query(
+                {'id': str(user_id), 'campus': user['campus'] if user else None},
+                RecommendationType(recommendation_type),
+                {'exclude_user_ids': exclude_ids or []}
+            )
+
+        connected = set(self._connected_ids(str(user_id)))
+        candidates = []
+        for campus in query.campuses:
+            found = 0
+            for candidate in self._by_campus.get(campus, []):
+                if candidate['last_seen'] <= query.active_since or found >= limit * 2:
+                    break
+                if str(candidate['id']) not in connected and query.matches(candidate):
+                    candidates.append(candidate)
+                    found += 1
+        # Merge the campuses the way ORDER BY u.last_seen DESC, u.id LIMIT would
+        candidates = _candidate_order(candidates)
+        return [dict(candidate) for candidate in candidates[:limit * 2]]
+
+    async def record_feedback(
+        self,
+        user_id: str,
+        target_user_id: str,
+        action: str,
+        context: Dict[str, Any] = None
+    ):
+        await self.record_feedback_batch([{
+            'user_id': user_id,
+            'target_user_id': target_user_id,
+            'action': action,
+            'context': context,
+            'created_at': datetime.utcnow()
+        }])
+
+    async def record_feedback_batch(
+        self,
+        events: List[Dict[str, Any]],
+        mutual_known: bool = False
+    ) -> List[tuple]:
+        await self._round_trip("record_feedback_batch")
+        batch = {}
+        for event in events:
+            batch[(event['user_id'], event['target_user_id'])] = {
+                **event, 'context': json.dumps(event.get('context') or {})
+            }
+
+        created = []
+        for (user_id, target_user_id), event in batch.items():
+            if event['action'] not in ('like', 'super_like'):
+                continue
+            if mutual_known:
+                mutual = event.get('mutual')
+            else:
+                reverse = batch.get((target_user_id, user_id)) or self.feedback.get((target_user_id, user_id))
+                mutual = reverse is not None and reverse['action'] in ('like', 'super_like')
+            if mutual:
+                user1_id, user2_id = sorted((user_id, target_user_id))
+                if (user1_id, user2_id) not in self.connections:
+                    self._add_connection({
+                        'user1_id': user1_id, 'user2_id': user2_id, 'status': 'accepted',
+                        'compatibility_score': None
+                    })
+                    created.append((user1_id, user2_id))
+
+        self.feedback.update(batch)
+        return created
+
+    async def get_like_edges(self) -> List[tuple]:
+        await self._round_trip("get_like_edges")
+        return [
+            (user_id, target_user_id)
+            for (user_id, target_user_id), event in self.feedback.items()
+            if event['action'] in ('like', 'super_like')
+        ]
+
+    async def get_user_stats(self, user_id: str) -> Dict[str, Any]:
+        await self._round_trip("get_user_stats")
+        return self._user_stats(user_id)
+
+    async def get_user_stats_bulk(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        await self._round_trip("get_user_stats_bulk")
+        return {user_id: self._user_stats(user_id) for user_id in user_ids}
+
+    def _user_stats(self, user_id: str) -> Dict[str, Any]:
+        actions = [e['action'] for (u, _), e in self.feedback.items() if u == user_id]
+        likes = sum(1 for a in actions if a in ('like', 'super_like'))
+        mine = [
+            self.connections[(user_id, other) if user_id < other else (other, user_id)]
+            for other in self._connected.get(user_id, ())
+        ]
+        scores = [c['compatibility_score'] for c in mine if c.get('compatibility_score') is not None]
+        return {
+            'likes_given': likes,
+            'passes_given': sum(1 for a in actions if a == 'pass'),
+            'total_connections': len(mine),
+            'avg_compatibility': sum(scores) / len(scores) if scores else None,
+            'match_rate': len(mine) / likes if likes else 0.0
+        }
+
+    async def copy_impressions(self, impressions: List[Dict[str, Any]]):
+        await self._round_trip("copy_impressions")
+        self.impressions.extend(impressions)
+
+    async def update_user_activity(self, user_id: str):
+        await self._round_trip("update_user_activity")
+        user = self.users.get(str(user_id))
+        if user:
+            user['last_seen'] = datetime.now(timezone.utc)
+
+    def _add_connection(self, connection: Dict[str, Any]):
+        user1_id, user2_id = str(connection['user1_id']), str(connection['user2_id'])
+        self.connections[(user1_id, user2_id)] = connection
+        self._connected.setdefault(user1_id, set()).add(user2_id)
+        self._connected.setdefault(user2_id, set()).add(user1_id)
+
+    def _connected_ids(self, user_id: str) -> List[str]:
+        connected = []
+        for other_id in self._connected.get(user_id, ()):
+            key = (user_id, other_id) if user_id < other_id else (other_id, user_id)
+            if self.connections[key]['status'] in ('accepted', 'pending', 'blocked'):
+                connected.append(other_id)
+        return connected
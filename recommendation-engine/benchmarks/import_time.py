@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Import-time report and budget check for app.main
+
+Imports the app in fresh interpreters with `python -X importtime`, summarizes
+the slowest top-level packages and fails when the app import exceeds the
+budget. Cold start on Render's free tier is mostly import time, and a slow
+import shows up as failed health checks after every spin-up.
+
+Run with: python benchmarks/import_time.py [--max-ms 1500] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure(module: str) -> Tuple[int, Dict[str, int], Dict[str, int]]:
+    """
+    Import module in a fresh interpreter
+
+    Returns the module's cumulative import time and the cumulative time per
+    top-level package and per module, all in microseconds.
+    """
+    env = dict(os.environ)
+    # app.main builds a DatabaseManager at import; it only needs the variable set
+    env.setdefault("DATABASE_URL", "postgresql://import-time@localhost/unused")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(cumulative)))
+
+    # -X importtime prints children before parents; walk it parent-first
+    total = 0
+    packages: Dict[str, int] = defaultdict(int)
+    modules: Dict[str, int] = {}
+    parents = []
+    for depth, name, cumulative in reversed(entries):
+        del parents[depth:]
+        parent = parents[-1] if parents else None
+        parents.append(name)
+        modules[name] = cumulative
+        if name == module:
+            total = cumulative
+        # Charge each package where it is first pulled in from outside itself
+        package = name.split(".")[0]
+        if parent is None or parent.split(".")[0] != package:
+            packages[package] += cumulative
+    return total, dict(packages), modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to try; the fastest run is reported")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument(
+        "--max-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "0")),
+        help="Fail if the import takes longer than this (0 disables the check)"
+    )
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    total, packages, modules = min(runs, key=lambda run: run[0])
+
+    print(f"⏱️ import {args.module}: {total / 1000:.1f} ms (fastest of {args.runs})")
+    app_package = args.module.split(".")[0]
+    print("\n  Slowest packages (cumulative, under -X importtime overhead):")
+    dependencies = {name: micros for name, micros in packages.items() if name != app_package}
+    for name, micros in sorted(dependencies.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"    {name:<28} {micros / 1000:8.1f} ms")
+
+    own = {name: micros for name, micros in modules.items() if name.split(".")[0] == app_package}
+    print(f"\n  {app_package} modules:")
+    for name, micros in sorted(own.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"    {name:<28} {micros / 1000:8.1f} ms")
+
+    if args.max_ms and total / 1000 > args.max_ms:
+        print(f"\n❌ Import time {total / 1000:.1f} ms is over the {args.max_ms:.0f} ms budget")
+        return 1
+    if args.max_ms:
+        print(f"\n✅ Within the {args.max_ms:.0f} ms import budget")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+In-process load test for the recommendation API
+
+Runs the FastAPI app through httpx's ASGITransport, against the in-memory
+database (default) or the Postgres at DATABASE_URL, with JWTs minted by
+app.auth.create_access_token. Replays a mix of recommendations, feedback
+and stats calls at a target request rate and reports throughput, latency
+percentiles, errors and rate-limiter rejections per endpoint.
+
+Run with: python benchmarks/load_test.py --rps 100 --duration 30
+          python benchmarks/load_test.py --db postgres --rps 50
+          python benchmarks/load_test.py --security-checks
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+from collections import defaultdict
+from typing import List, Dict, Any, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CAMPUS_DOMAINS = {
+    "Pilani": "pilani.bits-pilani.ac.in",
+    "Goa": "goa.bits-pilani.ac.in",
+    "Hyderabad": "hyderabad.bits-pilani.ac.in",
+    "Dubai": "dubai.bits-pilani.ac.in"
+}
+
+REC_TYPES = ("friends", "dating", "daily_match")
+FEEDBACK_ACTIONS = (("pass", 0.5), ("like", 0.45), ("super_like", 0.05))
+
+def parse_mix(mix: str) -> List[Tuple[str, float]]:
+    """'recommendations=0.6,feedback=0.35,stats=0.05' -> [(endpoint, weight), ...]"""
+    pairs = []
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        if name not in ("recommendations", "feedback", "stats"):
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        pairs.append((name, float(weight)))
+    return pairs
+
+def configure_environment(args):
+    """Environment the app reads at import time; must run before importing app.main"""
+    secret = os.getenv("SUPABASE_JWT_SECRET") or os.getenv("API_SECRET_KEY") or "load-test-secret"
+    # Tokens are minted with API_SECRET_KEY and verified with SUPABASE_JWT_SECRET
+    os.environ["SUPABASE_JWT_SECRET"] = secret
+    os.environ["API_SECRET_KEY"] = secret
+    os.environ.setdefault("FEEDBACK_WAL_DIR", tempfile.mkdtemp(prefix="load-test-wal-"))
+    # Failures are counted in the report; per-request error logs would drown it out
+    os.environ["LOG_LEVEL"] = args.log_level
+    if args.db == "fake":
+        os.environ.setdefault("DATABASE_URL", "postgresql://load-test@localhost/unused")
+
+async def prepare_fake_db(main, args) -> List[Dict[str, Any]]:
+    from benchmarks.fake_db import InMemoryDatabaseManager
+    from benchmarks.synthetic import generate_population, generate_connections
+
+    users = generate_population(args.users, seed=args.seed)
+    db = InMemoryDatabaseManager(users, generate_connections(users, seed=args.seed), latency_ms=args.db_latency_ms)
+
+    # Every module-level service holds its own reference to the database manager
+    main.db_manager = db
+    main.recommendation_engine.db = db
+    main.recommendation_engine.geo_index.db = db
+    main.feedback_queue.db = db
+    main.warmup.db = db
+    main.health_monitor.db = db
+    main.impression_sink.db = db
+
+    return [
+        {"id": str(u['id']), "campus": u['campus']}
+        for u in users
+        if u['is_active'] and u['verified'] and u['profile_completed']
+    ]
+
+async def prepare_postgres(main, args) -> List[Dict[str, Any]]:
+    await main.db_manager.connect()
+    async with main.db_manager.pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT id, campus FROM users
+            WHERE is_active = true AND verified = true AND profile_completed = true
+            ORDER BY random()
+            LIMIT $1
+            """,
+            args.users
+        )
+    return [{"id": str(row['id']), "campus": row['campus']} for row in rows]
+
+class LoadGenerator:
+    def __init__(self, app, users: List[Dict[str, Any]], args):
+        import httpx
+        from datetime import timedelta
+        from app.auth import create_access_token
+
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.users = users
+        self.mix = parse_mix(args.mix)
+        self.results: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        self.exceptions: Dict[str, int] = defaultdict(int)
+        self.in_flight = asyncio.Semaphore(args.max_in_flight)
+        self.dropped = 0
+
+        self.tokens = {}
+        for user in users:
+            domain = CAMPUS_DOMAINS.get(user['campus'], CAMPUS_DOMAINS["Pilani"])
+            self.tokens[user['id']] = create_access_token(
+                {"sub": user['id'], "role": "authenticated", "email": f"f{user['id'][:8]}@{domain}"},
+                expires_delta=timedelta(hours=2)
+            )
+
+        self.by_campus: Dict[str, List[str]] = defaultdict(list)
+        for user in users:
+            self.by_campus[user['campus']].append(user['id'])
+
+        # Public endpoints are limited per client address, so spread users over a pool of client IPs
+        self.clients = [
+            httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app, client=(f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}", 50000)),
+                base_url="http://load-test",
+                timeout=args.timeout
+            )
+            for i in range(args.client_ips)
+        ]
+
+    async def close(self):
+        for client in self.clients:
+            await client.aclose()
+
+    def _client_for(self, user_id: str):
+        return self.clients[zlib.crc32(user_id.encode()) % len(self.clients)]
+
+    def _request(self) -> Tuple[str, str, str, Dict[str, Any]]:
+        endpoint = self.rng.choices([name for name, _ in self.mix], [weight for _, weight in self.mix])[0]
+        user = self.rng.choice(self.users)
+        user_id = user['id']
+
+        if endpoint == "recommendations":
+            return endpoint, user_id, "/api/v1/recommendations", {
+                "user_id": user_id,
+                "recommendation_type": self.rng.choice(REC_TYPES),
+                "limit": self.args.limit
+            }
+        if endpoint == "feedback":
+            target = self.rng.choice(self.by_campus[user['campus']])
+            while target == user_id and len(self.by_campus[user['campus']]) > 1:
+                target = self.rng.choice(self.by_campus[user['campus']])  # Self-feedback is rejected
+            action = self.rng.choices([a for a, _ in FEEDBACK_ACTIONS], [w for _, w in FEEDBACK_ACTIONS])[0]
+            return endpoint, user_id, "/api/v1/feedback", {
+                "user_id": user_id,
+                "target_user_id": target,
+                "action": action
+            }
+        return endpoint, user_id, f"/api/v1/stats/{user_id}", None
+
+    async def _fire(self, endpoint: str, user_id: str, path: str, body: Dict[str, Any]):
+        client = self._client_for(user_id)
+        headers = {"Authorization": f"Bearer {self.tokens[user_id]}"}
+        start = time.perf_counter()
+        try:
+            if body is None:
+                response = await client.get(path, headers=headers)
+            else:
+                response = await client.post(path, json=body, headers=headers)
+            self.results[endpoint].append((response.status_code, time.perf_counter() - start))
+        except Exception:
+            self.exceptions[endpoint] += 1
+        finally:
+            self.in_flight.release()
+
+    async def run(self) -> float:
+        """Open-loop arrivals at the target rate (Poisson); returns the wall time"""
+        tasks = set()
+        start = time.perf_counter()
+        deadline = start + self.args.duration
+        next_at = start
+
+        while True:
+            next_at += self.rng.expovariate(self.args.rps)
+            if next_at >= deadline:
+                break
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if self.in_flight.locked():
+                # The app cannot keep up; count it instead of queueing unboundedly
+                self.dropped += 1
+                continue
+            await self.in_flight.acquire()
+            task = asyncio.create_task(self._fire(*self._request()))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def summarize(generator: LoadGenerator, elapsed: float) -> Dict[str, Any]:
+    report = {"elapsed_s": elapsed, "dropped": generator.dropped, "endpoints": {}}
+    all_latencies = []
+    total = 0
+
+    for endpoint in sorted(set(generator.results) | set(generator.exceptions)):
+        samples = generator.results.get(endpoint, [])
+        latencies = [seconds * 1000 for status, seconds in samples if status != 429]
+        all_latencies.extend(latencies)
+        count = len(samples) + generator.exceptions[endpoint]
+        total += count
+        statuses = defaultdict(int)
+        for status, _ in samples:
+            statuses[status] += 1
+
+        report["endpoints"][endpoint] = {
+            "requests": count,
+            "throughput_rps": count / elapsed,
+            "ok": sum(n for s, n in statuses.items() if s < 400),
+            "rate_limited": statuses.get(429, 0),
+            "client_errors": sum(n for s, n in statuses.items() if 400 <= s < 500 and s != 429),
+            "server_errors": sum(n for s, n in statuses.items() if s >= 500),
+            "exceptions": generator.exceptions[endpoint],
+            "p50_ms": percentile(latencies, 50) if latencies else None,
+            "p95_ms": percentile(latencies, 95) if latencies else None,
+            "p99_ms": percentile(latencies, 99) if latencies else None,
+            "statuses": dict(statuses)
+        }
+
+    report["total_requests"] = total
+    report["throughput_rps"] = total / elapsed
+    if all_latencies:
+        report["p50_ms"] = percentile(all_latencies, 50)
+        report["p95_ms"] = percentile(all_latencies, 95)
+        report["p99_ms"] = percentile(all_latencies, 99)
+    return report
+
+def print_report(report: Dict[str, Any], args):
+    print(f"\n📊 {report['total_requests']} requests in {report['elapsed_s']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s achieved, {args.rps} req/s target)")
+    if report.get("p50_ms") is not None:
+        print(f"  overall   p50 {report['p50_ms']:.2f} ms   p95 {report['p95_ms']:.2f} ms   p99 {report['p99_ms']:.2f} ms")
+    if report["dropped"]:
+        print(f"  ⚠️ {report['dropped']} arrivals dropped at {args.max_in_flight} requests in flight")
+
+    for endpoint, stats in report["endpoints"].items():
+        errors = stats["server_errors"] + stats["exceptions"]
+        print(f"\n  {endpoint}: {stats['requests']} requests ({stats['throughput_rps']:.1f} req/s)")
+        if stats["p50_ms"] is not None:
+            print(f"    latency   p50 {stats['p50_ms']:.2f} ms   p95 {stats['p95_ms']:.2f} ms   p99 {stats['p99_ms']:.2f} ms")
+        print(f"    ok {stats['ok']}   429 {stats['rate_limited']}   4xx {stats['client_errors']}   "
+              f"5xx/exceptions {errors} ({errors / max(1, stats['requests']):.1%})")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", choices=("fake", "postgres"), default="fake")
+    parser.add_argument("--users", type=int, default=5000, help="Synthetic population (fake) or users sampled (postgres)")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0, help="Simulated round trip for the fake database")
+    parser.add_argument("--rps", type=float, default=50)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds")
+    parser.add_argument("--mix", default="recommendations=0.6,feedback=0.35,stats=0.05")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--client-ips", type=int, default=256, help="Distinct client addresses seen by the rate limiter")
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--no-rate-limit", action="store_true", help="Disable the per-address and per-user limiters to measure raw capacity")
+    parser.add_argument("--security-checks", action="store_true", help="Also run test_security.py against the in-process app")
+    parser.add_argument("--log-level", default="CRITICAL")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    configure_environment(args)
+
+    import httpx
+    from app import main as api
+
+    if args.no_rate_limit:
+        api.limiter.enabled = False
+        api.rate_limiter.enabled = False
+
+    users = await (prepare_fake_db(api, args) if args.db == "fake" else prepare_postgres(api, args))
+    if not users:
+        print("❌ No eligible users to send requests as")
+        return 1
+
+    await api.startup_event()
+    await api.warmup.wait_ready()
+    print(f"🚀 Load test: {args.rps} req/s for {args.duration}s, {len(users)} users, {args.db} database, mix {args.mix}")
+
+    if args.security_checks:
+        from test_security import SecurityTester
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://load-test")
+        await SecurityTester("http://load-test", client=client).run_all_tests()
+
+    generator = LoadGenerator(api.app, users, args)
+    try:
+        elapsed = await generator.run()
+    finally:
+        await generator.close()
+        await api.shutdown_event()
+
+    report = summarize(generator, elapsed)
+    print_report(report, args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for RecommendationEngine.get_recommendations
+
+Generates synthetic campuses, drives the real engine through the in-memory
+DatabaseManager and reports latency percentiles, per-stage timings and
+allocations. Results are compared against benchmarks/baselines.json and the
+run exits non-zero on a regression.
+
+Run with: python benchmarks/run_benchmarks.py [--sizes 1000 10000 100000]
+Wall clock with database round trips: add --db-latency-ms 5 (add --no-prefetch to compare)
+Refresh baselines (same machine only): python benchmarks/run_benchmarks.py --update-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import List, Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.metrics import CANDIDATES
+from app.models import RecommendationType
+from app.recommendation_engine import RecommendationEngine
+from benchmarks.fake_db import InMemoryDatabaseManager
+from benchmarks.synthetic import generate_population, generate_connections
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Metrics checked against the baseline
+GATED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "alloc_p50_kib")
+
+REC_TYPES = [RecommendationType.FRIENDS, RecommendationType.DATING, RecommendationType.DAILY_MATCH]
+
+class StageTimer:
+    """Accumulates wall time spent inside wrapped methods, per stage"""
+
+    def __init__(self):
+        self.current: Dict[str, float] = defaultdict(float)
+
+    def wrap(self, obj: Any, method: str, stage: str):
+        fn = getattr(obj, method)
+        current = self.current
+
+        if asyncio.iscoroutinefunction(fn):
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    current[stage] += time.perf_counter() - start
+        else:
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    current[stage] += time.perf_counter() - start
+
+        setattr(obj, method, timed)
+
+    def take(self) -> Dict[str, float]:
+        stages = dict(self.current)
+        self.current.clear()
+        return stages
+
+def instrument(engine: RecommendationEngine, db: InMemoryDatabaseManager) -> StageTimer:
+    timer = StageTimer()
+    timer.wrap(db, "get_user_profile", "profile_fetch")
+    timer.wrap(db, "get_potential_matches", "candidate_fetch")
+    timer.wrap(engine, "_featurize", "featurization")
+    timer.wrap(engine, "_score_bound", "bounding")
+    timer.wrap(engine, "_score_candidate", "scoring")
+    timer.wrap(engine, "_materialize_recommendation", "materialize")
+    timer.wrap(engine, "_apply_diversity_filter", "diversity")
+    return timer
+
+def candidate_counts() -> Dict[str, float]:
+    """Engine candidate counters (METRICS_ENABLED) summed over recommendation types"""
+    return {
+        step: sum(CANDIDATES.value((step, rec_type.value)) for rec_type in REC_TYPES)
+        for step in ("pruned", "scored")
+    }
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+async def run_size(
+    size: int,
+    requests: int,
+    alloc_requests: int,
+    limit: int,
+    seed: int,
+    result_cache: bool = False,
+    db_latency_ms: float = 0.0,
+    prefetch: bool = True
+) -> Dict[str, Any]:
+    """Benchmark one campus population size"""
+    users = generate_population(size, seed=seed)
+    db = InMemoryDatabaseManager(users, generate_connections(users, seed=seed), latency_ms=db_latency_ms)
+    engine = RecommendationEngine(db)
+    # The plan repeats requesters, so measure the full pipeline unless asked otherwise
+    engine.result_cache.enabled = result_cache
+    engine.prefetch_enabled = prefetch
+    timer = instrument(engine, db)
+
+    rng = random.Random(seed)
+    requesters = [u for u in users if u['is_active']]
+    plan = [(rng.choice(requesters), REC_TYPES[i % len(REC_TYPES)]) for i in range(requests)]
+    # The API passes the campus from the requester's JWT
+    plan = [(str(user['id']), user['campus'], rec_type) for user, rec_type in plan]
+
+    # Warm up code paths before measuring
+    for user_id, campus, rec_type in plan[:20]:
+        await engine.get_recommendations(user_id, rec_type, limit, campus=campus)
+    timer.take()
+
+    counts_before = candidate_counts()
+    latencies = []
+    stage_samples: Dict[str, List[float]] = defaultdict(list)
+    returned = []
+    for user_id, campus, rec_type in plan:
+        start = time.perf_counter()
+        recommendations = await engine.get_recommendations(user_id, rec_type, limit, campus=campus)
+        latencies.append((time.perf_counter() - start) * 1000)
+        returned.append(len(recommendations))
+        for stage, seconds in timer.take().items():
+            stage_samples[stage].append(seconds * 1000)
+
+    counts = {step: value - counts_before[step] for step, value in candidate_counts().items()}
+    considered = counts["pruned"] + counts["scored"]
+
+    # Allocation pass (tracemalloc slows everything down, so it is kept separate)
+    allocations = []
+    tracemalloc.start()
+    for user_id, campus, rec_type in plan[:alloc_requests]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await engine.get_recommendations(user_id, rec_type, limit, campus=campus)
+        allocations.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+    tracemalloc.stop()
+    timer.take()
+
+    return {
+        "requests": requests,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.fmean(latencies),
+        "throughput_rps": 1000 / statistics.fmean(latencies),
+        "alloc_p50_kib": percentile(allocations, 50),
+        "alloc_max_kib": max(allocations),
+        "avg_returned": statistics.fmean(returned),
+        "prune_rate": counts["pruned"] / considered if considered else 0.0,
+        "stages_ms": {
+            stage: statistics.fmean(samples + [0.0] * (requests - len(samples)))
+            for stage, samples in stage_samples.items()
+        }
+    }
+
+def print_result(size: int, result: Dict[str, Any]):
+    print(f"\n📊 {size:,} users — {result['requests']} requests, {result['avg_returned']:.1f} recommendations each")
+    print(f"  latency   p50 {result['p50_ms']:.3f} ms   p95 {result['p95_ms']:.3f} ms   "
+          f"p99 {result['p99_ms']:.3f} ms   ({result['throughput_rps']:.0f} req/s single-threaded)")
+    print(f"  allocs    p50 {result['alloc_p50_kib']:.1f} KiB   max {result['alloc_max_kib']:.1f} KiB per request")
+    print(f"  pruning   {result['prune_rate']:.1%} of candidates skipped full scoring (score bound below the cut)")
+    print("  stages    " + "   ".join(f"{stage} {ms:.3f} ms" for stage, ms in result['stages_ms'].items()))
+
+def compare(results: Dict[str, Dict[str, Any]], baselines: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return a description of every gated metric that regressed past the tolerance"""
+    regressions = []
+    for size, result in results.items():
+        baseline = baselines.get(size)
+        if not baseline:
+            print(f"⚠️ No baseline for {size} users, skipping regression check")
+            continue
+        for metric in GATED_METRICS:
+            expected = baseline.get(metric)
+            if expected is None:
+                continue
+            # Ignore sub-50µs / sub-KiB wobble on very small numbers
+            floor = 1.0 if metric.endswith("_kib") else 0.05
+            if result[metric] > expected * (1 + tolerance) and result[metric] - expected > floor:
+                regressions.append(f"{size} users: {metric} {result[metric]:.3f} vs baseline {expected:.3f}")
+    return regressions
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--alloc-requests", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tolerance", type=float, default=0.50, help="Allowed slowdown vs baseline (0.50 = 50%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", help="Also write the full results to this file")
+    parser.add_argument("--result-cache", action="store_true", help="Serve repeat requests from the ranked-feed cache")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Simulated database round trip (baselines are taken at 0)")
+    parser.add_argument("--no-prefetch", action="store_true", help="Fetch candidates only after the profile has loaded")
+    args = parser.parse_args()
+
+    print("🚀 Recommendation engine benchmark")
+    results = {}
+    for size in args.sizes:
+        results[str(size)] = await run_size(
+            size, args.requests, args.alloc_requests, args.limit, args.seed, args.result_cache,
+            args.db_latency_ms, not args.no_prefetch
+        )
+        print_result(size, results[str(size)])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baselines = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baselines = json.load(f)
+        for size, result in results.items():
+            baselines[size] = {metric: round(result[metric], 4) for metric in GATED_METRICS}
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\n💾 Baselines written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\n⚠️ No baseline file, run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+
+    if regressions:
+        print("\n❌ Performance regressions:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+
+    print("\n✅ No regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Serialization cost per recommendation response, before and after the fast path
+Run with: python benchmarks/serialization_benchmark.py [--items 50] [--iterations 2000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.models import RecommendationItem, RecommendationResponse
+from app.serialization import recommendation_payload, MSGPACK_AVAILABLE, _msgpack_default
+
+if MSGPACK_AVAILABLE:
+    import msgpack
+
+INTERESTS = ["coding", "music", "football", "travel", "photography", "gaming", "ai", "startup"]
+TRAITS = ["openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism"]
+
+def make_fields(rng: random.Random) -> dict:
+    """Field values shaped like the engine's output for one candidate"""
+    return {
+        "user_id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "compatibility_score": rng.random(),
+        "match_reasons": ["Share 4 common interests"],
+        "common_interests": rng.sample(INTERESTS, 4),
+        "personality_match": {trait: rng.random() for trait in TRAITS},
+        "explanation": "Strong interest alignment • Compatible personalities",
+        "confidence": rng.random()
+    }
+
+def before(fields: list) -> bytes:
+    """Validated models, response_model re-validation, jsonable_encoder + json.dumps"""
+    items = [RecommendationItem(**f) for f in fields]
+    response = RecommendationResponse(user_id="requester", recommendations=items, total_candidates=len(items))
+    validated = RecommendationResponse.model_validate(response.model_dump())
+    return json.dumps(
+        jsonable_encoder(validated),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+def after_json(fields: list) -> bytes:
+    """model_construct items and orjson encoding"""
+    items = [RecommendationItem.model_construct(**f) for f in fields]
+    return orjson.dumps(recommendation_payload("requester", items, "2.0", len(items)))
+
+def after_msgpack(fields: list) -> bytes:
+    """model_construct items and msgpack encoding"""
+    items = [RecommendationItem.model_construct(**f) for f in fields]
+    payload = recommendation_payload("requester", items, "2.0", len(items))
+    return msgpack.packb(payload, default=_msgpack_default, use_bin_type=True)
+
+def measure(fn, fields: list, iterations: int) -> tuple:
+    """Return (microseconds per response, encoded size in bytes)"""
+    body = fn(fields)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(fields)
+    elapsed = time.perf_counter() - start
+    return elapsed / iterations * 1e6, len(body)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    fields = [make_fields(rng) for _ in range(args.items)]
+
+    cases = [("before: pydantic + stdlib json", before), ("after: model_construct + orjson", after_json)]
+    if MSGPACK_AVAILABLE:
+        cases.append(("after: model_construct + msgpack", after_msgpack))
+
+    print(f"📦 Serialization cost per {args.items}-item response ({args.iterations} iterations)")
+    baseline = None
+    for name, fn in cases:
+        per_response, size = measure(fn, fields, args.iterations)
+        baseline = baseline or per_response
+        print(f"  {name:<36} {per_response:9.1f} µs  {size:6d} bytes  {baseline / per_response:5.1f}x")
+
+if __name__ == "__main__":
+    main()
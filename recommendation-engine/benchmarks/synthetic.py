@@ -0,0 +1,160 @@
+"""
+Synthetic campus populations shaped like sample_data.sql
+
+Rows match what DatabaseManager.get_user_profile / get_potential_matches
+return from asyncpg: UUID ids, timezone-aware timestamps, interest names with
+parallel weights, and preferences already decoded from JSON.
+"""
+
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
+
+# (campus, share of users, approximate coordinates)
+CAMPUSES = [
+    ("Pilani", 0.35, (28.3640, 75.5870)),
+    ("Hyderabad", 0.30, (17.5449, 78.5718)),
+    ("Goa", 0.25, (15.3911, 73.8782)),
+    ("Dubai", 0.10, (25.1310, 55.4200)),
+]
+
+BRANCHES = [
+    ("Computer Science", 0.30), ("Electronics & Communication", 0.15), ("Electrical & Electronics", 0.10),
+    ("Mechanical Engineering", 0.10), ("Chemical Engineering", 0.07), ("Civil Engineering", 0.05),
+    ("Mathematics", 0.06), ("Economics", 0.07), ("Physics", 0.04), ("Design", 0.03), ("Biology", 0.03),
+]
+
+# Interest names as users type them in the app, with rough popularity
+INTERESTS = [
+    ("Machine Learning", 8), ("Data Science", 7), ("Full Stack Development", 6), ("Coding", 9),
+    ("Blockchain", 3), ("Cybersecurity", 3), ("DevOps", 2), ("AI", 6), ("Startups", 5),
+    ("Product Management", 3), ("Entrepreneurship", 3), ("Research", 4), ("Physics", 2),
+    ("Cricket", 8), ("Football", 6), ("Basketball", 4), ("Tennis", 2), ("Fitness", 6), ("Gym", 5),
+    ("Running", 3), ("Swimming", 2), ("Yoga", 3), ("Chess", 3),
+    ("Music", 9), ("Music Production", 3), ("Dance", 5), ("Photography", 7), ("Art", 4),
+    ("Painting", 2), ("UI/UX Design", 3), ("Theater", 2), ("Drawing", 2),
+    ("Gaming", 8), ("Movies", 8), ("Books", 5), ("Reading", 4), ("Anime", 4), ("Netflix", 4), ("Podcasts", 3),
+    ("Travel", 8), ("Trekking", 4), ("Hiking", 3), ("Adventure", 3), ("Languages", 2), ("Food", 6),
+    ("Cooking", 4), ("Baking", 2), ("Fashion", 2), ("Volunteering", 3), ("Networking", 2),
+    ("Events", 3), ("Parties", 3), ("Community", 2),
+]
+
+FOOD = [("vegetarian", 0.38), ("non_vegetarian", 0.34), ("eggetarian", 0.10), ("jain", 0.05), ("vegan", 0.03), (None, 0.10)]
+SMOKING = [("never", 0.72), ("socially", 0.08), ("regularly", 0.04), ("trying_to_quit", 0.03), (None, 0.13)]
+DRINKING = [("never", 0.45), ("occasionally", 0.20), ("socially", 0.18), ("regularly", 0.04), (None, 0.13)]
+
+TRAITS = ['openness', 'conscientiousness', 'extraversion', 'agreeableness', 'neuroticism']
+
+def _choice(rng: random.Random, weighted: list):
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights=weights)[0]
+
+def _campus_choice(rng: random.Random, campus: Optional[str]):
+    if campus:
+        return next(c for c in CAMPUSES if c[0] == campus)
+    return rng.choices(CAMPUSES, weights=[c[1] for c in CAMPUSES])[0]
+
+def generate_user(rng: random.Random, now: datetime, campus: Optional[str] = None) -> Dict[str, Any]:
+    """One users row joined with its interests"""
+    campus_name, _, (lat, lon) = _campus_choice(rng, campus)
+    gender = rng.choices(["male", "female", "other"], weights=[0.62, 0.36, 0.02])[0]
+    year = rng.choices([1, 2, 3, 4, 5], weights=[0.28, 0.26, 0.24, 0.19, 0.03])[0]
+    age = 17 + year + rng.choice([0, 0, 1, 1, 2])
+
+    names = [name for name, _ in INTERESTS]
+    popularity = [weight for _, weight in INTERESTS]
+    interests = []
+    for _ in range(rng.choices([2, 3, 4, 5, 6, 7, 8], weights=[1, 5, 5, 4, 3, 2, 1])[0]):
+        name = rng.choices(names, weights=popularity)[0]
+        if name not in interests:
+            interests.append(name)
+    weights = [round(rng.uniform(0.6, 1.0), 1) for _ in interests]
+
+    dealbreakers = {}
+    if rng.random() < 0.10:
+        dealbreakers['no_smoking'] = True
+    if rng.random() < 0.05:
+        dealbreakers['food_preference'] = rng.choice(["vegetarian", "jain", "vegan"])
+
+    min_age = max(18, age - rng.choice([2, 3, 4]))
+    last_seen = now - timedelta(hours=rng.expovariate(1 / 72.0))
+
+    return {
+        'id': uuid.UUID(int=rng.getrandbits(128), version=4),
+        'email': f"{uuid.UUID(int=rng.getrandbits(128)).hex[:12]}@{campus_name.lower()}.bits-pilani.ac.in",
+        'display_name': f"Student {rng.randrange(10**6)}",
+        'bio': rng.choice(["", "CS student who loves coding and cricket",
+                           "Always up for hackathons, late-night debugging and long conversations about startups"]),
+        'age': age,
+        'gender': gender,
+        'year': year,
+        'branch': _choice(rng, BRANCHES),
+        'campus': campus_name,
+        'preferences': {
+            'age_range': [min_age, max(min_age + 1, age + rng.choice([2, 3, 5]))],
+            'gender_preference': rng.choice([None, None, "male", "female"]),
+            'max_distance': rng.choice([10, 50, 100]),
+            'connect_similarity': 1 if rng.random() < 0.9 else -1,
+            'dating_similarity': 1 if rng.random() < 0.8 else -1,
+            'looking_for': rng.choice([["friends"], ["dating", "friends"], ["networking"]]),
+            'dealbreakers': dealbreakers
+        },
+        'personality_traits': (
+            {trait: round(rng.betavariate(4, 4), 3) for trait in TRAITS} if rng.random() < 0.7 else {}
+        ),
+        'food_preference': _choice(rng, FOOD),
+        'smoking': _choice(rng, SMOKING),
+        'drinking': _choice(rng, DRINKING),
+        'is_active': rng.random() < 0.97,
+        'verified': rng.random() < 0.90,
+        'profile_completed': rng.random() < 0.85,
+        'last_seen': last_seen,
+        'response_rate': round(rng.betavariate(2, 2), 3),
+        'connection_count': int(rng.expovariate(1 / 4.0)),
+        'activity_score': round(rng.random(), 3),
+        'latitude': lat + rng.gauss(0, 0.02),
+        'longitude': lon + rng.gauss(0, 0.02),
+        'created_at': last_seen - timedelta(days=rng.randint(1, 700)),
+        'updated_at': last_seen - timedelta(days=rng.randint(0, 30)),
+        'interests': interests,
+        'interest_weights': weights,
+        'interests_weighted': list(zip(interests, weights)),
+    }
+
+def generate_population(
+    size: int,
+    seed: int = 42,
+    campus: Optional[str] = None,
+    now: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """Generate `size` users across the campuses (or all on one campus)"""
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    return [generate_user(rng, now, campus) for _ in range(size)]
+
+def generate_connections(
+    users: List[Dict[str, Any]],
+    per_user: float = 2.0,
+    seed: int = 42
+) -> List[Dict[str, Any]]:
+    """Random same-campus connections, about `per_user` per user"""
+    rng = random.Random(seed)
+    by_campus: Dict[str, list] = {}
+    for user in users:
+        by_campus.setdefault(user['campus'], []).append(user['id'])
+
+    connections = []
+    for ids in by_campus.values():
+        if len(ids) < 2:
+            continue
+        for _ in range(int(len(ids) * per_user / 2)):
+            a, b = rng.sample(ids, 2)
+            user1, user2 = (a, b) if str(a) < str(b) else (b, a)
+            connections.append({
+                'user1_id': user1,
+                'user2_id': user2,
+                'status': rng.choices(['accepted', 'pending', 'declined'], weights=[0.6, 0.3, 0.1])[0],
+                'compatibility_score': round(rng.uniform(0.3, 0.95), 2)
+            })
+    return connections
@@ -57,7 +57,6 @@ $PYTHON_CMD -c "import fastapi; print(f'✓ FastAPI: {fastapi.__version__}')" ||
 $PYTHON_CMD -c "import uvicorn; print(f'✓ Uvicorn: {uvicorn.__version__}')" || echo "❌ Uvicorn import failed"
 $PYTHON_CMD -c "import asyncpg; print(f'✓ AsyncPG: {asyncpg.__version__}')" || echo "❌ AsyncPG import failed"
 $PYTHON_CMD -c "import numpy; print(f'✓ NumPy: {numpy.__version__}')" || echo "❌ NumPy import failed"
-$PYTHON_CMD -c "import pandas; print(f'✓ Pandas: {pandas.__version__}')" || echo "❌ Pandas import failed"
 
 # Check if our app can be imported
 echo "🧪 Testing application import:"
@@ -71,6 +70,10 @@ except Exception as e:
     exit(1)
 "
 
+# Cold start is mostly import time; fail the build if it blows the budget
+echo "⏱️ Checking application import time:"
+$PYTHON_CMD benchmarks/import_time.py --max-ms "${IMPORT_TIME_BUDGET_MS:-3000}" --top 10
+
 echo "================================================"
 echo "✅ BITSPARK Backend Build Complete!"
 echo "🎯 Ready for production deployment"
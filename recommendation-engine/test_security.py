@@ -14,9 +14,10 @@ BASE_URL = os.getenv("TEST_API_URL", "http://localhost:8000")
 TIMEOUT = 10
 
 class SecurityTester:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, client: httpx.AsyncClient = None):
         self.base_url = base_url
-        self.client = httpx.AsyncClient(timeout=TIMEOUT)
+        # Pass a client with an ASGITransport to test the app in-process
+        self.client = client or httpx.AsyncClient(timeout=TIMEOUT)
     
     async def test_health_endpoint(self):
         """Test health endpoint (no auth required)"""
@@ -0,0 +1,121 @@
+import asyncio
+import uuid
+
+import asyncpg
+import orjson
+import pytest
+
+from app.feedback_queue import FeedbackQueue
+from app.models import UserFeedback
+
+class RejectingDatabase:
+    """record_feedback_batch that fails the way Postgres does on bad events"""
+
+    def __init__(self):
+        self.rows = {}
+        self.calls = 0
+        self.unavailable = False
+
+    async def record_feedback_batch(self, events, mutual_known=False):
+        self.calls += 1
+        if self.unavailable:
+            raise ConnectionError("connection refused")
+        for event in events:
+            try:
+                uuid.UUID(event['target_user_id'])
+            except ValueError:
+                raise asyncpg.exceptions.InvalidTextRepresentationError(
+                    f"invalid input syntax for type uuid: \"{event['target_user_id']}\""
+                )
+            if event['user_id'] == event['target_user_id'] and event['action'] in ('like', 'super_like'):
+                raise asyncpg.exceptions.CheckViolationError("violates check constraint \"connections_check\"")
+        for event in events:
+            self.rows[(event['user_id'], event['target_user_id'])] = event['action']
+        return []
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def queue_with(db, wal_dir, events):
+    queue = FeedbackQueue(db, wal_dir=str(wal_dir), batch_size=500, flush_interval=60)
+    await queue.start()
+    for user_id, target_user_id, action in events:
+        await queue.enqueue(user_id, target_user_id, action)
+    return queue
+
+def test_bad_event_is_dead_lettered_and_the_rest_written(tmp_path):
+    users = [str(uuid.uuid4()) for _ in range(6)]
+    events = [(users[0], users[i], 'like') for i in range(1, 6)]
+    events.insert(2, (users[0], 'not-a-uuid', 'like'))
+    events.insert(4, (users[1], users[1], 'like'))
+    db = RejectingDatabase()
+
+    async def scenario():
+        queue = await queue_with(db, tmp_path, events)
+        written = await queue.flush()
+        stats = queue.stats()
+        await queue.drain()
+        return written, stats
+
+    written, stats = run(scenario())
+
+    assert set(db.rows) == {(users[0], users[i]) for i in range(1, 6)}
+    assert written == len(events)
+    assert stats["pending"] == 0
+    assert stats["wal_segments"] == 0
+    assert stats["dead_lettered_events"] == 2
+    with open(tmp_path / FeedbackQueue.DEAD_LETTER_NAME, "rb") as f:
+        dead = [orjson.loads(line) for line in f]
+    assert {(event['user_id'], event['target_user_id']) for event in dead} == {
+        (users[0], 'not-a-uuid'), (users[1], users[1])
+    }
+    assert all(event['error'] for event in dead)
+
+def test_dead_lettered_event_is_not_replayed(tmp_path):
+    user_id, target_user_id = str(uuid.uuid4()), str(uuid.uuid4())
+    db = RejectingDatabase()
+
+    async def scenario():
+        queue = await queue_with(db, tmp_path, [(user_id, 'bogus', 'pass'), (user_id, target_user_id, 'pass')])
+        await queue.flush()
+        await queue.drain()
+
+        restarted = FeedbackQueue(db, wal_dir=str(tmp_path), flush_interval=60)
+        await restarted.start()
+        pending = restarted.queued_events()
+        await restarted.drain()
+        return pending
+
+    assert run(scenario()) == []
+    assert db.rows == {(user_id, target_user_id): 'pass'}
+
+def test_transient_failure_keeps_the_batch_queued(tmp_path):
+    user_id, target_user_id = str(uuid.uuid4()), str(uuid.uuid4())
+    db = RejectingDatabase()
+
+    async def scenario():
+        queue = await queue_with(db, tmp_path, [(user_id, target_user_id, 'like')])
+        db.unavailable = True
+        with pytest.raises(ConnectionError):
+            await queue.flush()
+        pending = len(queue.queued_events())
+        db.unavailable = False
+        written = await queue.flush()
+        stats = queue.stats()
+        await queue.drain()
+        return pending, written, stats
+
+    pending, written, stats = run(scenario())
+
+    assert pending == 1
+    assert written == 1
+    assert stats["dead_lettered_events"] == 0
+    assert not (tmp_path / FeedbackQueue.DEAD_LETTER_NAME).exists()
+
+def test_feedback_target_must_be_a_uuid():
+    target_user_id = uuid.uuid4()
+    feedback = UserFeedback(user_id=str(uuid.uuid4()), target_user_id=str(target_user_id).upper(), action='like')
+    assert feedback.target_user_id == str(target_user_id)
+
+    with pytest.raises(ValueError):
+        UserFeedback(user_id=str(uuid.uuid4()), target_user_id='not-a-uuid', action='like')
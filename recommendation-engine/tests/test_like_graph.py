@@ -0,0 +1,37 @@
+import uuid
+
+import pytest
+
+from app.like_graph import LikeGraph
+
+def test_mutual_like():
+    graph = LikeGraph()
+    alice, bob = str(uuid.uuid4()), str(uuid.uuid4())
+    assert graph.record(alice, bob, 'like') is False
+    assert graph.record(bob, alice, 'super_like') is True
+    assert graph.is_mutual(alice, bob)
+
+def test_self_like_is_never_mutual():
+    graph = LikeGraph()
+    alice = str(uuid.uuid4())
+    assert graph.record(alice, alice, 'like') is False
+
+def test_restore_undoes_a_record():
+    graph = LikeGraph()
+    alice, bob = str(uuid.uuid4()), str(uuid.uuid4())
+    graph.record(alice, bob, 'like')
+    graph.restore(alice, bob, False)
+    assert not graph.has_like(alice, bob)
+    assert graph.record(bob, alice, 'like') is False
+
+    graph.record(alice, bob, 'pass')
+    graph.restore(alice, bob, True)
+    assert graph.has_like(alice, bob)
+
+def test_request_targets_must_be_uuids():
+    graph = LikeGraph()
+    alice = str(uuid.uuid4())
+    with pytest.raises(ValueError):
+        graph.record(alice, 'not-a-uuid', 'like')
+    assert graph.record(alice, 'not-a-uuid', 'pass') is False
+    assert graph.stats()["likes"] == 0
@@ -0,0 +1,38 @@
+/*
+  # Candidate retrieval indexes
+
+  The recommendation engine compiles request filters and the user's hard
+  dealbreakers into the candidate query (app/filters.py). The query selects
+  eligible users in (last_seen DESC, id) order with a LIMIT, then aggregates
+  interests for those rows only. The id tie-breaker keeps the LIMIT cut
+  deterministic when users share a last_seen. These partial indexes cover
+  the eligibility flags, so Postgres can walk them in that order and stop at
+  the LIMIT:
+
+  - idx_users_candidates_campus: the default single-campus fetch
+  - idx_users_candidates_campus_gender: dating with a gender preference
+  - idx_users_candidates_recent: campus_filter spanning several campuses
+
+  idx_connections_user2 serves the NOT EXISTS check for connections where
+  the requesting user is user2. UNIQUE (user1_id, user2_id) already serves
+  the user1 side.
+  Apply this after the existing migrations.
+*/
+
+CREATE INDEX IF NOT EXISTS idx_users_candidates_campus
+  ON users (campus, last_seen DESC, id)
+  WHERE is_active = true AND verified = true AND profile_completed = true;
+
+CREATE INDEX IF NOT EXISTS idx_users_candidates_campus_gender
+  ON users (campus, gender, last_seen DESC, id)
+  WHERE is_active = true AND verified = true AND profile_completed = true;
+
+CREATE INDEX IF NOT EXISTS idx_users_candidates_recent
+  ON users (last_seen DESC, id)
+  WHERE is_active = true AND verified = true AND profile_completed = true;
+
+CREATE INDEX IF NOT EXISTS idx_connections_user2
+  ON connections (user2_id, user1_id);
+
+ANALYZE users;
+ANALYZE connections;
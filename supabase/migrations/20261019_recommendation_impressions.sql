@@ -0,0 +1,30 @@
+/*
+  # Recommendation impressions
+
+  One row per recommendation response: who asked, which candidates were
+  shown in which order and with which scores, the algorithm version and the
+  request latency. Written only by the recommendation engine's analytics
+  sink, in batches with COPY; used offline to evaluate ranking.
+  Apply this after the existing migrations.
+*/
+
+CREATE TABLE IF NOT EXISTS recommendation_impressions (
+  id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  user_id uuid NOT NULL,
+  recommendation_type text NOT NULL,
+  algorithm_version text NOT NULL,
+  candidate_ids uuid[] NOT NULL,     -- In ranked order
+  scores real[] NOT NULL,            -- compatibility_score per candidate_ids entry
+  latency_ms real,
+  metadata jsonb DEFAULT '{}'
+);
+
+-- Append-only and time-ordered: BRIN keeps the time index tiny
+CREATE INDEX IF NOT EXISTS idx_recommendation_impressions_created_at
+  ON recommendation_impressions USING brin (created_at);
+CREATE INDEX IF NOT EXISTS idx_recommendation_impressions_user
+  ON recommendation_impressions (user_id, created_at DESC);
+
+-- Service role only; no client access
+ALTER TABLE recommendation_impressions ENABLE ROW LEVEL SECURITY;
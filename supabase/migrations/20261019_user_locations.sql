@@ -0,0 +1,28 @@
+/*
+  # User locations
+
+  UserProfile has latitude/longitude, but the users table has never stored
+  them. The recommendation engine uses them to fill distance_km and, for
+  requests with the nearby_only filter, to keep candidates within the
+  user's preferences.max_distance. Candidates are found through an
+  in-memory grid per campus (app/geo.py), with a latitude/longitude
+  bounding box on the candidate query as the fallback. No PostGIS needed.
+
+  Both columns are nullable; users without a location never match
+  nearby_only and get no distance_km.
+  Apply this after the existing migrations.
+*/
+
+ALTER TABLE users
+  ADD COLUMN IF NOT EXISTS latitude double precision,
+  ADD COLUMN IF NOT EXISTS longitude double precision;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'users_location_range') THEN
+    ALTER TABLE users ADD CONSTRAINT users_location_range CHECK (
+      (latitude IS NULL AND longitude IS NULL)
+      OR (latitude BETWEEN -90 AND 90 AND longitude BETWEEN -180 AND 180)
+    );
+  END IF;
+END $$;
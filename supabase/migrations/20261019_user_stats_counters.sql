@@ -0,0 +1,202 @@
+/*
+  # Incrementally maintained user statistics
+
+  user_stats keeps one row of counters per user (likes and passes given,
+  connections, summed compatibility). Triggers on user_feedback and
+  connections keep it current on every write path, including the frontend's
+  direct Supabase writes and the recommendation engine's batched upserts, so
+  GET /api/v1/stats/{user_id} is a primary-key lookup instead of a
+  user_feedback scan plus two OR-predicate scans over connections.
+  The counter functions are SECURITY DEFINER: the frontend writes with the
+  user's role, which RLS never lets write user_stats (a connection also
+  updates the other user's row). Clients cannot call bump_user_stats
+  directly.
+  Apply this after the existing migrations.
+*/
+
+-- 1. Counter table
+CREATE TABLE IF NOT EXISTS user_stats (
+  user_id uuid PRIMARY KEY,
+  likes_given integer NOT NULL DEFAULT 0,
+  passes_given integer NOT NULL DEFAULT 0,
+  total_connections integer NOT NULL DEFAULT 0,
+  compatibility_sum double precision NOT NULL DEFAULT 0,
+  compatibility_count integer NOT NULL DEFAULT 0,  -- Connections with a compatibility_score
+  updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- 2. Add deltas to a user's counters (owner's privileges; only the triggers call it)
+CREATE OR REPLACE FUNCTION bump_user_stats(
+  target_user uuid,
+  likes integer,
+  passes integer,
+  connections integer,
+  compat_sum double precision,
+  compat_count integer
+)
+RETURNS void AS $$
+BEGIN
+  IF target_user IS NULL THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO user_stats AS s (user_id, likes_given, passes_given, total_connections, compatibility_sum, compatibility_count)
+  VALUES (target_user, likes, passes, connections, compat_sum, compat_count)
+  ON CONFLICT (user_id) DO UPDATE SET
+    likes_given = s.likes_given + EXCLUDED.likes_given,
+    passes_given = s.passes_given + EXCLUDED.passes_given,
+    total_connections = s.total_connections + EXCLUDED.total_connections,
+    compatibility_sum = s.compatibility_sum + EXCLUDED.compatibility_sum,
+    compatibility_count = s.compatibility_count + EXCLUDED.compatibility_count,
+    updated_at = now();
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION bump_user_stats(uuid, integer, integer, integer, double precision, integer)
+  FROM PUBLIC, anon, authenticated;
+
+-- 3. user_feedback: take back the old row, count the new one
+CREATE OR REPLACE FUNCTION user_stats_on_feedback()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM bump_user_stats(
+      OLD.user_id,
+      -(OLD.action IN ('like', 'super_like'))::integer,
+      -(OLD.action = 'pass')::integer,
+      0, 0, 0
+    );
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM bump_user_stats(
+      NEW.user_id,
+      (NEW.action IN ('like', 'super_like'))::integer,
+      (NEW.action = 'pass')::integer,
+      0, 0, 0
+    );
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+DROP TRIGGER IF EXISTS trigger_user_stats_feedback ON user_feedback;
+CREATE TRIGGER trigger_user_stats_feedback
+  AFTER INSERT OR DELETE ON user_feedback
+  FOR EACH ROW
+  EXECUTE FUNCTION user_stats_on_feedback();
+
+-- Upserts that only refresh context/created_at leave the counters alone
+DROP TRIGGER IF EXISTS trigger_user_stats_feedback_update ON user_feedback;
+CREATE TRIGGER trigger_user_stats_feedback_update
+  AFTER UPDATE OF user_id, action ON user_feedback
+  FOR EACH ROW
+  WHEN (OLD.user_id IS DISTINCT FROM NEW.user_id OR OLD.action IS DISTINCT FROM NEW.action)
+  EXECUTE FUNCTION user_stats_on_feedback();
+
+-- 4. connections: both sides (once for a self-connection), lower user id first so
+--    concurrent writers lock rows in the same order
+CREATE OR REPLACE FUNCTION user_stats_on_connection()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM bump_user_stats(
+      LEAST(OLD.user1_id, OLD.user2_id), 0, 0, -1,
+      -COALESCE(OLD.compatibility_score, 0)::double precision,
+      -(OLD.compatibility_score IS NOT NULL)::integer
+    );
+    IF OLD.user1_id IS DISTINCT FROM OLD.user2_id THEN
+      PERFORM bump_user_stats(
+        GREATEST(OLD.user1_id, OLD.user2_id), 0, 0, -1,
+        -COALESCE(OLD.compatibility_score, 0)::double precision,
+        -(OLD.compatibility_score IS NOT NULL)::integer
+      );
+    END IF;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM bump_user_stats(
+      LEAST(NEW.user1_id, NEW.user2_id), 0, 0, 1,
+      COALESCE(NEW.compatibility_score, 0)::double precision,
+      (NEW.compatibility_score IS NOT NULL)::integer
+    );
+    IF NEW.user1_id IS DISTINCT FROM NEW.user2_id THEN
+      PERFORM bump_user_stats(
+        GREATEST(NEW.user1_id, NEW.user2_id), 0, 0, 1,
+        COALESCE(NEW.compatibility_score, 0)::double precision,
+        (NEW.compatibility_score IS NOT NULL)::integer
+      );
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+DROP TRIGGER IF EXISTS trigger_user_stats_connection ON connections;
+CREATE TRIGGER trigger_user_stats_connection
+  AFTER INSERT OR DELETE ON connections
+  FOR EACH ROW
+  EXECUTE FUNCTION user_stats_on_connection();
+
+-- Status changes (pending -> accepted) do not touch the counters
+DROP TRIGGER IF EXISTS trigger_user_stats_connection_update ON connections;
+CREATE TRIGGER trigger_user_stats_connection_update
+  AFTER UPDATE OF user1_id, user2_id, compatibility_score ON connections
+  FOR EACH ROW
+  WHEN (
+    OLD.user1_id IS DISTINCT FROM NEW.user1_id
+    OR OLD.user2_id IS DISTINCT FROM NEW.user2_id
+    OR OLD.compatibility_score IS DISTINCT FROM NEW.compatibility_score
+  )
+  EXECUTE FUNCTION user_stats_on_connection();
+
+-- 5. Backfill from the existing rows; the lock keeps writes out until the triggers take over
+LOCK TABLE user_feedback, connections IN SHARE MODE;
+
+INSERT INTO user_stats (user_id, likes_given, passes_given, total_connections, compatibility_sum, compatibility_count)
+SELECT user_id,
+       SUM(likes)::integer,
+       SUM(passes)::integer,
+       SUM(connections)::integer,
+       SUM(compat_sum),
+       SUM(compat_count)::integer
+FROM (
+  SELECT user_id,
+         COUNT(*) FILTER (WHERE action IN ('like', 'super_like')) AS likes,
+         COUNT(*) FILTER (WHERE action = 'pass') AS passes,
+         0 AS connections, 0::double precision AS compat_sum, 0 AS compat_count
+  FROM user_feedback
+  GROUP BY user_id
+  UNION ALL
+  SELECT side.user_id, 0, 0,
+         COUNT(*),
+         COALESCE(SUM(side.compatibility_score), 0)::double precision,
+         COUNT(side.compatibility_score)
+  FROM (
+    SELECT user1_id AS user_id, compatibility_score FROM connections
+    UNION ALL
+    SELECT user2_id AS user_id, compatibility_score FROM connections
+    WHERE user2_id IS DISTINCT FROM user1_id
+  ) side
+  GROUP BY side.user_id
+) counts
+WHERE user_id IS NOT NULL
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET
+  likes_given = EXCLUDED.likes_given,
+  passes_given = EXCLUDED.passes_given,
+  total_connections = EXCLUDED.total_connections,
+  compatibility_sum = EXCLUDED.compatibility_sum,
+  compatibility_count = EXCLUDED.compatibility_count,
+  updated_at = now();
+
+-- 6. Users only read their own counters; the triggers write as the owner and the service role bypasses RLS
+ALTER TABLE user_stats ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view own stats" ON user_stats;
+CREATE POLICY "Users can view own stats" ON user_stats
+  FOR SELECT USING (auth.uid() = user_id);